@@ -3,12 +3,14 @@ import secrets
 import os
 import logging
 from dotenv import load_dotenv
-from models.database import init_db
+from models.database import init_db, close_db
 from routes.auth import auth_bp
 from routes.assessment import assessment_bp
 from routes.admin import admin_bp
 from routes.utils import utils_bp, markdown_filter
-from config import DATABASE, UPLOAD_FOLDER, ENCRYPTION_KEY_FILE
+from config import DATABASE, UPLOAD_FOLDER, ENCRYPTION_KEY_FILE, AI_WORKERS
+from services.job_queue import start_process_pool
+import services.recommendation_jobs  # registers the recommendations job handler
 from flask_talisman import Talisman
 
 # Load environment variables from .env file
@@ -50,6 +52,18 @@ os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 # Initialize database
 init_db()
 
+# Run background jobs (AI recommendations) in each serving process unless a
+# separate recommendation_worker.py handles them (AI_WORKERS=0). Workers
+# start with the process's first request, so importing the app (scripts,
+# tests, a preloading server's master) starts no threads.
+if AI_WORKERS > 0:
+    @app.before_request
+    def start_job_workers():
+        start_process_pool(AI_WORKERS)
+
+# Close the per-request database connection when the app context ends
+app.teardown_appcontext(close_db)
+
 # Register blueprints
 app.register_blueprint(auth_bp)
 app.register_blueprint(assessment_bp)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+AI Path Benchmark Script
+Load-tests assessment completion and the results page, AI recommendations
+included, against the fake OpenAI server instead of the paid API.
+
+Usage: python benchmark_ai_path.py [--users 20] [--concurrency 5] [--mode stream|worker] ...
+
+Each simulated user answers a whole assessment (random answers, so that
+prompts differ unless --same-answers is given), completes it, opens the
+results page and waits for its recommendations: over the SSE stream in
+stream mode, or by polling /recommendations_status while the background
+workers generate them in worker mode. Runs against a throwaway database
+and an in-process fake OpenAI server (or --api-base), then reports
+throughput and p50/p95/p99 latency per step.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+OPTIONS = ['0-20%', '21-40%', '41-60%', '61-80%', '81-100%']
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Benchmark assessment completion and AI recommendations')
+    parser.add_argument('--users', type=int, default=20, help='assessments to complete')
+    parser.add_argument('--concurrency', type=int, default=5, help='users running at the same time')
+    parser.add_argument('--domain', default='Complete Assessment')
+    parser.add_argument('--mode', choices=['stream', 'worker'], default='stream',
+                        help='stream recommendations on the results page, or let AI workers generate them')
+    parser.add_argument('--workers', type=int, default=4, help='AI worker threads in worker mode')
+    parser.add_argument('--same-answers', action='store_true', help='give every user the same answers (recommendation cache hits)')
+    parser.add_argument('--api-base', help='use a running OpenAI-compatible server instead of an in-process fake one')
+    parser.add_argument('--latency-p50-ms', type=float, default=800)
+    parser.add_argument('--latency-p99-ms', type=float, default=3000)
+    parser.add_argument('--token-delay-ms', type=float, default=20)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=42)
+    return parser.parse_args(argv)
+
+
+class Timings:
+    """Latencies per step, collected from all user threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, step, seconds, ok=True):
+        with self.lock:
+            self.samples.setdefault(step, []).append(seconds)
+            if not ok:
+                self.errors[step] = self.errors.get(step, 0) + 1
+
+
+@contextlib.contextmanager
+def timed(timings, step):
+    started = time.perf_counter()
+    outcome = {'ok': True}
+    try:
+        yield outcome
+    except Exception:
+        outcome['ok'] = False
+        raise
+    finally:
+        timings.record(step, time.perf_counter() - started, outcome['ok'])
+
+
+def create_user(conn, index):
+    """A confirmed user of its own company, logged in by setting the session directly"""
+    cursor = conn.execute('''
+        INSERT INTO users (email_hash, company_hash, is_confirmed, company_role)
+        VALUES (?, ?, 1, 'benchmark')
+    ''', (f'benchmark-user-{index}', f'benchmark-company-{index}'))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def run_user(app, questions, options, timings, user_id, rnd):
+    client = app.test_client()
+    client.environ_base['HTTP_X_FORWARDED_PROTO'] = 'https'  # Talisman redirects plain HTTP
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+    with timed(timings, 'start_assessment') as outcome:
+        response = client.post('/start_assessment', data={'domain': options.domain})
+        outcome['ok'] = response.status_code == 200
+    assessment_id = response.get_json()['assessment_id']
+
+    responses = [{
+        'capability_id': q['capability_id'],
+        'lens_id': q['lens_id'],
+        'answer': rnd.choice(OPTIONS)
+    } for q in questions]
+    with timed(timings, 'submit_answers') as outcome:
+        response = client.post('/submit_assessment_batch', json={'assessment_id': assessment_id, 'responses': responses})
+        outcome['ok'] = response.status_code == 200
+
+    with timed(timings, 'complete_assessment') as outcome:
+        response = client.post('/complete_assessment', data={'assessment_id': assessment_id})
+        outcome['ok'] = response.status_code == 200
+
+    with timed(timings, 'results_page') as outcome:
+        response = client.get(f'/get_assessment_results/{assessment_id}')
+        outcome['ok'] = response.status_code == 200
+
+    started = time.perf_counter()
+    if options.mode == 'stream':
+        response = client.get(f'/recommendations_stream/{assessment_id}', buffered=False)
+        first_card = None
+        events = []
+        for chunk in response.iter_encoded():
+            for line in chunk.decode('utf-8').splitlines():
+                if line.startswith('event: '):
+                    events.append(line[7:])
+                    if line == 'event: card' and first_card is None:
+                        first_card = time.perf_counter() - started
+        response.close()
+        ok = bool(events) and events[-1] == 'done'
+        if first_card is not None:
+            timings.record('first_recommendation', first_card)
+        timings.record('recommendations_ready', time.perf_counter() - started, ok)
+    else:
+        ok = False
+        deadline = started + 300
+        while time.perf_counter() < deadline:
+            status = client.get(f'/recommendations_status/{assessment_id}').get_json()
+            if status['ready'] or status['status'] == 'failed':
+                ok = status['ready']
+                break
+            time.sleep(0.2)
+        timings.record('recommendations_ready', time.perf_counter() - started, ok)
+
+    with timed(timings, 'results_page_with_recommendations') as outcome:
+        response = client.get(f'/get_assessment_results/{assessment_id}')
+        outcome['ok'] = response.status_code == 200 and b'recommendation-card' in response.data
+
+
+def report(timings, wall_seconds, users, ai_metrics):
+    print("\n📊 Latency by step (ms)")
+    print("-" * 78)
+    print(f"{'step':<36}{'count':>7}{'errors':>8}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for step, samples in timings.samples.items():
+        p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+        print(f"{step:<36}{len(samples):>7}{timings.errors.get(step, 0):>8}{p50:>9.0f}{p95:>9.0f}{p99:>9.0f}")
+
+    print("\n📋 Summary:")
+    print(f"✅ {users} assessments in {wall_seconds:.1f}s: {users / wall_seconds:.2f} assessments/s")
+    if ai_metrics:
+        latency = ai_metrics['latency']
+        print(f"🤖 AI calls: {ai_metrics['calls']} ({ai_metrics['failures']} failed, {ai_metrics['retries']} retries, "
+              f"{ai_metrics['short_circuited']} short-circuited), avg {latency['avg_seconds']}s, "
+              f"breaker {ai_metrics['breaker']['state']}")
+
+
+def run_benchmark(options):
+    print("⏱️  AI Path Benchmark")
+    print("=" * 50)
+
+    fake_server = None
+    api_base = options.api_base
+    if not api_base:
+        from fake_openai_server import make_server
+        fake_server = make_server(port=0, latency_p50_ms=options.latency_p50_ms, latency_p99_ms=options.latency_p99_ms,
+                                  token_delay_ms=options.token_delay_ms, error_rate=options.error_rate,
+                                  rate_limit_rate=options.rate_limit_rate)
+        threading.Thread(target=fake_server.serve_forever, daemon=True).start()
+        api_base = f'http://127.0.0.1:{fake_server.server_port}/v1'
+    print(f"🤖 OpenAI API: {api_base}")
+
+    # Configuration is read at import time, so set it before importing the app
+    workdir = tempfile.mkdtemp(prefix='finops-benchmark-')
+    os.environ.update({
+        'DATABASE': os.path.join(workdir, 'benchmark.db'),
+        'BENCHMARK_SNAPSHOT_DIR': os.path.join(workdir, 'benchmark_snapshots'),
+        'OPENAI_API_BASE': api_base,
+        'OPENAI_API_KEY': os.environ.get('OPENAI_API_KEY') if options.api_base else 'fake-key',
+        'AI_WORKERS': str(options.workers if options.mode == 'worker' else 0),
+        'AI_STREAM_GRACE_SECONDS': '0' if options.mode == 'worker' else '300'
+    })
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        from app import app
+        from models.database import connect
+        from services.question_catalog import CATALOG
+        from services.ai_service import get_openai_client
+        from models.projections import COMPLETE_ASSESSMENT
+    app.config['TESTING'] = True
+
+    questions = [q for q in CATALOG['questions']
+                 if options.domain == COMPLETE_ASSESSMENT or q['domain'] == options.domain]
+    if not questions:
+        print(f"❌ No questions for domain {options.domain!r}")
+        return 1
+    print(f"📝 {options.users} users x {len(questions)} questions, concurrency {options.concurrency}, {options.mode} mode")
+
+    conn = connect()
+    user_ids = [create_user(conn, i) for i in range(options.users)]
+    conn.close()
+
+    timings = Timings()
+    failures = []
+
+    def run(index):
+        rnd = random.Random(options.seed if options.same_answers else options.seed + index)
+        try:
+            run_user(app, questions, options, timings, user_ids[index], rnd)
+        except Exception as e:
+            failures.append(e)
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        with ThreadPoolExecutor(max_workers=options.concurrency) as pool:
+            list(pool.map(run, range(options.users)))
+    wall_seconds = time.perf_counter() - started
+
+    report(timings, wall_seconds, options.users, get_openai_client().metrics_snapshot())
+    if failures:
+        print(f"❌ {len(failures)} users failed, e.g. {failures[0]!r}")
+    if fake_server:
+        fake_server.shutdown()
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(run_benchmark(parse_args(sys.argv[1:])))
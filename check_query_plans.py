@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Query Plan Check Script
+Runs EXPLAIN QUERY PLAN on the application's hot queries and fails when one
+of them falls back to scanning a table instead of searching an index.
+
+By default the check runs against a freshly migrated temporary database.
+Pass a database path to check the plans SQLite picks for real data
+(run ANALYZE on it first for representative statistics).
+
+Keep HOT_QUERIES in sync with the SQL in routes/ and services/.
+"""
+
+import os
+import sys
+import tempfile
+
+from models.database import connect
+from models.migrations import run_migrations
+from services.benchmark_engine import window_start
+
+WINDOW_START = window_start()
+
+# (name, sql, params)
+HOT_QUERIES = [
+    ('auth.register / auth.login: user by email', '''
+        SELECT id, is_confirmed FROM users WHERE email_hash = ?
+    ''', ('hash',)),
+    ('auth.magic_login: user by token', '''
+        SELECT id FROM users WHERE confirmation_token = ? AND is_confirmed = 1
+    ''', ('token',)),
+    ('auth.confirm_email: user by token', '''
+        SELECT id FROM users WHERE confirmation_token = ?
+    ''', ('token',)),
+    ('assessment.dashboard: user assessments', '''
+        SELECT id, scope_id, domain, status, overall_percentage, created_at, updated_at
+        FROM assessments
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+    ''', (1,)),
+    ('assessment.dashboard: platform stats', '''
+        SELECT confirmed_users, confirmed_companies, assessments_in_progress, assessments_completed
+        FROM platform_stats WHERE id = 1
+    ''', ()),
+    ('admin.dashboard_stats: completed assessment averages by domain', '''
+        SELECT domain, assessments, overall_sum FROM completed_domain_averages WHERE assessments > 0
+    ''', ()),
+    ('completed_domain_averages triggers: remove an assessment', '''
+        UPDATE completed_domain_averages SET assessments = assessments - 1, overall_sum = overall_sum - ?
+        WHERE domain = ?
+    ''', (2.5, 'Understand Usage & Cost')),
+    ('platform_stats triggers: other confirmed users of a company', '''
+        SELECT 1 FROM users WHERE is_confirmed = 1 AND company_hash = ? AND id != ?
+    ''', ('company', 1)),
+    ('assessment.get_assessment_progress: active assessment', '''
+        SELECT id, scope_id, domain, status
+        FROM assessments
+        WHERE user_id = ? AND status = 'in_progress'
+        ORDER BY created_at DESC
+        LIMIT 1
+    ''', (1,)),
+    ('assessment.get_assessment_progress: answered count and version', '''
+        SELECT COUNT(*), MAX(created_at) FROM responses WHERE assessment_id = ?
+    ''', (1,)),
+    ('assessment.get_assessment_progress: responses since version', '''
+        SELECT capability_id, lens_id, answer, score
+        FROM responses
+        WHERE assessment_id = ? AND created_at > ?
+    ''', (1, '2024-01-01')),
+    ('assessment.get_assessment_results: assessment responses', '''
+        SELECT capability_id, lens_id, answer, score, improvement_suggestions
+        FROM responses
+        WHERE assessment_id = ?
+        ORDER BY capability_id, lens_id
+    ''', (1,)),
+    ('projections.get_assessment_totals: domain totals', '''
+        SELECT domain, total_score, answered_count
+        FROM assessment_domain_totals
+        WHERE assessment_id = ? AND answered_count > 0
+    ''', (1,)),
+    ('assessment_totals triggers: domain of a capability', '''
+        UPDATE assessment_domain_totals SET total_score = total_score - 1, answered_count = answered_count - 1
+        WHERE assessment_id = ?
+        AND domain = (SELECT domain FROM capability_domains WHERE capability_id = ?)
+    ''', (1, 'allocation')),
+    ('results_snapshot.get_results: stored results', '''
+        SELECT format_version, benchmark_version, results
+        FROM assessment_results
+        WHERE assessment_id = ?
+    ''', (1,)),
+    ('utils.my_responses: user responses', '''
+        SELECT r.assessment_id, a.domain, r.capability_id, r.lens_id, r.answer, r.score
+        FROM responses r
+        JOIN assessments a ON r.assessment_id = a.id
+        WHERE a.user_id = ?
+    ''', (1,)),
+    ('utils.delete_account: user responses', '''
+        DELETE FROM responses WHERE assessment_id IN (SELECT id FROM assessments WHERE user_id = ?)
+    ''', (1,)),
+    ('admin.dashboard_stats: user completed assessments', '''
+        SELECT domain, overall_percentage
+        FROM assessments
+        WHERE user_id = ? AND status = 'completed'
+        ORDER BY created_at DESC
+    ''', (1,)),
+    ('benchmark_engine.load_company_scores: all companies', '''
+        SELECT company_hash, domain, domain_score
+        FROM company_latest_assessment
+    ''', ()),
+    ('benchmark_engine.load_benchmarks: monthly buckets in window', '''
+        SELECT capability_id, lens_id, SUM(sum_score), SUM(n)
+        FROM benchmark_monthly
+        WHERE month >= ?
+        GROUP BY capability_id, lens_id
+    ''', (WINDOW_START,)),
+    ('benchmark_engine.load_benchmarks: monthly companies in window', '''
+        SELECT domain, SUM(companies)
+        FROM benchmark_monthly_companies
+        WHERE month >= ?
+        GROUP BY domain
+    ''', (WINDOW_START,)),
+    ('benchmark_engine.load_distributions: question histograms', '''
+        SELECT capability_id, lens_id, score, companies
+        FROM score_histogram
+    ''', ()),
+    ('benchmark_engine.load_distributions: domain histograms', '''
+        SELECT domain, points, companies
+        FROM domain_score_histogram
+    ''', ()),
+    ('sketches.company_activity: sketches in window', '''
+        SELECT domain, month, sketch
+        FROM company_activity_sketch
+        WHERE month >= ? AND month <= ?
+        ORDER BY month
+    ''', (WINDOW_START, '9999-99')),
+    ('sketches.record_company_activity: domain month sketch', '''
+        SELECT sketch FROM company_activity_sketch WHERE month = ? AND domain = ?
+    ''', (WINDOW_START, '*')),
+    ('sketches.rebuild_company_activity: completed assessments in month', '''
+        SELECT u.company_hash, a.domain, a.created_at
+        FROM assessments a
+        JOIN users u ON a.user_id = u.id
+        WHERE a.status = 'completed' AND u.company_hash IS NOT NULL
+        AND a.created_at >= ? AND a.created_at < ?
+    ''', (WINDOW_START, WINDOW_START + '~')),
+    ('benchmark_snapshot.get_benchmark_snapshot: snapshot version', '''
+        SELECT source_version, snapshot_version FROM benchmark_state WHERE id = 1
+    ''', ()),
+    ('projections.refresh_company_latest: company assessments', '''
+        SELECT a.id, a.domain, a.created_at
+        FROM assessments a
+        JOIN users u ON a.user_id = u.id
+        WHERE u.company_hash = ? AND a.status = 'completed'
+        ORDER BY a.created_at DESC, a.id DESC
+    ''', ('company',)),
+    ('projections._update_company_scores: stored company scores', '''
+        SELECT capability_id, lens_id, score, month
+        FROM company_latest_scores
+        WHERE company_hash = ?
+    ''', ('company',)),
+    ('job_queue.claim_job: next due job', '''
+        SELECT id, kind, assessment_id
+        FROM jobs
+        WHERE status IN ('queued', 'running') AND run_after <= ?
+        ORDER BY run_after
+        LIMIT 1
+    ''', ('2025-01-01',)),
+    ('job_queue.claim_job: fail jobs abandoned on their last attempt', '''
+        UPDATE jobs SET status = 'failed', last_error = 'Lease expired on the last attempt', updated_at = ?
+        WHERE status = 'running' AND run_after <= ? AND attempts >= ?
+    ''', ('2025-01-01', '2025-01-01', 3)),
+    ('job_queue.claim_assessment_job: pending assessment job', '''
+        SELECT id
+        FROM jobs
+        WHERE assessment_id = ? AND kind = ?
+        AND (status = 'queued' OR (status = 'running' AND run_after <= ?))
+    ''', (1, 'recommendations', '2025-01-01')),
+    ('recommendation_cache.acquire: cached recommendations', '''
+        SELECT recommendations, lease_until > ?, created_at >= ?
+        FROM recommendation_cache
+        WHERE fingerprint = ?
+    ''', ('2025-01-01', '2025-01-01', 'fingerprint')),
+    ('recommendation_cache.store: expired entries', '''
+        SELECT fingerprint FROM recommendation_cache WHERE created_at < ? AND recommendations IS NOT NULL
+    ''', ('2025-01-01',)),
+    ('recommendation_cache.store: least recently used entries', '''
+        SELECT fingerprint FROM recommendation_cache
+        ORDER BY last_used_at DESC
+        LIMIT -1 OFFSET ?
+    ''', (10000,)),
+    ('ai_ledger.tokens_used_today: tokens since midnight', '''
+        SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0)
+        FROM ai_calls
+        WHERE created_at >= ? AND model = ?
+    ''', ('2025-01-01', 'gpt-4')),
+    ('ai_ledger.usage_report: calls in window', '''
+        SELECT substr(created_at, 1, 10) AS day, model,
+               COUNT(*), SUM(cache_hit), SUM(outcome != 'ok'),
+               SUM(prompt_tokens), SUM(completion_tokens),
+               AVG(CASE WHEN cache_hit = 0 THEN latency_ms END), MAX(latency_ms)
+        FROM ai_calls
+        WHERE created_at >= ? AND created_at < ?
+        GROUP BY day, model
+        ORDER BY day, model
+    ''', ('2025-01-01', '2025-02-01')),
+    ('rescoring.rescore_responses: next batch of responses', '''
+        SELECT id, assessment_id, capability_id, lens_id, answer, score, improvement_suggestions
+        FROM responses
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    ''', (0, 1000)),
+    ('rescoring.rescore_responses: completed assessments of a batch', '''
+        SELECT a.id, u.company_hash
+        FROM assessments a
+        LEFT JOIN users u ON a.user_id = u.id
+        WHERE a.id IN (?, ?) AND a.status = 'completed'
+    ''', (1, 2)),
+    ('job_queue.job_status: latest assessment job', '''
+        SELECT status, attempts, last_error, updated_at
+        FROM jobs
+        WHERE assessment_id = ? AND kind = ?
+        ORDER BY id DESC
+        LIMIT 1
+    ''', (1, 'recommendations')),
+]
+
+# Queries where reading a covering index in order is the intended plan
+# (aggregates over small projection tables, LRU eviction)
+COVERING_SCAN_ALLOWED = {
+    'recommendation_cache.store: least recently used entries',
+}
+
+# Bulk loads that read a whole (small) projection table by design
+FULL_READ_ALLOWED = {
+    'benchmark_engine.load_company_scores: all companies': 'company_latest_assessment',
+    'benchmark_engine.load_distributions: question histograms': 'score_histogram',
+    'benchmark_engine.load_distributions: domain histograms': 'domain_score_histogram',
+    'admin.dashboard_stats: completed assessment averages by domain': 'completed_domain_averages',
+}
+
+
+def find_scans(conn, name, sql, params):
+    """Return the plan steps of `sql` that scan a table or index"""
+    plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+    scans = [row[3] for row in plan if row[3].startswith('SCAN ')]
+    if name in COVERING_SCAN_ALLOWED:
+        scans = [step for step in scans if 'COVERING INDEX' not in step]
+    if name in FULL_READ_ALLOWED:
+        scans = [step for step in scans if step.split()[1] != FULL_READ_ALLOWED[name]]
+    return scans
+
+
+def check_query_plans(database=None):
+    """Check every hot query; return the number of regressions found"""
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(), 'query_plans.db')
+        conn = connect(database)
+        run_migrations(conn)
+    else:
+        conn = connect(database)
+
+    print("🔍 Query Plan Check")
+    print("=" * 50)
+
+    failures = 0
+    for name, sql, params in HOT_QUERIES:
+        scans = find_scans(conn, name, sql, params)
+        if scans:
+            failures += 1
+            print(f"❌ {name}")
+            for step in scans:
+                print(f"     {step}")
+        else:
+            print(f"✅ {name}")
+
+    conn.close()
+
+    print(f"\n📋 Summary:")
+    if failures:
+        print(f"❌ {failures} of {len(HOT_QUERIES)} hot queries scan a table")
+    else:
+        print(f"✅ All {len(HOT_QUERIES)} hot queries use an index")
+    return failures
+
+
+if __name__ == '__main__':
+    sys.exit(1 if check_query_plans(sys.argv[1] if len(sys.argv) > 1 else None) else 0)
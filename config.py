@@ -12,6 +12,23 @@ DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
 
 # Database Configuration
 DATABASE = os.getenv('DATABASE', 'finops_assessment.db')
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '16384'))  # per-connection page cache
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(128 * 1024 * 1024)))  # 128MB
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')  # NORMAL is durable enough under WAL
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '256'))
+MIGRATION_BATCH_SIZE = int(os.getenv('MIGRATION_BATCH_SIZE', '1000'))  # rows per committed batch
+
+# Benchmark Configuration
+BENCHMARK_WINDOW_MONTHS = int(os.getenv('BENCHMARK_WINDOW_MONTHS', '12'))  # rolling industry window
+BENCHMARK_SNAPSHOT_DIR = os.getenv('BENCHMARK_SNAPSHOT_DIR', 'benchmark_snapshots')
+COMPANY_SKETCH_ERROR = float(os.getenv('COMPANY_SKETCH_ERROR', '0.01'))  # standard error of unique-company estimates
+
+# Operator Configuration
+# Comma-separated emails allowed to read the operational endpoints
+# (/ai_metrics, /ai_usage, /company_activity) and any assessment's
+# /benchmark_distribution
+OPERATOR_EMAILS = [email.strip() for email in os.getenv('OPERATOR_EMAILS', '').split(',') if email.strip()]
 
 # File Upload Configuration
 UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
@@ -26,6 +43,39 @@ SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
+AI_CONNECT_TIMEOUT_SECONDS = float(os.getenv('AI_CONNECT_TIMEOUT_SECONDS', '5'))
+AI_REQUEST_TIMEOUT_SECONDS = float(os.getenv('AI_REQUEST_TIMEOUT_SECONDS', '60'))  # per attempt (between streamed chunks when streaming)
+AI_CALL_DEADLINE_SECONDS = float(os.getenv('AI_CALL_DEADLINE_SECONDS', '120'))  # whole call, retries included
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '3'))
+AI_RETRY_BASE_SECONDS = float(os.getenv('AI_RETRY_BASE_SECONDS', '1'))
+AI_RETRY_MAX_SECONDS = float(os.getenv('AI_RETRY_MAX_SECONDS', '20'))
+AI_POOL_CONNECTIONS = int(os.getenv('AI_POOL_CONNECTIONS', '10'))
+AI_POOL_KEEPALIVE_SECONDS = float(os.getenv('AI_POOL_KEEPALIVE_SECONDS', '60'))
+AI_BREAKER_FAILURES = int(os.getenv('AI_BREAKER_FAILURES', '5'))  # consecutive failed attempts that open the circuit
+AI_BREAKER_RESET_SECONDS = float(os.getenv('AI_BREAKER_RESET_SECONDS', '30'))
+
+# AI Budget Configuration
+AI_MODEL = os.getenv('AI_MODEL', 'gpt-4')
+AI_FALLBACK_MODEL = os.getenv('AI_FALLBACK_MODEL', 'gpt-3.5-turbo')  # once the daily budget is spent; empty = stop calling
+AI_MAX_PROMPT_TOKENS = int(os.getenv('AI_MAX_PROMPT_TOKENS', '1500'))  # longer prompts are trimmed to fit
+AI_MAX_COMPLETION_TOKENS = int(os.getenv('AI_MAX_COMPLETION_TOKENS', '1000'))
+AI_DAILY_TOKEN_BUDGET = int(os.getenv('AI_DAILY_TOKEN_BUDGET', '0'))  # tokens per day for AI_MODEL; 0 = unlimited
+
+# AI Job Queue Configuration
+AI_WORKERS = int(os.getenv('AI_WORKERS', '2'))  # worker threads per app process; 0 = run recommendation_worker.py
+AI_JOB_MAX_ATTEMPTS = int(os.getenv('AI_JOB_MAX_ATTEMPTS', '3'))
+AI_JOB_LEASE_SECONDS = int(os.getenv('AI_JOB_LEASE_SECONDS', '300'))  # a running job is retried once its lease runs out
+AI_JOB_POLL_SECONDS = float(os.getenv('AI_JOB_POLL_SECONDS', '2'))
+AI_STREAM_GRACE_SECONDS = int(os.getenv('AI_STREAM_GRACE_SECONDS', '30'))  # time the results page has to stream a job before the workers take it
+
+# AI Recommendation Cache Configuration
+AI_CACHE_TTL_DAYS = int(os.getenv('AI_CACHE_TTL_DAYS', '30'))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '10000'))
+# How long other workers wait on an in-flight generation before taking it
+# over; it must outlast the owner's call, retries and a streamed chunk
+# that ends past the deadline included, or the generation runs twice
+AI_CACHE_LEASE_SECONDS = int(os.getenv('AI_CACHE_LEASE_SECONDS') or
+                             2 * AI_CALL_DEADLINE_SECONDS + AI_REQUEST_TIMEOUT_SECONDS)
 
 # Encryption Configuration
 ENCRYPTION_KEY_FILE = os.getenv('ENCRYPTION_KEY_FILE', 'encryption.key')
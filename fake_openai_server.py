@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Fake OpenAI Server Script
+Local stand-in for the OpenAI chat completions API, for load tests and
+development without paid API calls.
+
+Usage: python fake_openai_server.py [--port 8089] [--latency-p50-ms 800] ...
+Then run the app with OPENAI_API_BASE=http://127.0.0.1:8089/v1 and any
+OPENAI_API_KEY.
+
+Replies are well-formed recommendations (Title:/Description:/Why it is
+important:/Recommendation:) for the lowest scoring areas listed in the
+prompt. Response latency follows a log-normal distribution fitted to the
+given p50 and p99; streamed replies then send a chunk every
+--token-delay-ms. Errors can be injected at given rates: 500s, 429s with
+Retry-After, and hung requests that never answer within a client timeout.
+"""
+
+import re
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+AREA_PATTERN = re.compile(r'^\s*- (.+?) \((.+?)\): Score ([\d.]+)/4', re.MULTILINE)
+CHUNK_CHARS = 16
+
+
+def latency_sampler(p50_ms, p99_ms):
+    """Log-normal latency in seconds with the given median and 99th percentile"""
+    mu = math.log(max(p50_ms, 1) / 1000)
+    sigma = max(math.log(max(p99_ms, p50_ms, 1) / max(p50_ms, 1)) / 2.326, 0)
+    return lambda: random.lognormvariate(mu, sigma)
+
+
+def fake_recommendations(prompt):
+    """Recommendations for the lowest scoring areas named in the prompt"""
+    areas = AREA_PATTERN.findall(prompt) or [('FinOps Practice', 'Knowledge', '0')]
+    blocks = []
+    for capability, lens, score in areas:
+        blocks.append(
+            f"Title: Improve {capability} ({lens})\n"
+            f"Description: Raise {capability} from its current score of {score}/4 with a focused plan for the {lens.lower()} lens.\n"
+            f"Why it is important: {capability} is one of the weakest areas of the practice and limits cost visibility and accountability.\n"
+            f"Recommendation: Name an owner for {capability}.\n"
+            f"- Agree on a target maturity level for the next quarter\n"
+            f"- Review progress monthly with engineering and finance"
+        )
+    return '\n\n'.join(blocks)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    options = None
+    sample_latency = None
+    stats = {'requests': 0, 'errors': 0, 'rate_limited': 0, 'hung': 0}
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, kind, headers=None):
+        self._send_json(status, {'error': {'message': message, 'type': kind}}, headers)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'gpt-4', 'object': 'model', 'owned_by': 'fake'}]})
+        else:
+            self._send_error(404, 'Not found', 'invalid_request_error')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_error(400, 'Invalid JSON body', 'invalid_request_error')
+            return
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_error(404, 'Not found', 'invalid_request_error')
+            return
+        self._count('requests')
+
+        # Error injection
+        roll = random.random()
+        options = self.options
+        if roll < options.error_rate:
+            self._count('errors')
+            time.sleep(self.sample_latency() / 4)
+            self._send_error(500, 'The server had an error while processing your request', 'server_error')
+            return
+        roll -= options.error_rate
+        if roll < options.rate_limit_rate:
+            self._count('rate_limited')
+            self._send_error(429, 'Rate limit reached', 'rate_limit_error', {'Retry-After': str(options.retry_after)})
+            return
+        roll -= options.rate_limit_rate
+        if roll < options.hang_rate:
+            self._count('hung')
+            time.sleep(options.hang_seconds)
+            self._send_error(504, 'Gateway timeout', 'server_error')
+            return
+
+        prompt = '\n'.join(str(m.get('content', '')) for m in request.get('messages', []))
+        content = fake_recommendations(prompt)
+        model = request.get('model', 'gpt-4')
+        completion_id = f'chatcmpl-fake-{random.getrandbits(48):012x}'
+        created = int(time.time())
+        usage = {
+            'prompt_tokens': len(prompt) // 4,
+            'completion_tokens': len(content) // 4,
+            'total_tokens': (len(prompt) + len(content)) // 4
+        }
+
+        if not request.get('stream'):
+            time.sleep(self.sample_latency())
+            self._send_json(200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': created,
+                'model': model,
+                'choices': [{
+                    'index': 0,
+                    'message': {'role': 'assistant', 'content': content},
+                    'finish_reason': 'stop'
+                }],
+                'usage': usage
+            })
+            return
+
+        # Streaming: time to first token from the latency distribution, then
+        # one chunk every token delay
+        time.sleep(self.sample_latency())
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        chunk_base = {
+            'id': completion_id,
+            'object': 'chat.completion.chunk',
+            'created': created,
+            'model': model
+        }
+
+        def send(delta, finish_reason=None):
+            chunk = dict(chunk_base, choices=[{'index': 0, 'delta': delta, 'finish_reason': finish_reason}])
+            self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            send({'role': 'assistant', 'content': ''})
+            for start in range(0, len(content), CHUNK_CHARS):
+                send({'content': content[start:start + CHUNK_CHARS]})
+                time.sleep(options.token_delay_ms / 1000)
+            send({}, 'stop')
+            if (request.get('stream_options') or {}).get('include_usage'):
+                self.wfile.write(f'data: {json.dumps(dict(chunk_base, choices=[], usage=usage))}\n\n'.encode('utf-8'))
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client went away mid-stream
+
+
+def make_server(host='127.0.0.1', port=8089, **overrides):
+    """Build a fake server (not started); keyword arguments override the command line defaults"""
+    options = parse_args([])
+    for name, value in overrides.items():
+        setattr(options, name, value)
+    handler = type('Handler', (FakeOpenAIHandler,), {
+        'options': options,
+        'sample_latency': staticmethod(latency_sampler(options.latency_p50_ms, options.latency_p99_ms)),
+        'stats': {'requests': 0, 'errors': 0, 'rate_limited': 0, 'hung': 0},
+        'stats_lock': threading.Lock()
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Fake OpenAI-compatible chat completions server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-p50-ms', type=float, default=800, help='median time to respond (first token when streaming)')
+    parser.add_argument('--latency-p99-ms', type=float, default=3000, help='99th percentile time to respond')
+    parser.add_argument('--token-delay-ms', type=float, default=20, help='delay between streamed chunks')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with a 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of requests answered with a 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds sent with 429s')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='fraction of requests that hang for --hang-seconds')
+    parser.add_argument('--hang-seconds', type=float, default=120)
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    options = parse_args(argv)
+    server = make_server(**vars(options))
+    print("🤖 Fake OpenAI Server")
+    print("=" * 50)
+    print(f"✅ Listening on http://{options.host}:{server.server_port}/v1")
+    print(f"⏱️  Latency p50 {options.latency_p50_ms:.0f}ms, p99 {options.latency_p99_ms:.0f}ms, "
+          f"{options.token_delay_ms:.0f}ms per streamed chunk")
+    if options.error_rate or options.rate_limit_rate or options.hang_rate:
+        print(f"⚠️  Injecting errors: {options.error_rate:.0%} 500s, {options.rate_limit_rate:.0%} 429s, "
+              f"{options.hang_rate:.0%} hung requests")
+    print(f"💡 Run the app with OPENAI_API_BASE=http://{options.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n🛑 Stopped after {server.RequestHandlerClass.stats['requests']} requests: "
+              f"{server.RequestHandlerClass.stats}")
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -5,140 +5,121 @@ Handles database initialization, migrations, and connection management.
 
 import sqlite3
 import os
-from config import DATABASE
+import threading
+from contextlib import contextmanager
+from flask import g, has_app_context
+from config import (
+    DATABASE, DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE,
+    DB_SYNCHRONOUS, DB_STATEMENT_CACHE_SIZE
+)
+from models.migrations import get_schema_version, latest_version, run_migrations
 
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, migrations run unguarded
+    fcntl = None
 
-def init_db():
-    """Initialize database with proper schema and handle migrations"""
-    conn = sqlite3.connect(DATABASE)
-    cursor = conn.cursor()
-    
-    # Create users table with all required columns
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email_hash TEXT UNIQUE NOT NULL,
-            company_hash TEXT,
-            confirmation_token TEXT,
-            is_confirmed BOOLEAN DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Check existing columns and add missing ones
-    cursor.execute("PRAGMA table_info(users)")
-    existing_columns = [column[1] for column in cursor.fetchall()]
-    print(f"Existing columns: {existing_columns}")
-    
-    # Add missing columns one by one
-    required_columns = {
-        'company_hash': 'TEXT',
-        'confirmation_token': 'TEXT',
-        'is_confirmed': 'BOOLEAN DEFAULT 0',
-        'created_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP',
-        'is_synthetic': 'BOOLEAN DEFAULT 0',
-        'company_role': 'TEXT'
-    }
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+# Connections used outside of a Flask app context (AI helpers, scripts, worker threads)
+_local = threading.local()
+
+
+def connect(database=None):
+    """Open a new SQLite connection in WAL mode with the configured pragmas"""
+    synchronous = DB_SYNCHRONOUS.upper()
+    if synchronous not in SYNCHRONOUS_MODES:
+        synchronous = 'NORMAL'
     
-    for column_name, column_type in required_columns.items():
-        if column_name not in existing_columns:
-            try:
-                cursor.execute(f'ALTER TABLE users ADD COLUMN {column_name} {column_type}')
-                print(f"Added {column_name} column to users table")
-            except sqlite3.Error as e:
-                print(f"Error adding {column_name} column: {e}")
+    conn = sqlite3.connect(
+        database or DATABASE,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_STATEMENT_CACHE_SIZE
+    )
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute(f'PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}')
+    # Negative cache_size is expressed in KiB rather than pages
+    conn.execute(f'PRAGMA cache_size = -{int(DB_CACHE_SIZE_KB)}')
+    conn.execute(f'PRAGMA mmap_size = {int(DB_MMAP_SIZE)}')
+    conn.execute(f'PRAGMA synchronous = {synchronous}')
+    return conn
+
+
+@contextmanager
+def migration_lock():
+    """Hold an exclusive file lock so only one worker runs migrations"""
+    lock_file = open(f"{DATABASE}.migrate.lock", 'w')
+    try:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+    finally:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def init_db():
+    """
+    Bring the database schema up to date.
     
-    # Set default values for existing users
+    Once the schema is current this is a single version check, so every
+    worker can call it on startup. Pending migrations are applied by the
+    first worker to take the migration lock; the others wait and then find
+    nothing left to do.
+    """
+    conn = connect()
     try:
-        # Set is_confirmed = 1 for existing users (assume they were confirmed)
-        cursor.execute('UPDATE users SET is_confirmed = 1 WHERE is_confirmed IS NULL OR is_confirmed = 0')
+        if get_schema_version(conn) >= latest_version():
+            return
         
-        print("Updated existing users with default values")
-    except sqlite3.Error as e:
-        print(f"Error updating existing users: {e}")
-    
-    # Create assessments table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS assessments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            scope_id TEXT NOT NULL,
-            domain TEXT,
-            status TEXT DEFAULT 'in_progress',
-            overall_percentage REAL,
-            recommendations TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-    ''')
-    
-    # Check and add missing columns to assessments table
-    cursor.execute("PRAGMA table_info(assessments)")
-    assessment_columns = [column[1] for column in cursor.fetchall()]
-    print(f"Existing assessment columns: {assessment_columns}")
-    
-    # Add missing columns to assessments table
-    assessment_required_columns = {
-        'overall_percentage': 'REAL',
-        'recommendations': 'TEXT',
-        'updated_at': 'TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
-    }
-    
-    for column_name, column_type in assessment_required_columns.items():
-        if column_name not in assessment_columns:
-            try:
-                cursor.execute(f'ALTER TABLE assessments ADD COLUMN {column_name} {column_type}')
-                print(f"Added {column_name} column to assessments table")
-            except sqlite3.Error as e:
-                print(f"Error adding {column_name} column to assessments: {e}")
-    
-    # Create responses table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS responses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            assessment_id INTEGER NOT NULL,
-            capability_id TEXT NOT NULL,
-            lens_id TEXT NOT NULL,
-            answer TEXT NOT NULL,
-            score INTEGER,
-            improvement_suggestions TEXT,
-            evidence_files TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (assessment_id) REFERENCES assessments (id)
-        )
-    ''')
-    
-    # Check and add missing columns to responses table
-    cursor.execute("PRAGMA table_info(responses)")
-    response_columns = [column[1] for column in cursor.fetchall()]
-    print(f"Existing response columns: {response_columns}")
-    
-    # Add missing columns to responses table
-    response_required_columns = {
-        'improvement_suggestions': 'TEXT',
-        'evidence_files': 'TEXT'
-    }
+        with migration_lock():
+            version = run_migrations(conn)
+        print(f"Database initialized successfully (schema version {version})")
+    finally:
+        conn.close()
+
+
+def get_db_connection():
+    """
+    Get the database connection for the current request.
     
-    for column_name, column_type in response_required_columns.items():
-        if column_name not in response_columns:
-            try:
-                cursor.execute(f'ALTER TABLE responses ADD COLUMN {column_name} {column_type}')
-                print(f"Added {column_name} column to responses table")
-            except sqlite3.Error as e:
-                print(f"Error adding {column_name} column to responses: {e}")
+    Inside a Flask app context the connection is bound to `g` and closed by
+    `close_db` on teardown. Outside of one (background threads, scripts) a
+    connection is kept per thread and released with `close_db_connection`.
+    Callers must not close the returned connection themselves.
+    """
+    if has_app_context():
+        conn = g.get('_database')
+        if conn is None:
+            conn = g._database = connect()
+        return conn
     
-    conn.commit()
-    conn.close()
-    print("Database initialized successfully")
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = connect()
+    return conn
 
 
-def get_db_connection():
-    """Get a database connection"""
-    return sqlite3.connect(DATABASE)
+def _release(conn):
+    """Roll back any unfinished transaction and close the connection"""
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+    finally:
+        conn.close()
+
+
+def close_db(exception=None):
+    """Teardown handler: close the connection bound to the app context"""
+    conn = g.pop('_database', None)
+    if conn is not None:
+        _release(conn)
 
 
-def close_db_connection(conn):
-    """Close a database connection"""
-    if conn:
-        conn.close() 
\ No newline at end of file
+def close_db_connection(conn=None):
+    """Close the per-thread connection used outside of a Flask app context"""
+    thread_conn = getattr(_local, 'conn', None)
+    if thread_conn is not None and (conn is None or conn is thread_conn):
+        _local.conn = None
+        _release(thread_conn)
@@ -0,0 +1,885 @@
+"""
+Schema Migrations for FinOps Assessment Platform
+Ordered, versioned schema and data migrations applied by init_db().
+
+Each migration runs once and is recorded in the schema_version table.
+Schema migrations run inside a single transaction. Batched migrations
+commit in small chunks so that large tables are never locked as a whole
+while other workers keep serving requests; they must be safe to resume
+if interrupted.
+"""
+
+import math
+import struct
+import sqlite3
+import hashlib
+from datetime import datetime
+from config import MIGRATION_BATCH_SIZE, COMPANY_SKETCH_ERROR
+
+MIGRATIONS = []
+
+
+def migration(version, name, batched=False):
+    """Register a migration step under the given schema version"""
+    def register(func):
+        MIGRATIONS.append({'version': version, 'name': name, 'apply': func, 'batched': batched})
+        MIGRATIONS.sort(key=lambda m: m['version'])
+        return func
+    return register
+
+
+def latest_version():
+    """Return the schema version the code expects"""
+    return MIGRATIONS[-1]['version'] if MIGRATIONS else 0
+
+
+def get_schema_version(conn):
+    """Return the schema version recorded in the database (0 if untracked)"""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def run_migrations(conn):
+    """Apply every pending migration in version order"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL
+        )
+    ''')
+    conn.commit()
+
+    current = get_schema_version(conn)
+    for step in MIGRATIONS:
+        if step['version'] <= current:
+            continue
+
+        print(f"Applying migration {step['version']}: {step['name']}")
+        if step['batched']:
+            step['apply'](conn)
+            conn.execute('BEGIN')
+        else:
+            conn.execute('BEGIN')
+            try:
+                step['apply'](conn)
+            except Exception:
+                conn.rollback()
+                raise
+        conn.execute(
+            'INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+            (step['version'], step['name'], datetime.now())
+        )
+        conn.commit()
+
+    return get_schema_version(conn)
+
+
+def run_in_batches(conn, table, statement, batch_size=None, key='id'):
+    """
+    Run `statement` over `table` in committed keyset-paginated batches.
+
+    `statement` receives the lower (exclusive) and upper (inclusive) bounds
+    of the batch's `key` range as its two parameters. Returns the number of
+    rows changed.
+    """
+    batch_size = batch_size or MIGRATION_BATCH_SIZE
+    last_key = 0
+    changed = 0
+
+    while True:
+        row = conn.execute(f'''
+            SELECT MAX({key}) FROM (
+                SELECT {key} FROM {table} WHERE {key} > ? ORDER BY {key} LIMIT ?
+            )
+        ''', (last_key, batch_size)).fetchone()
+        upper_key = row[0]
+        if upper_key is None:
+            break
+
+        cursor = conn.execute(statement, (last_key, upper_key))
+        changed += max(cursor.rowcount, 0)
+        conn.commit()
+        last_key = upper_key
+
+    return changed
+
+
+def _add_missing_columns(conn, table, columns):
+    """Add any of `columns` that a legacy table is missing"""
+    existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    for column_name, column_type in columns.items():
+        if column_name not in existing:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column_name} {column_type}')
+            print(f"Added {column_name} column to {table} table")
+
+
+@migration(1, 'baseline schema')
+def _baseline_schema(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email_hash TEXT UNIQUE NOT NULL,
+            company_hash TEXT,
+            confirmation_token TEXT,
+            is_confirmed BOOLEAN DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_synthetic BOOLEAN DEFAULT 0,
+            company_role TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS assessments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            scope_id TEXT NOT NULL,
+            domain TEXT,
+            status TEXT DEFAULT 'in_progress',
+            overall_percentage REAL,
+            recommendations TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            assessment_id INTEGER NOT NULL,
+            capability_id TEXT NOT NULL,
+            lens_id TEXT NOT NULL,
+            answer TEXT NOT NULL,
+            score INTEGER,
+            improvement_suggestions TEXT,
+            evidence_files TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (assessment_id) REFERENCES assessments (id)
+        )
+    ''')
+
+    # Databases created before schema versioning may lack later columns.
+    # SQLite cannot ADD COLUMN with a non-constant default, so timestamps
+    # added here start out NULL on existing rows.
+    _add_missing_columns(conn, 'users', {
+        'company_hash': 'TEXT',
+        'confirmation_token': 'TEXT',
+        'is_confirmed': 'BOOLEAN DEFAULT 0',
+        'created_at': 'TIMESTAMP',
+        'is_synthetic': 'BOOLEAN DEFAULT 0',
+        'company_role': 'TEXT'
+    })
+    _add_missing_columns(conn, 'assessments', {
+        'overall_percentage': 'REAL',
+        'recommendations': 'TEXT',
+        'updated_at': 'TIMESTAMP'
+    })
+    _add_missing_columns(conn, 'responses', {
+        'improvement_suggestions': 'TEXT',
+        'evidence_files': 'TEXT'
+    })
+
+
+@migration(2, 'deduplicate responses', batched=True)
+def _deduplicate_responses(conn):
+    # Keep only the latest answer per (assessment, capability, lens),
+    # one range of assessments at a time.
+    removed = run_in_batches(conn, 'assessments', '''
+        DELETE FROM responses
+        WHERE assessment_id > ?1 AND assessment_id <= ?2
+        AND id NOT IN (
+            SELECT MAX(id)
+            FROM responses
+            WHERE assessment_id > ?1 AND assessment_id <= ?2
+            GROUP BY assessment_id, capability_id, lens_id
+        )
+    ''')
+    # Responses left behind by deleted assessments would still block the
+    # unique index, so collapse those as well.
+    cursor = conn.execute('''
+        DELETE FROM responses
+        WHERE assessment_id NOT IN (SELECT id FROM assessments)
+        AND id NOT IN (
+            SELECT MAX(id)
+            FROM responses
+            WHERE assessment_id NOT IN (SELECT id FROM assessments)
+            GROUP BY assessment_id, capability_id, lens_id
+        )
+    ''')
+    conn.commit()
+    removed += max(cursor.rowcount, 0)
+    print(f"Removed {removed} duplicate responses")
+
+
+@migration(3, 'unique response per assessment, capability and lens')
+def _unique_responses(conn):
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_responses_assessment_capability_lens
+        ON responses (assessment_id, capability_id, lens_id)
+    ''')
+
+
+@migration(4, 'indexes for hot queries')
+def _hot_query_indexes(conn):
+    # Dashboard, progress and per-user lookups
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_assessments_user_status_created
+        ON assessments (user_id, status, created_at)
+    ''')
+    # Benchmarks by domain and platform status counts
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_assessments_status_domain_created
+        ON assessments (status, domain, created_at)
+    ''')
+    # Rolling-window benchmarks only ever look at completed assessments
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_assessments_completed_created
+        ON assessments (created_at) WHERE status = 'completed'
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_company_hash
+        ON users (company_hash)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_confirmed_company
+        ON users (is_confirmed, company_hash)
+    ''')
+    # Tokens are cleared after use, so only pending ones need indexing
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_confirmation_token
+        ON users (confirmation_token) WHERE confirmation_token IS NOT NULL
+    ''')
+
+
+@migration(5, 'company latest assessment projection')
+def _company_latest_assessment(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS company_latest_assessment (
+            company_hash TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            assessment_id INTEGER NOT NULL,
+            domain_score REAL,
+            created_at TIMESTAMP,
+            PRIMARY KEY (company_hash, domain)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_company_latest_domain_score
+        ON company_latest_assessment (domain, company_hash, domain_score)
+    ''')
+    # Lets projection backfills and triggers find a response's domain
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS capability_domains (
+            capability_id TEXT PRIMARY KEY,
+            domain TEXT NOT NULL
+        )
+    ''')
+    from data.capabilities import CAPABILITIES
+    conn.executemany('''
+        INSERT INTO capability_domains (capability_id, domain) VALUES (?, ?)
+        ON CONFLICT (capability_id) DO UPDATE SET domain = excluded.domain
+    ''', [(capability['id'], capability['domain']) for capability in CAPABILITIES])
+
+
+@migration(6, 'monthly benchmark buckets')
+def _benchmark_monthly(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS company_latest_scores (
+            company_hash TEXT NOT NULL,
+            capability_id TEXT NOT NULL,
+            lens_id TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            month TEXT NOT NULL,
+            PRIMARY KEY (company_hash, capability_id, lens_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS benchmark_monthly (
+            month TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            capability_id TEXT NOT NULL,
+            lens_id TEXT NOT NULL,
+            sum_score INTEGER NOT NULL,
+            n INTEGER NOT NULL,
+            PRIMARY KEY (month, domain, capability_id, lens_id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS benchmark_monthly_companies (
+            month TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            companies INTEGER NOT NULL,
+            PRIMARY KEY (month, domain)
+        )
+    ''')
+
+
+@migration(7, 'score histograms')
+def _score_histograms(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS score_histogram (
+            domain TEXT NOT NULL,
+            capability_id TEXT NOT NULL,
+            lens_id TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            companies INTEGER NOT NULL,
+            PRIMARY KEY (domain, capability_id, lens_id, score)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS domain_score_histogram (
+            domain TEXT NOT NULL,
+            points INTEGER NOT NULL,
+            companies INTEGER NOT NULL,
+            PRIMARY KEY (domain, points)
+        )
+    ''')
+
+
+@migration(8, 'benchmark snapshot state')
+def _benchmark_state(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS benchmark_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            source_version INTEGER NOT NULL,
+            snapshot_version INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO benchmark_state (id, source_version, snapshot_version) VALUES (1, 1, 0)')
+
+
+@migration(9, 'backfill benchmark projections', batched=True)
+def _backfill_benchmark_projections(conn):
+    # Frozen copy of what models/projections.py computed when this step was
+    # written: each company's latest completed assessment per domain (a
+    # complete assessment covers every domain), its capability x lens scores
+    # with the assessment's month, and the bucket and histogram counters
+    # summed from those scores.
+    for table in ('company_latest_assessment', 'company_latest_scores', 'benchmark_monthly',
+                  'benchmark_monthly_companies', 'score_histogram', 'domain_score_histogram'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.commit()
+
+    companies = [row[0] for row in conn.execute('''
+        SELECT DISTINCT company_hash FROM users WHERE company_hash IS NOT NULL ORDER BY company_hash
+    ''')]
+    for start in range(0, len(companies), MIGRATION_BATCH_SIZE):
+        bounds = (companies[start], companies[min(start + MIGRATION_BATCH_SIZE, len(companies)) - 1])
+        conn.execute('''
+            INSERT OR REPLACE INTO company_latest_assessment
+                (company_hash, domain, assessment_id, domain_score, created_at)
+            SELECT company_hash, domain, assessment_id, (
+                SELECT CAST(SUM(r.score) AS REAL) / latest.total_points * 100
+                FROM responses r
+                JOIN capability_domains c ON c.capability_id = r.capability_id
+                WHERE r.assessment_id = latest.assessment_id AND c.domain = latest.domain
+            ), created_at
+            FROM (
+                SELECT u.company_hash, d.domain, d.total_points, a.id AS assessment_id, a.created_at,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY u.company_hash, d.domain ORDER BY a.created_at DESC, a.id DESC
+                       ) AS position
+                FROM assessments a
+                JOIN users u ON a.user_id = u.id
+                JOIN (
+                    SELECT domain, COUNT(*) * 5 * 4 AS total_points FROM capability_domains GROUP BY domain
+                ) d ON a.domain IN (d.domain, 'Complete Assessment')
+                WHERE a.status = 'completed' AND u.company_hash >= ? AND u.company_hash <= ?
+            ) latest
+            WHERE position = 1
+        ''', bounds)
+        conn.execute('''
+            INSERT OR REPLACE INTO company_latest_scores (company_hash, capability_id, lens_id, score, month)
+            SELECT l.company_hash, r.capability_id, r.lens_id, CAST(ROUND(r.score) AS INTEGER),
+                   CASE WHEN l.created_at IS NULL OR l.created_at = '' THEN '0000-00'
+                        ELSE SUBSTR(l.created_at, 1, 7) END
+            FROM company_latest_assessment l
+            JOIN responses r ON r.assessment_id = l.assessment_id
+            JOIN capability_domains c ON c.capability_id = r.capability_id AND c.domain = l.domain
+            WHERE r.score IS NOT NULL AND l.company_hash >= ? AND l.company_hash <= ?
+        ''', bounds)
+        conn.commit()
+
+    # Every company has one month per domain; '*' counts it under its newest month
+    conn.execute('''
+        INSERT INTO benchmark_monthly (month, domain, capability_id, lens_id, sum_score, n)
+        SELECT s.month, c.domain, s.capability_id, s.lens_id, SUM(s.score), COUNT(*)
+        FROM company_latest_scores s
+        JOIN capability_domains c ON c.capability_id = s.capability_id
+        GROUP BY s.month, c.domain, s.capability_id, s.lens_id
+    ''')
+    conn.execute('''
+        INSERT INTO benchmark_monthly_companies (month, domain, companies)
+        SELECT month, domain, COUNT(*) FROM (
+            SELECT DISTINCT s.company_hash, s.month, c.domain
+            FROM company_latest_scores s
+            JOIN capability_domains c ON c.capability_id = s.capability_id
+        )
+        GROUP BY month, domain
+        UNION ALL
+        SELECT month, '*', COUNT(*) FROM (
+            SELECT company_hash, MAX(month) AS month FROM company_latest_scores GROUP BY company_hash
+        )
+        GROUP BY month
+    ''')
+    conn.execute('''
+        INSERT INTO score_histogram (domain, capability_id, lens_id, score, companies)
+        SELECT c.domain, s.capability_id, s.lens_id, s.score, COUNT(*)
+        FROM company_latest_scores s
+        JOIN capability_domains c ON c.capability_id = s.capability_id
+        GROUP BY c.domain, s.capability_id, s.lens_id, s.score
+    ''')
+    conn.execute('''
+        INSERT INTO domain_score_histogram (domain, points, companies)
+        SELECT domain, points, COUNT(*) FROM (
+            SELECT s.company_hash, c.domain, SUM(s.score) AS points
+            FROM company_latest_scores s
+            JOIN capability_domains c ON c.capability_id = s.capability_id
+            GROUP BY s.company_hash, c.domain
+        )
+        GROUP BY domain, points
+    ''')
+    conn.execute('UPDATE benchmark_state SET source_version = source_version + 1 WHERE id = 1')
+    conn.commit()
+    print(f"Projected latest assessments and benchmarks for {len(companies)} companies")
+
+
+@migration(10, 'platform statistics counters')
+def _platform_stats(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS platform_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            confirmed_users INTEGER NOT NULL DEFAULT 0,
+            confirmed_companies INTEGER NOT NULL DEFAULT 0,
+            assessments_in_progress INTEGER NOT NULL DEFAULT 0,
+            assessments_completed INTEGER NOT NULL DEFAULT 0,
+            reconciled_at TIMESTAMP
+        )
+    ''')
+    conn.execute('INSERT OR IGNORE INTO platform_stats (id) VALUES (1)')
+
+    # Every write path goes through these triggers, including ad hoc
+    # maintenance. A company is counted while it has a confirmed user.
+    # IS comparisons keep NULL flags from turning the sums into NULL.
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS platform_stats_users_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE platform_stats SET
+                confirmed_users = confirmed_users + (NEW.is_confirmed IS 1),
+                confirmed_companies = confirmed_companies + (
+                    NEW.is_confirmed IS 1 AND NEW.company_hash IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM users
+                        WHERE is_confirmed = 1 AND company_hash = NEW.company_hash AND id != NEW.id
+                    )
+                )
+            WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS platform_stats_users_update AFTER UPDATE OF is_confirmed, company_hash ON users
+        BEGIN
+            UPDATE platform_stats SET
+                confirmed_users = confirmed_users - (OLD.is_confirmed IS 1) + (NEW.is_confirmed IS 1),
+                confirmed_companies = confirmed_companies - (
+                    OLD.is_confirmed IS 1 AND OLD.company_hash IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM users
+                        WHERE is_confirmed = 1 AND company_hash = OLD.company_hash AND id != OLD.id
+                    )
+                ) + (
+                    NEW.is_confirmed IS 1 AND NEW.company_hash IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM users
+                        WHERE is_confirmed = 1 AND company_hash = NEW.company_hash AND id != NEW.id
+                    )
+                )
+            WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS platform_stats_users_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE platform_stats SET
+                confirmed_users = confirmed_users - (OLD.is_confirmed IS 1),
+                confirmed_companies = confirmed_companies - (
+                    OLD.is_confirmed IS 1 AND OLD.company_hash IS NOT NULL AND NOT EXISTS (
+                        SELECT 1 FROM users
+                        WHERE is_confirmed = 1 AND company_hash = OLD.company_hash
+                    )
+                )
+            WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS platform_stats_assessments_insert AFTER INSERT ON assessments
+        BEGIN
+            UPDATE platform_stats SET
+                assessments_in_progress = assessments_in_progress + (NEW.status IS 'in_progress'),
+                assessments_completed = assessments_completed + (NEW.status IS 'completed')
+            WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS platform_stats_assessments_update AFTER UPDATE OF status ON assessments
+        BEGIN
+            UPDATE platform_stats SET
+                assessments_in_progress = assessments_in_progress
+                    - (OLD.status IS 'in_progress') + (NEW.status IS 'in_progress'),
+                assessments_completed = assessments_completed
+                    - (OLD.status IS 'completed') + (NEW.status IS 'completed')
+            WHERE id = 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS platform_stats_assessments_delete AFTER DELETE ON assessments
+        BEGIN
+            UPDATE platform_stats SET
+                assessments_in_progress = assessments_in_progress - (OLD.status IS 'in_progress'),
+                assessments_completed = assessments_completed - (OLD.status IS 'completed')
+            WHERE id = 1;
+        END
+    ''')
+
+    # Start the counters from the current rows
+    conn.execute('''
+        UPDATE platform_stats SET
+            confirmed_users = (SELECT COUNT(*) FROM users WHERE is_confirmed = 1),
+            confirmed_companies = (SELECT COUNT(DISTINCT company_hash) FROM users WHERE is_confirmed = 1),
+            assessments_in_progress = (SELECT COUNT(*) FROM assessments WHERE status = 'in_progress'),
+            assessments_completed = (SELECT COUNT(*) FROM assessments WHERE status = 'completed'),
+            reconciled_at = ?
+        WHERE id = 1
+    ''', (datetime.now(),))
+
+
+@migration(11, 'company activity sketches')
+def _company_activity_sketch(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS company_activity_sketch (
+            month TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            sketch BLOB NOT NULL,
+            PRIMARY KEY (month, domain)
+        )
+    ''')
+    # Frozen copy of the sketch format when this step was written: every
+    # (domain, month) starts as an exact sparse sketch, b'S', the register
+    # precision and the sorted big-endian 64-bit blake2b hashes of its
+    # companies. A complete assessment counts for every domain and '*'.
+    precision = min(max(math.ceil(math.log2((1.04 / COMPANY_SKETCH_ERROR) ** 2)), 4), 18)
+    domains = [row[0] for row in conn.execute('SELECT DISTINCT domain FROM capability_domains')]
+    companies = {}
+    for company_hash, domain, created_at in conn.execute('''
+        SELECT u.company_hash, a.domain, a.created_at
+        FROM assessments a
+        JOIN users u ON a.user_id = u.id
+        WHERE a.status = 'completed' AND u.company_hash IS NOT NULL
+    '''):
+        month = str(created_at)[:7] if created_at else '0000-00'
+        company = int.from_bytes(hashlib.blake2b(company_hash.encode('utf-8'), digest_size=8).digest(), 'big')
+        for covered in (domains if domain == 'Complete Assessment' else [domain]) + ['*']:
+            companies.setdefault((covered, month), set()).add(company)
+    conn.executemany('''
+        INSERT INTO company_activity_sketch (month, domain, sketch) VALUES (?, ?, ?)
+        ON CONFLICT (month, domain) DO UPDATE SET sketch = excluded.sketch
+    ''', [
+        (month, domain, b'S' + bytes([precision]) + struct.pack(f'>{len(hashes)}Q', *sorted(hashes)))
+        for (domain, month), hashes in companies.items()
+    ])
+    print(f"Built {len(companies)} company activity sketches")
+
+
+@migration(12, 'assessment running totals')
+def _assessment_totals(conn):
+    _add_missing_columns(conn, 'assessments', {
+        'total_score': 'INTEGER NOT NULL DEFAULT 0',
+        'answered_count': 'INTEGER NOT NULL DEFAULT 0'
+    })
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS assessment_domain_totals (
+            assessment_id INTEGER NOT NULL,
+            domain TEXT NOT NULL,
+            total_score INTEGER NOT NULL DEFAULT 0,
+            answered_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (assessment_id, domain)
+        )
+    ''')
+    # Every answer upsert, rescore and deletion moves the totals in the
+    # same transaction. Domain rows that drop to no answers are removed.
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS assessment_totals_responses_insert AFTER INSERT ON responses
+        BEGIN
+            UPDATE assessments SET
+                total_score = total_score + COALESCE(NEW.score, 0),
+                answered_count = answered_count + 1
+            WHERE id = NEW.assessment_id;
+            INSERT INTO assessment_domain_totals (assessment_id, domain, total_score, answered_count)
+            SELECT NEW.assessment_id, domain, COALESCE(NEW.score, 0), 1
+            FROM capability_domains WHERE capability_id = NEW.capability_id
+            ON CONFLICT (assessment_id, domain) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                answered_count = answered_count + 1;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS assessment_totals_responses_update
+        AFTER UPDATE OF assessment_id, capability_id, score ON responses
+        BEGIN
+            UPDATE assessments SET
+                total_score = total_score - COALESCE(OLD.score, 0),
+                answered_count = answered_count - 1
+            WHERE id = OLD.assessment_id;
+            UPDATE assessments SET
+                total_score = total_score + COALESCE(NEW.score, 0),
+                answered_count = answered_count + 1
+            WHERE id = NEW.assessment_id;
+            UPDATE assessment_domain_totals SET
+                total_score = total_score - COALESCE(OLD.score, 0),
+                answered_count = answered_count - 1
+            WHERE assessment_id = OLD.assessment_id
+            AND domain = (SELECT domain FROM capability_domains WHERE capability_id = OLD.capability_id);
+            INSERT INTO assessment_domain_totals (assessment_id, domain, total_score, answered_count)
+            SELECT NEW.assessment_id, domain, COALESCE(NEW.score, 0), 1
+            FROM capability_domains WHERE capability_id = NEW.capability_id
+            ON CONFLICT (assessment_id, domain) DO UPDATE SET
+                total_score = total_score + excluded.total_score,
+                answered_count = answered_count + 1;
+            DELETE FROM assessment_domain_totals
+            WHERE assessment_id = OLD.assessment_id AND answered_count = 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS assessment_totals_responses_delete AFTER DELETE ON responses
+        BEGIN
+            UPDATE assessments SET
+                total_score = total_score - COALESCE(OLD.score, 0),
+                answered_count = answered_count - 1
+            WHERE id = OLD.assessment_id;
+            UPDATE assessment_domain_totals SET
+                total_score = total_score - COALESCE(OLD.score, 0),
+                answered_count = answered_count - 1
+            WHERE assessment_id = OLD.assessment_id
+            AND domain = (SELECT domain FROM capability_domains WHERE capability_id = OLD.capability_id);
+            DELETE FROM assessment_domain_totals
+            WHERE assessment_id = OLD.assessment_id AND answered_count = 0;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS assessment_totals_assessments_delete AFTER DELETE ON assessments
+        BEGIN
+            DELETE FROM assessment_domain_totals WHERE assessment_id = OLD.id;
+        END
+    ''')
+
+
+@migration(13, 'backfill assessment running totals', batched=True)
+def _backfill_assessment_totals(conn):
+    ids = [row[0] for row in conn.execute('SELECT id FROM assessments ORDER BY id')]
+    for start in range(0, len(ids), MIGRATION_BATCH_SIZE):
+        bounds = (ids[start] - 1, ids[min(start + MIGRATION_BATCH_SIZE, len(ids)) - 1])
+        conn.execute('''
+            UPDATE assessments SET
+                total_score = COALESCE((SELECT SUM(score) FROM responses WHERE assessment_id = assessments.id), 0),
+                answered_count = (SELECT COUNT(*) FROM responses WHERE assessment_id = assessments.id)
+            WHERE id > ? AND id <= ?
+        ''', bounds)
+        conn.execute('''
+            DELETE FROM assessment_domain_totals WHERE assessment_id > ? AND assessment_id <= ?
+        ''', bounds)
+        conn.execute('''
+            INSERT INTO assessment_domain_totals (assessment_id, domain, total_score, answered_count)
+            SELECT r.assessment_id, c.domain, COALESCE(SUM(r.score), 0), COUNT(*)
+            FROM responses r
+            JOIN capability_domains c ON c.capability_id = r.capability_id
+            WHERE r.assessment_id > ? AND r.assessment_id <= ?
+            GROUP BY r.assessment_id, c.domain
+        ''', bounds)
+        conn.commit()
+    print(f"Computed running totals for {len(ids)} assessments")
+
+
+@migration(14, 'materialized assessment results')
+def _assessment_results(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS assessment_results (
+            assessment_id INTEGER PRIMARY KEY,
+            format_version INTEGER NOT NULL,
+            benchmark_version INTEGER NOT NULL,
+            results TEXT NOT NULL,
+            updated_at TIMESTAMP
+        )
+    ''')
+    # Any change to an assessment or its responses drops its snapshot; the
+    # next view rebuilds it (see services/results_snapshot.py)
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS assessment_results_assessments_update
+        AFTER UPDATE OF scope_id, domain, status, overall_percentage, recommendations ON assessments
+        BEGIN
+            DELETE FROM assessment_results WHERE assessment_id = NEW.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS assessment_results_assessments_delete AFTER DELETE ON assessments
+        BEGIN
+            DELETE FROM assessment_results WHERE assessment_id = OLD.id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS assessment_results_responses_insert AFTER INSERT ON responses
+        BEGIN
+            DELETE FROM assessment_results WHERE assessment_id = NEW.assessment_id;
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS assessment_results_responses_update AFTER UPDATE ON responses
+        BEGIN
+            DELETE FROM assessment_results WHERE assessment_id IN (OLD.assessment_id, NEW.assessment_id);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS assessment_results_responses_delete AFTER DELETE ON responses
+        BEGIN
+            DELETE FROM assessment_results WHERE assessment_id = OLD.assessment_id;
+        END
+    ''')
+
+
+@migration(15, 'background job queue')
+def _job_queue(conn):
+    # run_after is when a queued job may start, and for a running job when
+    # its lease expires and another worker may pick it up again
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            assessment_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after TIMESTAMP NOT NULL,
+            worker TEXT,
+            last_error TEXT,
+            created_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after
+        ON jobs (status, run_after)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_assessment_kind
+        ON jobs (assessment_id, kind, id)
+    ''')
+    # At most one pending job of a kind per assessment
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_pending
+        ON jobs (kind, assessment_id) WHERE status IN ('queued', 'running')
+    ''')
+
+
+
+@migration(16, 'recommendation cache')
+def _recommendation_cache(conn):
+    # One row per distinct AI request. A row without recommendations is a
+    # generation in flight, held until lease_until by the worker running it.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS recommendation_cache (
+            fingerprint TEXT PRIMARY KEY,
+            recommendations TEXT,
+            lease_until TIMESTAMP,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP,
+            last_used_at TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recommendation_cache_last_used
+        ON recommendation_cache (last_used_at, fingerprint)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_recommendation_cache_created
+        ON recommendation_cache (created_at)
+    ''')
+
+
+@migration(17, 'AI call ledger')
+def _ai_call_ledger(conn):
+    # One row per recommendation request: an API call, or a cache hit
+    # (no tokens). outcome is 'ok' or the error's class name.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ai_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            assessment_id INTEGER,
+            model TEXT NOT NULL,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            latency_ms INTEGER NOT NULL DEFAULT 0,
+            outcome TEXT NOT NULL,
+            cache_hit BOOLEAN NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ai_calls_created
+        ON ai_calls (created_at)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ai_calls_assessment
+        ON ai_calls (assessment_id)
+    ''')
+
+
+@migration(18, 'structured recommendations')
+def _structured_recommendations(conn):
+    # Rows stored before this are parsed from the text when read; run
+    # `python rebuild_projections.py recommendations` to store them parsed
+    _add_missing_columns(conn, 'assessments', {'recommendations_json': 'TEXT'})
+
+
+@migration(19, 'completed assessment averages by domain')
+def _completed_domain_averages(conn):
+    # Sum and count of overall_percentage over completed assessments per
+    # assessments.domain, for the dashboard chart's industry series (the
+    # AVG(overall_percentage) ... GROUP BY domain it used to run per request)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS completed_domain_averages (
+            domain TEXT PRIMARY KEY,
+            assessments INTEGER NOT NULL DEFAULT 0,
+            overall_sum REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    add_new = '''
+            INSERT INTO completed_domain_averages (domain, assessments, overall_sum)
+            SELECT NEW.domain, 1, NEW.overall_percentage
+            WHERE NEW.status IS 'completed' AND NEW.domain IS NOT NULL AND NEW.overall_percentage IS NOT NULL
+            ON CONFLICT (domain) DO UPDATE SET
+                assessments = assessments + 1,
+                overall_sum = overall_sum + excluded.overall_sum;
+    '''
+    remove_old = '''
+            UPDATE completed_domain_averages SET
+                assessments = assessments - 1,
+                overall_sum = overall_sum - OLD.overall_percentage
+            WHERE domain = OLD.domain AND OLD.status IS 'completed' AND OLD.overall_percentage IS NOT NULL;
+    '''
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS completed_domain_averages_insert AFTER INSERT ON assessments
+        BEGIN{add_new}END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS completed_domain_averages_update
+        AFTER UPDATE OF status, domain, overall_percentage ON assessments
+        BEGIN{remove_old}{add_new}END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS completed_domain_averages_delete AFTER DELETE ON assessments
+        BEGIN{remove_old}END
+    ''')
+
+    conn.execute('''
+        INSERT OR REPLACE INTO completed_domain_averages (domain, assessments, overall_sum)
+        SELECT domain, COUNT(overall_percentage), COALESCE(SUM(overall_percentage), 0)
+        FROM assessments
+        WHERE status = 'completed' AND domain IS NOT NULL
+        GROUP BY domain
+    ''')
@@ -0,0 +1,356 @@
+"""
+Read Projections for FinOps Assessment Platform
+Tables derived from assessments and responses that are kept up to date on
+write so that benchmark pages can be served with a single indexed read.
+
+company_latest_assessment  latest completed assessment per company and domain
+company_latest_scores      the company-level score per capability x lens taken
+                           from those assessments, with the assessment's month
+benchmark_monthly          sum and count of company-level scores per month,
+                           capability and lens; a rolling window is the sum
+                           of its month buckets
+benchmark_monthly_companies
+                           companies per month and domain ('*' = any domain,
+                           keyed by the company's newest month)
+score_histogram            companies per capability x lens and score (0-4)
+domain_score_histogram     companies per domain and total domain points
+benchmark_state            version of the tables above, bumped on every
+                           change (see services/benchmark_snapshot.py)
+platform_stats             dashboard counters, kept current by triggers on
+                           users and assessments and reconciled periodically
+assessment_domain_totals   score sum and answer count per assessment and
+                           domain; with assessments.total_score and
+                           answered_count, kept current by triggers on
+                           responses
+
+Every company has exactly one month per domain, so bucket counts stay
+additive. Buckets are updated from the difference between a company's
+stored and recomputed scores, which keeps them (and the histograms) exact
+when an assessment completes, a response is rescored or an account is
+deleted.
+"""
+
+from datetime import datetime
+from data.capabilities import CAPABILITIES, DOMAINS
+
+COMPLETE_ASSESSMENT = 'Complete Assessment'
+
+# capability_id -> domain, and maximum points per domain (5 lenses x 4 points)
+CAPABILITY_DOMAINS = {c['id']: c['domain'] for c in CAPABILITIES}
+DOMAIN_TOTAL_POINTS = {d: sum(1 for c in CAPABILITIES if c['domain'] == d) * 5 * 4 for d in DOMAINS}
+
+ALL_DOMAINS = '*'
+UNDATED_MONTH = '0000-00'
+
+
+def month_of(created_at):
+    """Benchmark bucket ('YYYY-MM') for an assessment timestamp"""
+    if not created_at:
+        return UNDATED_MONTH
+    return str(created_at)[:7]
+
+
+def refresh_company_latest(conn, company_hash):
+    """
+    Recompute company_latest_assessment rows for one company.
+
+    For every domain this records the company's most recent completed
+    assessment covering it (domain-specific or complete) and the company's
+    maturity percentage in that domain. Runs inside the caller's
+    transaction; the caller commits.
+    """
+    if company_hash is None:
+        return
+
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT a.id, a.domain, a.created_at
+        FROM assessments a
+        JOIN users u ON a.user_id = u.id
+        WHERE u.company_hash = ? AND a.status = 'completed'
+        ORDER BY a.created_at DESC, a.id DESC
+    ''', (company_hash,))
+    assessments = cursor.fetchall()
+
+    latest = {}
+    for assessment_id, domain, created_at in assessments:
+        covered = DOMAINS if domain == COMPLETE_ASSESSMENT else [domain]
+        for covered_domain in covered:
+            if covered_domain in DOMAIN_TOTAL_POINTS and covered_domain not in latest:
+                latest[covered_domain] = (assessment_id, created_at)
+        if len(latest) == len(DOMAINS):
+            break
+
+    domain_sums = {}
+    scores = {}
+    assessment_ids = sorted({assessment_id for assessment_id, _ in latest.values()})
+    if assessment_ids:
+        placeholders = ','.join('?' * len(assessment_ids))
+        cursor.execute(f'''
+            SELECT assessment_id, capability_id, lens_id, score
+            FROM responses
+            WHERE assessment_id IN ({placeholders})
+        ''', assessment_ids)
+        for assessment_id, capability_id, lens_id, score in cursor.fetchall():
+            domain = CAPABILITY_DOMAINS.get(capability_id)
+            if domain in latest and latest[domain][0] == assessment_id and score is not None:
+                domain_sums[domain] = domain_sums.get(domain, 0) + score
+                scores[(capability_id, lens_id)] = (round(score), month_of(latest[domain][1]))
+
+    _update_company_scores(conn, company_hash, scores)
+
+    cursor.execute('DELETE FROM company_latest_assessment WHERE company_hash = ?', (company_hash,))
+    cursor.executemany('''
+        INSERT INTO company_latest_assessment (company_hash, domain, assessment_id, domain_score, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (
+            company_hash,
+            domain,
+            assessment_id,
+            (domain_sums[domain] / DOMAIN_TOTAL_POINTS[domain]) * 100 if domain in domain_sums else None,
+            created_at
+        )
+        for domain, (assessment_id, created_at) in latest.items()
+    ])
+
+
+def _company_months(scores):
+    """(month, domain) keys a company is counted under, given its scores"""
+    keys = {(month, CAPABILITY_DOMAINS[capability_id]) for (capability_id, _), (_, month) in scores.items()}
+    if keys:
+        keys.add((max(month for month, _ in keys), ALL_DOMAINS))
+    return keys
+
+
+def _domain_points(scores):
+    """Total points per domain, given a company's scores"""
+    points = {}
+    for (capability_id, _), (score, _) in scores.items():
+        domain = CAPABILITY_DOMAINS[capability_id]
+        points[domain] = points.get(domain, 0) + score
+    return points
+
+
+def _apply_counter_deltas(conn, table, key_columns, counter_columns, deltas):
+    """Add {key: counters} deltas to a counter table, dropping rows whose last counter reaches zero"""
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    keys = ', '.join(key_columns)
+    counters = ', '.join(counter_columns)
+    placeholders = ', '.join('?' * (len(key_columns) + len(counter_columns)))
+    updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in counter_columns)
+    conn.executemany(f'''
+        INSERT INTO {table} ({keys}, {counters}) VALUES ({placeholders})
+        ON CONFLICT ({keys}) DO UPDATE SET {updates}
+    ''', [key + delta for key, delta in deltas.items()])
+    match = ' AND '.join(f'{column} = ?' for column in key_columns)
+    conn.executemany(f'''
+        DELETE FROM {table} WHERE {match} AND {counter_columns[-1]} = 0
+    ''', list(deltas))
+
+
+def _add_delta(deltas, key, delta):
+    current = deltas.get(key, (0,) * len(delta))
+    deltas[key] = tuple(a + b for a, b in zip(current, delta))
+
+
+def _update_company_scores(conn, company_hash, scores):
+    """Replace a company's stored scores and apply the difference to the derived counters"""
+    previous = {
+        (capability_id, lens_id): (score, month)
+        for capability_id, lens_id, score, month in conn.execute('''
+            SELECT capability_id, lens_id, score, month
+            FROM company_latest_scores
+            WHERE company_hash = ?
+        ''', (company_hash,))
+    }
+    if previous == scores:
+        return
+
+    cell_deltas = {}
+    histogram_deltas = {}
+    for sign, cells, other in ((-1, previous, scores), (1, scores, previous)):
+        for (capability_id, lens_id), (score, month) in cells.items():
+            if other.get((capability_id, lens_id)) != (score, month):
+                domain = CAPABILITY_DOMAINS[capability_id]
+                _add_delta(cell_deltas, (month, domain, capability_id, lens_id), (sign * score, sign))
+                _add_delta(histogram_deltas, (domain, capability_id, lens_id, score), (sign,))
+
+    company_deltas = {}
+    for sign, months, other in ((-1, _company_months(previous), _company_months(scores)),
+                                (1, _company_months(scores), _company_months(previous))):
+        for key in months - other:
+            _add_delta(company_deltas, key, (sign,))
+
+    points_deltas = {}
+    for sign, points, other in ((-1, _domain_points(previous), _domain_points(scores)),
+                                (1, _domain_points(scores), _domain_points(previous))):
+        for domain, domain_points in points.items():
+            if other.get(domain) != domain_points:
+                _add_delta(points_deltas, (domain, domain_points), (sign,))
+
+    _apply_counter_deltas(conn, 'benchmark_monthly', ('month', 'domain', 'capability_id', 'lens_id'),
+                          ('sum_score', 'n'), cell_deltas)
+    _apply_counter_deltas(conn, 'benchmark_monthly_companies', ('month', 'domain'), ('companies',), company_deltas)
+    _apply_counter_deltas(conn, 'score_histogram', ('domain', 'capability_id', 'lens_id', 'score'),
+                          ('companies',), histogram_deltas)
+    _apply_counter_deltas(conn, 'domain_score_histogram', ('domain', 'points'), ('companies',), points_deltas)
+    conn.execute('UPDATE benchmark_state SET source_version = source_version + 1 WHERE id = 1')
+
+    conn.execute('DELETE FROM company_latest_scores WHERE company_hash = ?', (company_hash,))
+    conn.executemany('''
+        INSERT INTO company_latest_scores (company_hash, capability_id, lens_id, score, month)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [
+        (company_hash, capability_id, lens_id, score, month)
+        for (capability_id, lens_id), (score, month) in scores.items()
+    ])
+
+
+def refresh_assessment_company(conn, assessment_id):
+    """Refresh the projection for the company owning an assessment"""
+    row = conn.execute('''
+        SELECT u.company_hash
+        FROM assessments a
+        JOIN users u ON a.user_id = u.id
+        WHERE a.id = ?
+    ''', (assessment_id,)).fetchone()
+    if row:
+        refresh_company_latest(conn, row[0])
+
+
+def rebuild_company_latest(conn, batch_size=500):
+    """Rebuild company_latest_assessment for every company, committing per batch"""
+    companies = [row[0] for row in conn.execute('''
+        SELECT DISTINCT company_hash FROM users WHERE company_hash IS NOT NULL
+        UNION
+        SELECT DISTINCT company_hash FROM company_latest_scores
+        UNION
+        SELECT DISTINCT company_hash FROM company_latest_assessment
+        ORDER BY company_hash
+    ''')]
+    for start in range(0, len(companies), batch_size):
+        for company_hash in companies[start:start + batch_size]:
+            refresh_company_latest(conn, company_hash)
+        conn.commit()
+    return len(companies)
+
+
+def rebuild_company_scores(conn, batch_size=500):
+    """Recompute company scores, monthly benchmark buckets and histograms from scratch"""
+    for table in ('company_latest_scores', 'benchmark_monthly', 'benchmark_monthly_companies',
+                  'score_histogram', 'domain_score_histogram'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.execute('UPDATE benchmark_state SET source_version = source_version + 1 WHERE id = 1')
+    conn.commit()
+    return rebuild_company_latest(conn, batch_size=batch_size)
+
+
+PLATFORM_STATS = ('confirmed_users', 'confirmed_companies', 'assessments_in_progress', 'assessments_completed')
+
+
+def get_platform_stats(conn):
+    """Return the dashboard counters as a dict"""
+    row = conn.execute(f'''
+        SELECT {', '.join(PLATFORM_STATS)} FROM platform_stats WHERE id = 1
+    ''').fetchone()
+    return dict(zip(PLATFORM_STATS, row or (0,) * len(PLATFORM_STATS)))
+
+
+def reconcile_platform_stats(conn):
+    """
+    Recount the dashboard counters from the base tables and correct any
+    drift. Runs inside the caller's transaction; returns {counter: drift}
+    for the counters that were off.
+    """
+    actual = {
+        'confirmed_users': conn.execute(
+            'SELECT COUNT(*) FROM users WHERE is_confirmed = 1').fetchone()[0],
+        'confirmed_companies': conn.execute(
+            'SELECT COUNT(DISTINCT company_hash) FROM users WHERE is_confirmed = 1').fetchone()[0],
+        'assessments_in_progress': conn.execute(
+            "SELECT COUNT(*) FROM assessments WHERE status = 'in_progress'").fetchone()[0],
+        'assessments_completed': conn.execute(
+            "SELECT COUNT(*) FROM assessments WHERE status = 'completed'").fetchone()[0]
+    }
+    stored = get_platform_stats(conn)
+    conn.execute(f'''
+        UPDATE platform_stats SET {', '.join(f'{name} = ?' for name in PLATFORM_STATS)}, reconciled_at = ?
+        WHERE id = 1
+    ''', [actual[name] for name in PLATFORM_STATS] + [datetime.now()])
+    return {name: stored[name] - actual[name] for name in PLATFORM_STATS if stored[name] != actual[name]}
+
+
+def get_completed_domain_averages(conn):
+    """Average overall_percentage of completed assessments per assessment domain"""
+    return {
+        domain: overall_sum / assessments
+        for domain, assessments, overall_sum in conn.execute('''
+            SELECT domain, assessments, overall_sum FROM completed_domain_averages WHERE assessments > 0
+        ''')
+    }
+
+
+def rebuild_completed_domain_averages(conn):
+    """Recompute completed_domain_averages from the assessments; returns the number of domains"""
+    conn.execute('DELETE FROM completed_domain_averages')
+    cursor = conn.execute('''
+        INSERT INTO completed_domain_averages (domain, assessments, overall_sum)
+        SELECT domain, COUNT(overall_percentage), COALESCE(SUM(overall_percentage), 0)
+        FROM assessments
+        WHERE status = 'completed' AND domain IS NOT NULL
+        GROUP BY domain
+    ''')
+    conn.commit()
+    return cursor.rowcount
+
+
+def get_assessment_totals(conn, assessment_id):
+    """
+    Running totals of an assessment: {'total_score', 'answered_count',
+    'domains': {domain: {'total_score', 'count', 'average'}}}
+    """
+    row = conn.execute('''
+        SELECT total_score, answered_count FROM assessments WHERE id = ?
+    ''', (assessment_id,)).fetchone()
+    domains = {
+        domain: {'total_score': total_score, 'count': count, 'average': total_score / count}
+        for domain, total_score, count in conn.execute('''
+            SELECT domain, total_score, answered_count
+            FROM assessment_domain_totals
+            WHERE assessment_id = ? AND answered_count > 0
+        ''', (assessment_id,))
+    }
+    return {
+        'total_score': row[0] if row else 0,
+        'answered_count': row[1] if row else 0,
+        'domains': {domain: domains[domain] for domain in DOMAINS if domain in domains}
+    }
+
+
+def rebuild_assessment_totals(conn, batch_size=500):
+    """Recompute every assessment's running totals from its responses, committing per batch"""
+    ids = [row[0] for row in conn.execute('SELECT id FROM assessments ORDER BY id')]
+    for start in range(0, len(ids), batch_size):
+        bounds = (ids[start] - 1, ids[min(start + batch_size, len(ids)) - 1])
+        conn.execute('''
+            UPDATE assessments SET
+                total_score = COALESCE((SELECT SUM(score) FROM responses WHERE assessment_id = assessments.id), 0),
+                answered_count = (SELECT COUNT(*) FROM responses WHERE assessment_id = assessments.id)
+            WHERE id > ? AND id <= ?
+        ''', bounds)
+        conn.execute('''
+            DELETE FROM assessment_domain_totals WHERE assessment_id > ? AND assessment_id <= ?
+        ''', bounds)
+        conn.execute('''
+            INSERT INTO assessment_domain_totals (assessment_id, domain, total_score, answered_count)
+            SELECT r.assessment_id, c.domain, COALESCE(SUM(r.score), 0), COUNT(*)
+            FROM responses r
+            JOIN capability_domains c ON c.capability_id = r.capability_id
+            WHERE r.assessment_id > ? AND r.assessment_id <= ?
+            GROUP BY r.assessment_id, c.domain
+        ''', bounds)
+        conn.commit()
+    return len(ids)
@@ -0,0 +1,255 @@
+"""
+Company Activity Sketches for FinOps Assessment Platform
+Mergeable distinct counts of companies that completed assessments, per
+domain and month, for windows that do not end today (trend charts).
+
+Each (domain, month) keeps a HyperLogLog sketch of the companies whose
+completed assessments were created that month. Small sketches stay in an
+exact sparse mode (the sorted 64-bit company hashes) and switch to dense
+HLL registers once those would be smaller; any window's count is the
+merge of its month sketches. Register precision follows the configured
+standard error (1.04 / sqrt(2^p)). Sparse sketches are read at the
+configured precision; dense sketches of another precision are folded down
+to the lower one when merged, so changing COMPANY_SKETCH_ERROR never breaks
+a window (rebuild the sketches to raise the precision of stored ones).
+
+The unique-company counts that used COUNT(DISTINCT company_hash) scans do
+not read these sketches, because they are already maintained exactly on
+write. The results page and the dashboard benchmarks count
+benchmark_monthly_companies: each company sits in the month of its latest
+assessment, so a rolling window is a plain sum. The platform totals count
+platform_stats.confirmed_companies, which is kept by triggers and covers
+confirmed users rather than completed assessments. Sketches answer what
+those counts cannot: how many distinct companies completed an assessment
+in an arbitrary past month range (operators' /company_activity).
+
+HLL registers cannot forget a company, so deleting an account rebuilds
+the sketches it contributed to from the remaining assessments.
+"""
+
+import math
+import hashlib
+import numpy as np
+from data.capabilities import DOMAINS
+from config import COMPANY_SKETCH_ERROR
+from models.projections import COMPLETE_ASSESSMENT, ALL_DOMAINS, month_of
+
+SPARSE = b'S'
+DENSE = b'D'
+
+
+def precision_for_error(error):
+    """Register index bits needed for a standard error of `error`"""
+    return min(max(math.ceil(math.log2((1.04 / error) ** 2)), 4), 18)
+
+
+PRECISION = precision_for_error(COMPANY_SKETCH_ERROR)
+
+
+def hash_company(company_hash):
+    """64-bit hash of a company identifier"""
+    return int.from_bytes(hashlib.blake2b(company_hash.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class CompanySketch:
+    """HyperLogLog sketch with an exact sparse mode for small counts"""
+
+    def __init__(self, precision=PRECISION, hashes=None, registers=None):
+        self.precision = precision
+        self.hashes = np.unique(np.asarray(hashes if hashes is not None else [], dtype=np.uint64))
+        self.registers = registers
+        if self.registers is None and self.hashes.nbytes > (1 << precision):
+            self._densify()
+
+    @property
+    def exact(self):
+        return self.registers is None
+
+    def _index_rank(self, hashes):
+        """Register index (top p bits) and rank (first 1 bit in the rest) of each hash"""
+        bits = 64 - self.precision
+        mask = (1 << bits) - 1
+        index = [int(h) >> bits for h in hashes]
+        rank = [bits - (int(h) & mask).bit_length() + 1 for h in hashes]
+        return np.array(index, dtype=np.int64), np.array(rank, dtype=np.uint8)
+
+    def _densify(self):
+        self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+        self._add_to_registers(self.hashes)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+
+    def _add_to_registers(self, hashes):
+        if len(hashes):
+            index, rank = self._index_rank(hashes)
+            np.maximum.at(self.registers, index, rank)
+
+    def add(self, company_hash):
+        self.merge(CompanySketch(self.precision, hashes=[hash_company(company_hash)]))
+
+    def fold(self, precision):
+        """This sketch at a lower precision (as if it had been built with it)"""
+        if precision >= self.precision:
+            return self
+        if self.exact:
+            return CompanySketch(precision, hashes=self.hashes)
+        # The index bits dropped from each register lead the hash bits its
+        # rank is counted over: a nonzero prefix sets the rank by itself
+        shift = self.precision - precision
+        dropped = np.arange(1 << self.precision) & ((1 << shift) - 1)
+        prefix_rank = shift - np.array([int(d).bit_length() for d in range(1 << shift)])[dropped] + 1
+        rank = np.where(dropped > 0, prefix_rank, shift + self.registers.astype(np.int64))
+        rank[self.registers == 0] = 0
+        registers = rank.reshape(1 << precision, 1 << shift).max(axis=1).astype(np.uint8)
+        return CompanySketch(precision, registers=registers)
+
+    def merge(self, other):
+        """Merge another sketch into this one, at the lower of the two precisions"""
+        if other.precision < self.precision:
+            folded = self.fold(other.precision)
+            self.precision, self.hashes, self.registers = folded.precision, folded.hashes, folded.registers
+        other = other.fold(self.precision)
+        if self.exact and other.exact:
+            self.hashes = np.union1d(self.hashes, other.hashes)
+            if self.hashes.nbytes > (1 << self.precision):
+                self._densify()
+            return self
+        if self.exact:
+            self._densify()
+        if other.exact:
+            self._add_to_registers(other.hashes)
+        else:
+            np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        """Exact count in sparse mode, HyperLogLog estimate in dense mode"""
+        if self.exact:
+            return len(self.hashes)
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small ranges
+        return int(round(estimate))
+
+    def to_bytes(self):
+        if self.exact:
+            return SPARSE + bytes([self.precision]) + self.hashes.astype('>u8').tobytes()
+        return DENSE + bytes([self.precision]) + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        mode, precision, payload = data[:1], data[1], data[2:]
+        if mode == SPARSE:
+            # Exact hashes do not depend on the precision
+            return cls(PRECISION, hashes=np.frombuffer(payload, dtype='>u8').astype(np.uint64))
+        return cls(precision, registers=np.frombuffer(payload, dtype=np.uint8).copy()).fold(PRECISION)
+
+
+def _covered_domains(domain):
+    return (DOMAINS if domain == COMPLETE_ASSESSMENT else [domain]) + [ALL_DOMAINS]
+
+
+def _load_sketch(conn, domain, month):
+    row = conn.execute('''
+        SELECT sketch FROM company_activity_sketch WHERE month = ? AND domain = ?
+    ''', (month, domain)).fetchone()
+    return CompanySketch.from_bytes(row[0]) if row else CompanySketch()
+
+
+def _save_sketch(conn, domain, month, sketch):
+    conn.execute('''
+        INSERT INTO company_activity_sketch (month, domain, sketch) VALUES (?, ?, ?)
+        ON CONFLICT (month, domain) DO UPDATE SET sketch = excluded.sketch
+    ''', (month, domain, sketch.to_bytes()))
+
+
+def record_company_activity(conn, assessment_id):
+    """Add a completed assessment's company to its domain/month sketches (caller commits)"""
+    row = conn.execute('''
+        SELECT u.company_hash, a.domain, a.created_at
+        FROM assessments a
+        JOIN users u ON a.user_id = u.id
+        WHERE a.id = ? AND a.status = 'completed'
+    ''', (assessment_id,)).fetchone()
+    if not row or row[0] is None:
+        return
+    company_hash, domain, created_at = row
+    month = month_of(created_at)
+    for covered in _covered_domains(domain):
+        sketch = _load_sketch(conn, covered, month)
+        sketch.add(company_hash)
+        _save_sketch(conn, covered, month, sketch)
+
+
+def user_activity_months(conn, user_id):
+    """Months in which a user has completed assessments (to rebuild after deleting them)"""
+    return sorted({month_of(row[0]) for row in conn.execute('''
+        SELECT created_at FROM assessments WHERE user_id = ? AND status = 'completed'
+    ''', (user_id,))})
+
+
+def rebuild_company_activity(conn, months=None):
+    """
+    Rebuild the sketches of the given months (all months if None) from the
+    completed assessments. Runs inside the caller's transaction; returns
+    the number of sketches written.
+    """
+    if months is None:
+        conn.execute('DELETE FROM company_activity_sketch')
+        rows = conn.execute('''
+            SELECT u.company_hash, a.domain, a.created_at
+            FROM assessments a
+            JOIN users u ON a.user_id = u.id
+            WHERE a.status = 'completed' AND u.company_hash IS NOT NULL
+        ''').fetchall()
+    else:
+        rows = []
+        for month in months:
+            conn.execute('DELETE FROM company_activity_sketch WHERE month = ?', (month,))
+            # created_at is stored as text; a month is a prefix range
+            rows += conn.execute('''
+                SELECT u.company_hash, a.domain, a.created_at
+                FROM assessments a
+                JOIN users u ON a.user_id = u.id
+                WHERE a.status = 'completed' AND u.company_hash IS NOT NULL
+                AND a.created_at >= ? AND a.created_at < ?
+            ''', (month, month + '~')).fetchall()
+
+    companies = {}
+    for company_hash, domain, created_at in rows:
+        for covered in _covered_domains(domain):
+            companies.setdefault((covered, month_of(created_at)), set()).add(hash_company(company_hash))
+    for (domain, month), hashes in companies.items():
+        _save_sketch(conn, domain, month, CompanySketch(hashes=list(hashes)))
+    return len(companies)
+
+
+def company_activity(conn, start_month, end_month=None):
+    """
+    Distinct companies with completed assessments per domain, by month and
+    over the whole [start_month, end_month] window.
+    """
+    params = (start_month, end_month or '9999-99')
+    rows = conn.execute('''
+        SELECT domain, month, sketch
+        FROM company_activity_sketch
+        WHERE month >= ? AND month <= ?
+        ORDER BY month
+    ''', params).fetchall()
+
+    monthly = {}
+    window = {}
+    for domain, month, data in rows:
+        sketch = CompanySketch.from_bytes(data)
+        monthly.setdefault(domain, {})[month] = sketch.count()
+        if domain in window:
+            window[domain].merge(sketch)
+        else:
+            window[domain] = sketch
+    return {
+        'monthly': monthly,
+        'window': {domain: sketch.count() for domain, sketch in window.items()},
+        'exact': {domain: sketch.exact for domain, sketch in window.items()}
+    }
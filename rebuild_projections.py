@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Projection Rebuild Script
+Recomputes the derived read tables from assessments and responses.
+
+Usage: python rebuild_projections.py [projection ...]
+With no arguments every projection is rebuilt. Run
+`python rebuild_projections.py platform_stats domain_averages benchmark_snapshot`
+on a schedule to correct counter drift and republish the benchmark
+snapshot, e.g. when the rolling window moves. `recommendations` re-parses the stored
+AI recommendations, e.g. after RECOMMENDATIONS_FORMAT_VERSION changes.
+"""
+
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from models.database import init_db, get_db_connection, close_db_connection
+from models.projections import (
+    rebuild_company_latest, rebuild_company_scores, rebuild_assessment_totals, reconcile_platform_stats,
+    rebuild_completed_domain_averages
+)
+from models.sketches import rebuild_company_activity
+from services.benchmark_snapshot import publish_snapshot
+from services.recommendations_format import dump_recommendations
+from services.recommendation_jobs import has_recommendations
+
+
+def publish_benchmark_snapshot(conn):
+    return publish_snapshot()
+
+
+def rebuild_activity_sketches(conn):
+    sketches = rebuild_company_activity(conn)
+    conn.commit()
+    return sketches
+
+
+def reconcile_stats(conn):
+    drift = reconcile_platform_stats(conn)
+    conn.commit()
+    return ', '.join(f'{name} off by {value}' for name, value in drift.items()) or 'no drift'
+
+
+def restructure_recommendations(conn, batch_size=500):
+    """Re-parse recommendations_json from the stored text, committing per batch"""
+    last_id = 0
+    parsed = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, recommendations FROM assessments
+            WHERE id > ? AND recommendations IS NOT NULL
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        updates = [
+            (dump_recommendations(recommendations), assessment_id)
+            for assessment_id, recommendations in rows
+            if has_recommendations(recommendations)
+        ]
+        conn.executemany('UPDATE assessments SET recommendations_json = ? WHERE id = ?', updates)
+        conn.commit()
+        parsed += len(updates)
+        last_id = rows[-1][0]
+    return parsed
+
+
+# name -> (rebuild function, format for its result); the snapshot goes last
+# so that it picks up the projections rebuilt before it
+PROJECTIONS = {
+    'company_latest': (rebuild_company_latest, '{} companies'),
+    'company_scores': (rebuild_company_scores, '{} companies'),
+    'company_activity': (rebuild_activity_sketches, '{} sketches'),
+    'assessment_totals': (rebuild_assessment_totals, '{} assessments'),
+    'platform_stats': (reconcile_stats, '{}'),
+    'domain_averages': (rebuild_completed_domain_averages, '{} domains'),
+    'recommendations': (restructure_recommendations, '{} assessments'),
+    'benchmark_snapshot': (publish_benchmark_snapshot, 'version {}'),
+}
+
+
+def rebuild(names):
+    """Rebuild the named projections"""
+    init_db()
+    conn = get_db_connection()
+    try:
+        for name in names:
+            rebuild_projection, result_format = PROJECTIONS[name]
+            print(f"🔄 Rebuilding {name}...")
+            result = rebuild_projection(conn)
+            print(f"✅ {name} rebuilt ({result_format.format(result)})")
+    finally:
+        close_db_connection(conn)
+
+
+if __name__ == '__main__':
+    requested = sys.argv[1:] or list(PROJECTIONS)
+    unknown = [name for name in requested if name not in PROJECTIONS]
+    if unknown:
+        print(f"❌ Unknown projection(s): {', '.join(unknown)}")
+        print(f"💡 Available: {', '.join(PROJECTIONS)}")
+        sys.exit(1)
+    rebuild(requested)
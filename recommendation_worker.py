@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Recommendation Worker Script
+Runs background jobs (AI recommendations) in the foreground, for
+deployments that set AI_WORKERS=0 in the web processes.
+"""
+
+import sys
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from models.database import init_db
+from services.job_queue import WorkerPool
+import services.recommendation_jobs  # registers the recommendations job handler
+
+
+def run_worker(size):
+    """Run `size` job workers until interrupted"""
+    print("🤖 Recommendation Worker")
+    print("=" * 50)
+
+    init_db()
+    pool = WorkerPool(size).start()
+    print(f"✅ {size} worker(s) waiting for jobs (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping workers...")
+        pool.stop()
+
+
+if __name__ == '__main__':
+    run_worker(int(sys.argv[1]) if len(sys.argv) > 1 else 2)
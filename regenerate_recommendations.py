@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Recommendation Regeneration Script
+Regenerates the AI recommendations of completed assessments in bulk, e.g.
+after a prompt or model change, or after an outage left assessments with
+the "Unable to generate recommendations" notice.
+
+Usage: python regenerate_recommendations.py [--failed] [--before YYYY-MM-DD]
+                                            [--domain DOMAIN] [--id ID ...]
+                                            [--concurrency 4] [--rpm 60] [--tpm 60000]
+                                            [--checkpoint FILE] [--dry-run]
+
+Without filters every completed assessment is selected. --dry-run only
+prints how many assessments match and the tokens and cost the run would
+take. Calls go through a bounded thread pool and a requests-per-minute and
+tokens-per-minute limiter; each call is charged its estimated prompt plus
+AI_MAX_COMPLETION_TOKENS, as the API counts it against the limit.
+
+Finished assessments are written to the checkpoint file as they complete.
+Run the same command again to resume an interrupted run: assessments in
+the checkpoint are skipped, failed ones are retried. The checkpoint is
+removed once a run finishes without failures; --restart ignores it.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from config import AI_MODEL, AI_MAX_COMPLETION_TOKENS
+from models.database import init_db, get_db_connection, close_db_connection
+from services.ai_service import build_recommendation_messages, generate_recommendations
+from services.ai_ledger import estimate_message_tokens, estimated_cost
+
+DEFAULT_CHECKPOINT = 'regenerate_recommendations.checkpoint.json'
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Regenerate AI recommendations of completed assessments')
+    parser.add_argument('--failed', action='store_true', help='only assessments without usable recommendations')
+    parser.add_argument('--before', help='only assessments started before this day (YYYY-MM-DD)')
+    parser.add_argument('--domain', help='only assessments of this domain')
+    parser.add_argument('--id', type=int, action='append', dest='ids', help='only this assessment (repeatable)')
+    parser.add_argument('--limit', type=int, help='at most this many assessments')
+    parser.add_argument('--concurrency', type=int, default=4, help='calls in flight at the same time')
+    parser.add_argument('--rpm', type=int, default=60, help='requests per minute')
+    parser.add_argument('--tpm', type=int, default=60000, help='tokens per minute')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help='progress file for resuming')
+    parser.add_argument('--restart', action='store_true', help='ignore an existing checkpoint')
+    parser.add_argument('--dry-run', action='store_true', help='estimate tokens and cost without calling the API')
+    options = parser.parse_args(argv)
+    if options.before:
+        date.fromisoformat(options.before)  # fail early on a malformed day
+    return options
+
+
+def select_assessments(conn, options):
+    """Completed assessments matching the filters, oldest first"""
+    conditions = ["status = 'completed'"]
+    params = []
+    if options.failed:
+        conditions.append('''(recommendations IS NULL OR TRIM(recommendations) = ''
+                             OR recommendations LIKE '%Unable to generate recommendations%')''')
+    if options.before:
+        conditions.append('created_at < ?')
+        params.append(options.before)
+    if options.domain:
+        conditions.append('domain = ?')
+        params.append(options.domain)
+    if options.ids:
+        conditions.append(f"id IN ({', '.join('?' * len(options.ids))})")
+        params.extend(options.ids)
+    sql = f'''
+        SELECT id, scope_id, domain, total_score, answered_count
+        FROM assessments
+        WHERE {' AND '.join(conditions)}
+        ORDER BY id
+    '''
+    if options.limit:
+        sql += ' LIMIT ?'
+        params.append(options.limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def overall_percentage(row):
+    total_score, answered_count = row[3], row[4]
+    return (total_score / answered_count) if answered_count else 0
+
+
+def prompt_tokens(conn, row):
+    messages = build_recommendation_messages(conn, row[0], row[1], row[2], overall_percentage(row))
+    return estimate_message_tokens(messages)
+
+
+def typical_completion_tokens(conn):
+    """Average completion tokens of the last 30 days' generated recommendations, if any"""
+    row = conn.execute('''
+        SELECT AVG(completion_tokens)
+        FROM ai_calls
+        WHERE created_at >= ? AND outcome = 'ok' AND cache_hit = 0
+    ''', (date.today() - timedelta(days=30),)).fetchone()
+    return round(row[0]) if row and row[0] else None
+
+
+class Checkpoint:
+    """Ids of regenerated assessments, saved to a JSON file after every change"""
+
+    def __init__(self, path, restart=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.done = set()
+        self.failed = set()
+        if os.path.exists(path) and not restart:
+            with open(path) as f:
+                saved = json.load(f)
+            self.done = set(saved.get('done', []))
+
+    def mark(self, assessment_id, ok):
+        with self.lock:
+            if ok:
+                self.done.add(assessment_id)
+                self.failed.discard(assessment_id)
+            else:
+                self.failed.add(assessment_id)
+            self._save()
+
+    def _save(self):
+        # Write a temporary file and rename it so an interrupted run never
+        # leaves a truncated checkpoint behind
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'done': sorted(self.done), 'failed': sorted(self.failed)}, f)
+        os.replace(temporary, self.path)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits as token buckets shared by all threads"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.rates = (requests_per_minute / 60, tokens_per_minute / 60)
+        self.capacity = (requests_per_minute, tokens_per_minute)
+        self.available = list(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens):
+        """Block until one request of `tokens` tokens fits in both limits"""
+        # A call larger than the whole per-minute budget waits for a full bucket
+        tokens = min(tokens, self.capacity[1])
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                elapsed = now - self.updated
+                self.updated = now
+                self.available = [min(capacity, available + rate * elapsed) for capacity, available, rate
+                                  in zip(self.capacity, self.available, self.rates)]
+                wait = max((1 - self.available[0]) / self.rates[0], (tokens - self.available[1]) / self.rates[1])
+                if wait <= 0:
+                    self.available[0] -= 1
+                    self.available[1] -= tokens
+                    return
+            time.sleep(min(wait, 5))
+
+
+def print_estimate(conn, rows):
+    estimates = [prompt_tokens(conn, row) for row in rows]
+    total_prompt = sum(estimates)
+    typical = typical_completion_tokens(conn)
+    print(f"📝 Prompt tokens: {total_prompt} (about {total_prompt // max(len(rows), 1)} per assessment)")
+    for label, completion in (('at most', AI_MAX_COMPLETION_TOKENS), ('typically', typical)):
+        if completion is None:
+            continue
+        total_completion = completion * len(rows)
+        cost = estimated_cost(AI_MODEL, total_prompt, total_completion)
+        cost_text = f"${cost:.2f}" if cost is not None else "unknown cost (no price for this model)"
+        print(f"💰 {label.capitalize()} {total_prompt + total_completion} tokens on {AI_MODEL}: {cost_text}")
+    print("💡 Calls over the daily token budget would use the fallback model instead")
+
+
+def regenerate(options):
+    print("🔄 Recommendation Regeneration")
+    print("=" * 50)
+
+    init_db()
+    conn = get_db_connection()
+    try:
+        rows = select_assessments(conn, options)
+        checkpoint = Checkpoint(options.checkpoint, options.restart)
+        pending = [row for row in rows if row[0] not in checkpoint.done]
+        print(f"🔍 {len(rows)} assessments match, {len(rows) - len(pending)} already done in {options.checkpoint}")
+        if not pending:
+            print("✅ Nothing to regenerate")
+            return 0
+
+        if options.dry_run:
+            print_estimate(conn, pending)
+            return 0
+
+        limiter = RateLimiter(options.rpm, options.tpm)
+        progress = {'done': 0, 'failed': 0}
+        progress_lock = threading.Lock()
+
+        def run(row):
+            assessment_id = row[0]
+            # Threads use their own connections; get_db_connection keeps one per thread
+            thread_conn = get_db_connection()
+            try:
+                limiter.acquire(prompt_tokens(thread_conn, row) + AI_MAX_COMPLETION_TOKENS)
+                # Raises when no recommendations could be generated
+                generate_recommendations(thread_conn, assessment_id, row[1], row[2], overall_percentage(row))
+                ok = True
+            except Exception as e:
+                print(f"❌ Assessment {assessment_id}: {e}")
+                ok = False
+            finally:
+                close_db_connection(thread_conn)
+            checkpoint.mark(assessment_id, ok)
+            with progress_lock:
+                progress['done' if ok else 'failed'] += 1
+                finished = progress['done'] + progress['failed']
+                if not ok or finished % 10 == 0 or finished == len(pending):
+                    print(f"{'✅' if ok else '⚠️ '} {finished}/{len(pending)} "
+                          f"({progress['failed']} failed, last: assessment {assessment_id})")
+
+        print(f"🤖 Regenerating {len(pending)} assessments: concurrency {options.concurrency}, "
+              f"{options.rpm} requests/min, {options.tpm} tokens/min")
+        pool = ThreadPoolExecutor(max_workers=options.concurrency)
+        try:
+            list(pool.map(run, pending))
+        except KeyboardInterrupt:
+            # Drop the queued assessments; calls in flight still finish and
+            # are checkpointed
+            pool.shutdown(wait=True, cancel_futures=True)
+            print(f"\n🛑 Interrupted; run the same command again to resume from {options.checkpoint}")
+            return 1
+        pool.shutdown()
+
+        print("\n📋 Summary:")
+        print(f"✅ {progress['done']} regenerated")
+        if progress['failed']:
+            print(f"⚠️  {progress['failed']} failed; run the same command again to retry them")
+            return 1
+        # A finished run must not make the next one skip these assessments
+        os.remove(options.checkpoint)
+        return 0
+    finally:
+        close_db_connection(conn)
+
+
+if __name__ == '__main__':
+    sys.exit(regenerate(parse_args(sys.argv[1:])))
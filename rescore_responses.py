@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Response Rescoring Script
+Rescores every stored response with the current scoring rules, e.g. after
+a change to evaluate_finops_maturity (see services/rescoring.py).
+
+Usage: python rescore_responses.py [--batch-size 1000] [--start-after ID]
+                                   [--keep-recommendations] [--dry-run]
+
+Batches are committed one at a time, so the app stays usable during the
+run. An interrupted run resumes with --start-after and the last id
+printed, or simply from the start: unchanged rows are not rewritten.
+Completed assessments whose scores moved get their recommendations
+regenerated by the AI workers unless --keep-recommendations is given.
+"""
+
+import sys
+import time
+import argparse
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from models.database import init_db, get_db_connection, close_db_connection
+from services.rescoring import rescore_responses
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Rescore stored responses with the current scoring rules')
+    parser.add_argument('--batch-size', type=int, help='responses per committed batch (default MIGRATION_BATCH_SIZE)')
+    parser.add_argument('--start-after', type=int, default=0, help='resume after this response id')
+    parser.add_argument('--keep-recommendations', action='store_true',
+                        help='do not regenerate the AI recommendations of rescored assessments')
+    parser.add_argument('--dry-run', action='store_true', help='count the changes without writing them')
+    return parser.parse_args(argv)
+
+
+def rescore(options):
+    print("🔄 Response Rescoring" + (" (dry run)" if options.dry_run else ""))
+    print("=" * 50)
+
+    init_db()
+    conn = get_db_connection()
+    total = conn.execute('SELECT COUNT(*) FROM responses WHERE id > ?', (options.start_after,)).fetchone()[0]
+    started = time.monotonic()
+    last_report = [started]
+
+    def report(stats):
+        now = time.monotonic()
+        if now - last_report[0] < 2 and stats['scanned'] < total:
+            return
+        last_report[0] = now
+        rate = stats['scanned'] / max(now - started, 1e-6)
+        print(f"⏳ {stats['scanned']}/{total} scanned, {stats['changed']} changed in "
+              f"{stats['assessments']} assessments ({rate:.0f} rows/s, last id {stats['last_id']})")
+
+    try:
+        stats = rescore_responses(conn, batch_size=options.batch_size, start_after=options.start_after,
+                                  regenerate_recommendations=not options.keep_recommendations,
+                                  dry_run=options.dry_run, progress=report)
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted; batches done so far are committed. Run again to resume")
+        return 1
+    finally:
+        close_db_connection(conn)
+
+    print("\n📋 Summary:")
+    verb = 'would change' if options.dry_run else 'changed'
+    print(f"✅ {stats['scanned']} responses scanned, {stats['changed']} {verb} "
+          f"in {stats['assessments']} assessments ({time.monotonic() - started:.1f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(rescore(parse_args(sys.argv[1:])))
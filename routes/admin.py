@@ -1,8 +1,16 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+import re
+from datetime import date, timedelta
 import sqlite3
 from models.database import get_db_connection
+from services.benchmark_engine import window_start
+from services.benchmark_snapshot import get_benchmark_snapshot
+from models.projections import DOMAIN_TOTAL_POINTS, get_assessment_totals, get_completed_domain_averages
+from models.sketches import company_activity
+from services.ai_service import get_openai_client
+from services.ai_ledger import usage_report
 from config import DATABASE
-from routes.utils import get_maturity_label
+from routes.utils import get_maturity_label, is_operator, operator_required
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -24,16 +32,9 @@ def dashboard_stats():
     ''', (session['user_id'],))
     user_assessments = cursor.fetchall()
     
-    # Get industry benchmarks by domain
-    cursor.execute('''
-        SELECT domain, AVG(overall_percentage) as avg_score, COUNT(*) as count
-        FROM assessments 
-        WHERE status = 'completed'
-        GROUP BY domain
-    ''')
-    industry_benchmarks = cursor.fetchall()
-    
-    conn.close()
+    # Industry benchmarks by domain: the average overall_percentage of all
+    # completed assessments of each domain, kept by triggers
+    industry_averages = get_completed_domain_averages(conn)
     
     # Process data for charts
     domains = ["Understand Usage & Cost", "Quantify Business Value", "Optimize Usage & Cost", "Manage the FinOps Practice"]
@@ -43,7 +44,7 @@ def dashboard_stats():
         user_scores[domain] = score
     
     industry_scores = {}
-    for domain, avg_score, count in industry_benchmarks:
+    for domain, avg_score in industry_averages.items():
         industry_scores[domain] = avg_score if avg_score else 0
     
     chart_data = {
@@ -63,85 +64,20 @@ def company_benchmarks():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    from data.capabilities import DOMAINS, CAPABILITIES
-
-    # Helper: get capability ids for each domain
-    domain_capabilities = {d: [c['id'] for c in CAPABILITIES if c['domain'] == d] for d in DOMAINS}
-    domain_total_questions = {d: len(domain_capabilities[d]) * 5 for d in DOMAINS}  # 5 lenses per capability
-    domain_total_points = {d: domain_total_questions[d] * 4 for d in DOMAINS}
+    from data.capabilities import DOMAINS
 
     # Get user's company_hash
     cursor.execute('SELECT company_hash FROM users WHERE id = ?', (session['user_id'],))
     user_row = cursor.fetchone()
     user_company_hash = user_row[0] if user_row else None
 
-    # Company maturity (%) per domain
-    company_scores = []
-    for domain in DOMAINS:
-        # Find the most recent completed assessment (domain-specific or complete) for this company with responses for this domain
-        cursor.execute('''
-            SELECT a.id, a.domain, a.created_at
-            FROM assessments a
-            JOIN users u ON a.user_id = u.id
-            WHERE u.company_hash = ? AND a.status = 'completed' AND (a.domain = ? OR a.domain = 'Complete Assessment')
-            ORDER BY a.created_at DESC
-            LIMIT 1
-        ''', (user_company_hash, domain))
-        row = cursor.fetchone()
-        if row:
-            assessment_id = row[0]
-            # Get all responses for this assessment and domain
-            cursor.execute('''
-                SELECT r.score, r.capability_id
-                FROM responses r
-                WHERE r.assessment_id = ?
-            ''', (assessment_id,))
-            responses = cursor.fetchall()
-            # Filter responses for this domain
-            scores = [score for score, capability_id in responses if capability_id in domain_capabilities[domain]]
-            total_points = domain_total_points[domain]
-            maturity_pct = round((sum(scores) / total_points) * 100, 1) if scores and total_points > 0 else None
-            company_scores.append(maturity_pct)
-        else:
-            company_scores.append(None)
-
-    # Industry maturity (%) per domain (exclude user's company)
-    industry_scores = []
-    for domain in DOMAINS:
-        # For each company, get the most recent completed assessment (domain-specific or complete) for this domain
-        cursor.execute('''
-            SELECT u.company_hash, MAX(a.created_at)
-            FROM assessments a
-            JOIN users u ON a.user_id = u.id
-            WHERE (a.domain = ? OR a.domain = 'Complete Assessment') AND a.status = 'completed' AND u.company_hash != ?
-            GROUP BY u.company_hash
-        ''', (domain, user_company_hash))
-        company_latest_dates = cursor.fetchall()
-        domain_percentages = []
-        for company_hash, latest_date in company_latest_dates:
-            # Get the assessment id
-            cursor.execute('''
-                SELECT a.id FROM assessments a
-                JOIN users u ON a.user_id = u.id
-                WHERE u.company_hash = ? AND a.created_at = ? AND a.status = 'completed' AND (a.domain = ? OR a.domain = 'Complete Assessment')
-                LIMIT 1
-            ''', (company_hash, latest_date, domain))
-            assessment_row = cursor.fetchone()
-            if assessment_row:
-                assessment_id = assessment_row[0]
-                cursor.execute('''
-                    SELECT r.score, r.capability_id
-                    FROM responses r
-                    WHERE r.assessment_id = ?
-                ''', (assessment_id,))
-                responses = cursor.fetchall()
-                scores = [score for score, capability_id in responses if capability_id in domain_capabilities[domain]]
-                total_points = domain_total_points[domain]
-                maturity_pct = (sum(scores) / total_points) * 100 if scores and total_points > 0 else None
-                if maturity_pct is not None:
-                    domain_percentages.append(maturity_pct)
-        avg_score = round(sum(domain_percentages) / len(domain_percentages), 1) if domain_percentages else None
-        industry_scores.append(avg_score)
+    # Company maturity (%) per domain, from its most recent completed assessment
+    # covering each domain, and the industry average excluding the user's company
+    snapshot = get_benchmark_snapshot(conn)
+    scores = snapshot.company_scores()
+    company_percentages = scores.company(user_company_hash)
+    company_scores = [round(score, 1) if score is not None else None for score in company_percentages]
+    industry_scores = [round(score, 1) if score is not None else None for score in scores.industry(exclude_company=user_company_hash)]
 
     company_labels = []
     for i, domain in enumerate(DOMAINS):
@@ -163,12 +99,94 @@ def company_benchmarks():
             label = 'N/A'
         industry_labels.append(label)
 
-    conn.close()
+    # Industry quartiles (%) and the company's percentile rank per domain
+    distributions = snapshot.distributions()
+    industry_quartiles = []
+    company_percentiles = []
+    for domain, percentage in zip(DOMAINS, company_percentages):
+        points = (percentage / 100) * DOMAIN_TOTAL_POINTS[domain] if percentage is not None else None
+        summary = distributions.domain_summary(domain, points)
+        industry_quartiles.append({q: round(summary[q], 1) if summary[q] is not None else None for q in ('p25', 'p50', 'p75')})
+        company_percentiles.append(round(summary['percentile_rank']) if summary['percentile_rank'] is not None else None)
 
     return jsonify({
         'domains': DOMAINS,
         'company_scores': company_scores,
         'industry_avgs': industry_scores,
         'company_labels': company_labels,
-        'industry_labels': industry_labels
-    }) 
\ No newline at end of file
+        'industry_labels': industry_labels,
+        'industry_quartiles': industry_quartiles,
+        'company_percentiles': company_percentiles
+    })
+
+@admin_bp.route('/benchmark_distribution/<int:assessment_id>')
+def benchmark_distribution(assessment_id):
+    """Industry quartiles and percentile ranks for one of the user's assessments (any assessment for operators)"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT user_id FROM assessments WHERE id = ?', (assessment_id,))
+    owner = cursor.fetchone()
+    if not owner or (owner[0] != session['user_id'] and not is_operator(session['user_id'])):
+        return jsonify({'error': 'Assessment not found'}), 404
+
+    cursor.execute('''
+        SELECT capability_id, lens_id, score
+        FROM responses
+        WHERE assessment_id = ?
+        ORDER BY capability_id, lens_id
+    ''', (assessment_id,))
+    responses = cursor.fetchall()
+
+    distributions = get_benchmark_snapshot(conn).distributions()
+    domains = {
+        domain: distributions.domain_summary(domain, totals['total_score'])
+        for domain, totals in get_assessment_totals(conn, assessment_id)['domains'].items()
+    }
+    questions = {}
+    for capability_id, lens_id, score in responses:
+        distribution = distributions.cell(capability_id, lens_id)
+        questions.setdefault(capability_id, {})[lens_id] = dict(
+            distribution.quartiles(),
+            score=score,
+            companies=distribution.total,
+            percentile_rank=distribution.percentile_rank(score)
+        )
+
+    return jsonify({'assessment_id': assessment_id, 'domains': domains, 'questions': questions})
+
+@admin_bp.route('/company_activity')
+@operator_required
+def company_activity_trend():
+    """Unique companies with completed assessments per domain, by month and over a window"""
+    start = request.args.get('start') or window_start()
+    end = request.args.get('end')
+    for month in (start, end):
+        if month is not None and not re.fullmatch(r'\d{4}-\d{2}', month):
+            return jsonify({'error': 'Months must be formatted as YYYY-MM'}), 400
+
+    conn = get_db_connection()
+    activity = company_activity(conn, start, end)
+    return jsonify(dict(activity, start=start, end=end))
+
+@admin_bp.route('/ai_metrics')
+@operator_required
+def ai_metrics():
+    """Latency, error and circuit breaker metrics of this process's AI client"""
+    return jsonify(get_openai_client().metrics_snapshot())
+
+@admin_bp.route('/ai_usage')
+@operator_required
+def ai_usage():
+    """AI calls, tokens, latency, cache hits and estimated cost per day and model"""
+    start = request.args.get('start') or (date.today() - timedelta(days=29)).isoformat()
+    end = request.args.get('end')
+    for day in (start, end):
+        if day is not None and not re.fullmatch(r'\d{4}-\d{2}-\d{2}', day):
+            return jsonify({'error': 'Days must be formatted as YYYY-MM-DD'}), 400
+
+    conn = get_db_connection()
+    return jsonify(usage_report(conn, start, end))
@@ -1,16 +1,50 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, send_file
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, send_file, current_app, Response, stream_with_context
 import sqlite3
 import json
 import random
 from datetime import datetime, timedelta
 from models.database import get_db_connection
-from services.ai_service import evaluate_finops_maturity, generate_recommendations
-from data.capabilities import CAPABILITIES, LENSES, DOMAINS, QUESTIONS, ANSWER_OPTIONS
+from models.projections import refresh_assessment_company, get_platform_stats
+from models.sketches import record_company_activity
+from services.ai_service import evaluate_many, suggestions_text
+from services.benchmark_snapshot import get_benchmark_snapshot, try_publish_snapshot
+from services.question_catalog import CATALOG_JSON, CATALOG_VERSION, QUESTION_COUNTS
+from services.results_snapshot import get_results, try_store_results
+from services.recommendation_jobs import (enqueue_recommendations, recommendations_status, has_recommendations,
+                                         stream_assessment_recommendations)
+from data.capabilities import CAPABILITIES, LENSES, DOMAINS
 from config import DATABASE
 from routes.utils import get_maturity_label, login_required
 
 assessment_bp = Blueprint('assessment', __name__)
 
+CAPABILITIES_BY_ID = {c['id']: c for c in CAPABILITIES}
+LENSES_BY_ID = {l['id']: l for l in LENSES}
+MAX_BATCH_SIZE = len(CAPABILITIES) * len(LENSES)
+
+UPSERT_RESPONSE = '''
+    INSERT INTO responses
+    (assessment_id, capability_id, lens_id, answer, score, improvement_suggestions, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (assessment_id, capability_id, lens_id) DO UPDATE SET
+        answer = excluded.answer,
+        score = excluded.score,
+        improvement_suggestions = excluded.improvement_suggestions,
+        created_at = excluded.created_at
+'''
+
+def score_answer(capability, lens, answer):
+    """Score one answer; returns (score, improvement_suggestions)"""
+    return score_answers([(capability, lens, answer)])[0]
+
+def score_answers(answers):
+    """Score (capability, lens, answer) triples; returns a (score, improvement_suggestions) pair for each"""
+    try:
+        evaluations = evaluate_many((capability['name'], lens['name'], answer, '') for capability, lens, answer in answers)
+    except Exception as e:
+        return [(0, "Unable to evaluate at this time.")] * len(answers)
+    return [(evaluation['score'], suggestions_text(evaluation['improvement_suggestions'])) for evaluation in evaluations]
+
 @assessment_bp.route('/dashboard')
 @login_required
 def dashboard():
@@ -26,42 +60,25 @@ def dashboard():
             ORDER BY created_at DESC
         ''', (session['user_id'],))
         assessments = cursor.fetchall()
-        twelve_months_ago = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute('''
-            SELECT 
-                a.domain,
-                AVG(a.overall_percentage) as avg_score,
-                COUNT(DISTINCT u.company_hash) as unique_companies
-            FROM assessments a
-            JOIN users u ON a.user_id = u.id
-            WHERE a.status = 'completed' AND a.created_at >= ?
-            GROUP BY a.domain
-            HAVING COUNT(DISTINCT u.company_hash) >= 1
-        ''', (twelve_months_ago,))
-        benchmarks = cursor.fetchall()
-        cursor.execute('SELECT COUNT(*) FROM users WHERE is_confirmed = 1')
-        total_users = cursor.fetchone()[0]
-        cursor.execute('SELECT COUNT(DISTINCT company_hash) FROM users WHERE is_confirmed = 1')
-        total_companies = cursor.fetchone()[0]
-        cursor.execute('SELECT COUNT(*) FROM assessments WHERE status = "in_progress"')
-        assessments_in_progress = cursor.fetchone()[0]
-        cursor.execute('SELECT COUNT(*) FROM assessments WHERE status = "completed"')
-        assessments_completed = cursor.fetchone()[0]
+        benchmarks = get_benchmark_snapshot(conn).benchmarks()
+        stats = get_platform_stats(conn)
         benchmark_data = {}
-        for domain, avg_score, unique_companies in benchmarks:
-            benchmark_data[domain] = {
-                'avg_score': round(avg_score, 1) if avg_score is not None else None,
-                'unique_companies': unique_companies,
-                'maturity_label': get_maturity_label(avg_score)
-            }
+        domain_companies = benchmarks.domain_company_counts()
+        for domain, avg_score in benchmarks.domain_means().items():
+            if domain_companies[domain] >= 1:
+                benchmark_data[domain] = {
+                    'avg_score': round(avg_score, 1),
+                    'unique_companies': domain_companies[domain],
+                    'maturity_label': get_maturity_label(avg_score)
+                }
         return render_template('dashboard.html', 
                              assessments=assessments,
                              domains=DOMAINS,
                              benchmark_data=benchmark_data,
-                             total_users=total_users,
-                             total_companies=total_companies,
-                             assessments_in_progress=assessments_in_progress,
-                             assessments_completed=assessments_completed)
+                             total_users=stats['confirmed_users'],
+                             total_companies=stats['confirmed_companies'],
+                             assessments_in_progress=stats['assessments_in_progress'],
+                             assessments_completed=stats['assessments_completed'])
 
 @assessment_bp.route('/start_assessment', methods=['POST'])
 @login_required
@@ -106,82 +123,78 @@ def assessment():
     
     return render_template('assessment.html')
 
+@assessment_bp.route('/question_catalog/<version>')
+@login_required
+def question_catalog(version):
+    """Serve the question catalog; a versioned URL never changes, so it is cached for good"""
+    if version != CATALOG_VERSION:
+        return redirect(url_for('assessment.question_catalog', version=CATALOG_VERSION))
+    response = current_app.response_class(CATALOG_JSON, mimetype='application/json')
+    response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+    response.set_etag(CATALOG_VERSION)
+    return response.make_conditional(request)
+
 @assessment_bp.route('/get_assessment_progress')
 @login_required
 def get_assessment_progress():
-    """Get current assessment progress"""
+    """
+    Get current assessment progress: the answers given so far and the
+    catalog version to render the questions from. With ?since=<responses_version>
+    only answers saved after that version are returned.
+    """
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
+    since = request.args.get('since')
     
     with get_db_connection() as conn:
         cursor = conn.cursor()
-    
-    # Get current assessment
+        
+        # Get current assessment
         cursor.execute('''
-        SELECT id, scope_id, domain, status 
-        FROM assessments 
-        WHERE user_id = ? AND status = 'in_progress'
-        ORDER BY created_at DESC 
-        LIMIT 1
+            SELECT id, scope_id, domain, status 
+            FROM assessments 
+            WHERE user_id = ? AND status = 'in_progress'
+            ORDER BY created_at DESC 
+            LIMIT 1
         ''', (session['user_id'],))
-    assessment = cursor.fetchone()
-    
-    if not assessment:
-        return jsonify({'error': 'No active assessment found'}), 404
-    
-    assessment_id, scope_id, domain, status = assessment
-    
-    # Get existing responses
-    cursor.execute('''
-        SELECT capability_id, lens_id, answer, score
-        FROM responses 
-        WHERE assessment_id = ?
-    ''', (assessment_id,))
-    responses = {f"{row[0]}_{row[1]}": {'answer': row[2], 'score': row[3]} for row in cursor.fetchall()}
-    
-    # Generate questions for the domain
-    questions = []
-    total_questions = 0
+        assessment = cursor.fetchone()
+        
+        if not assessment:
+            return jsonify({'error': 'No active assessment found'}), 404
+        
+        assessment_id, scope_id, domain, status = assessment
+        
+        cursor.execute('''
+            SELECT COUNT(*), MAX(created_at) FROM responses WHERE assessment_id = ?
+        ''', (assessment_id,))
+        answered_questions, responses_version = cursor.fetchone()
+        
+        # Existing responses, or only those saved after the client's version
+        if since:
+            cursor.execute('''
+                SELECT capability_id, lens_id, answer, score
+                FROM responses 
+                WHERE assessment_id = ? AND created_at > ?
+            ''', (assessment_id, since))
+        else:
+            cursor.execute('''
+                SELECT capability_id, lens_id, answer, score
+                FROM responses 
+                WHERE assessment_id = ?
+            ''', (assessment_id,))
+        responses = {f"{row[0]}_{row[1]}": {'answer': row[2], 'score': row[3]} for row in cursor.fetchall()}
     
-    for capability in CAPABILITIES:
-        if domain == 'Complete Assessment' or domain == capability['domain']:
-            capability_questions = QUESTIONS.get(capability['id'], {})
-            for lens in LENSES:
-                lens_questions = capability_questions.get(lens['id'], [])
-                if lens_questions:
-                    total_questions += 1
-                    question_key = f"{capability['id']}_{lens['id']}"
-                    if question_key in responses:
-                        questions.append({
-                            'capability_id': capability['id'],
-                            'lens_id': lens['id'],
-                            'capability_name': capability['name'],
-                            'lens_name': lens['name'],
-                            'question': lens_questions[0],
-                            'answer': responses[question_key]['answer'],
-                            'score': responses[question_key]['score'],
-                            'answered': True,
-                            'answer_options': ANSWER_OPTIONS["percentage_questions"],
-                            'domain': capability['domain'] if domain == 'Complete Assessment' else domain
-                        })
-                    else:
-                        questions.append({
-                            'capability_id': capability['id'],
-                            'lens_id': lens['id'],
-                            'capability_name': capability['name'],
-                            'lens_name': lens['name'],
-                            'question': lens_questions[0],
-                            'answered': False,
-                            'answer_options': ANSWER_OPTIONS["percentage_questions"],
-                            'domain': capability['domain'] if domain == 'Complete Assessment' else domain
-                        })
     return jsonify({
         'assessment_id': assessment_id,
         'domain': domain,
         'status': status,
-        'questions': questions,
-        'total_questions': total_questions,
-        'answered_questions': len([q for q in questions if q['answered']])
+        'catalog_version': CATALOG_VERSION,
+        'catalog_url': url_for('assessment.question_catalog', version=CATALOG_VERSION),
+        'responses': responses,
+        'responses_version': str(responses_version) if responses_version else since,
+        'since': since,
+        'total_questions': QUESTION_COUNTS.get(domain, 0),
+        'answered_questions': answered_questions
     })
 
 @assessment_bp.route('/submit_assessment', methods=['POST'])
@@ -197,32 +210,66 @@ def submit_assessment():
         return jsonify({'error': 'Missing required fields'}), 400
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT domain FROM assessments WHERE id = ? AND user_id = ?', (assessment_id, session['user_id']))
+        cursor.execute('SELECT domain, status FROM assessments WHERE id = ? AND user_id = ?', (assessment_id, session['user_id']))
         assessment = cursor.fetchone()
         if not assessment:
             return jsonify({'error': 'Assessment not found'}), 404
-        domain = assessment[0]
-        capability = next((c for c in CAPABILITIES if c['id'] == capability_id), None)
-        lens = next((l for l in LENSES if l['id'] == lens_id), None)
+        domain, status = assessment
+        if status == 'completed':
+            return jsonify({'error': 'Assessment already completed'}), 400
+        capability = CAPABILITIES_BY_ID.get(capability_id)
+        lens = LENSES_BY_ID.get(lens_id)
         if not capability or not lens:
             return jsonify({'error': 'Invalid capability or lens'}), 400
-        try:
-            evaluation = evaluate_finops_maturity(capability['name'], lens['name'], answer, '', 'complete')
-            score = evaluation['score']
-            improvement_suggestions = evaluation['improvement_suggestions']
-            if isinstance(improvement_suggestions, list):
-                improvement_suggestions = "\n".join(improvement_suggestions)
-        except Exception as e:
-            score = 0
-            improvement_suggestions = "Unable to evaluate at this time."
-        cursor.execute('''
-            INSERT OR REPLACE INTO responses 
-            (assessment_id, capability_id, lens_id, answer, score, improvement_suggestions, created_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (assessment_id, capability_id, lens_id, answer, score, improvement_suggestions, datetime.now()))
+        score, improvement_suggestions = score_answer(capability, lens, answer)
+        cursor.execute(UPSERT_RESPONSE, (assessment_id, capability_id, lens_id, answer, score, improvement_suggestions, datetime.now()))
         conn.commit()
         return jsonify({'status': 'success', 'score': score})
 
+@assessment_bp.route('/submit_assessment_batch', methods=['POST'])
+@login_required
+def submit_assessment_batch():
+    """Save many answers of one assessment in a single transaction"""
+    data = request.get_json(silent=True) or {}
+    assessment_id = data.get('assessment_id')
+    answers = data.get('responses')
+    if not assessment_id or not isinstance(answers, list) or not answers:
+        return jsonify({'error': 'Missing required fields'}), 400
+    if len(answers) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} responses per batch'}), 400
+
+    # Validate the whole batch before writing any of it; the last answer
+    # for a question wins, as it would with one request per answer
+    latest = {}
+    for item in answers:
+        if not isinstance(item, dict) or not all(item.get(k) for k in ('capability_id', 'lens_id', 'answer')):
+            return jsonify({'error': 'Missing required fields'}), 400
+        capability_id, lens_id = str(item['capability_id']), str(item['lens_id'])
+        if capability_id not in CAPABILITIES_BY_ID or lens_id not in LENSES_BY_ID:
+            return jsonify({'error': 'Invalid capability or lens'}), 400
+        latest[(capability_id, lens_id)] = str(item['answer'])
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT status FROM assessments WHERE id = ? AND user_id = ?', (assessment_id, session['user_id']))
+        assessment = cursor.fetchone()
+        if not assessment:
+            return jsonify({'error': 'Assessment not found'}), 404
+        if assessment[0] == 'completed':
+            return jsonify({'error': 'Assessment already completed'}), 400
+
+        now = datetime.now()
+        rows = []
+        scores = {}
+        scored = score_answers([(CAPABILITIES_BY_ID[capability_id], LENSES_BY_ID[lens_id], answer)
+                                for (capability_id, lens_id), answer in latest.items()])
+        for ((capability_id, lens_id), answer), (score, improvement_suggestions) in zip(latest.items(), scored):
+            rows.append((assessment_id, capability_id, lens_id, answer, score, improvement_suggestions, now))
+            scores[f"{capability_id}_{lens_id}"] = score
+        cursor.executemany(UPSERT_RESPONSE, rows)
+        conn.commit()
+        return jsonify({'status': 'success', 'saved': len(rows), 'scores': scores})
+
 @assessment_bp.route('/complete_assessment', methods=['POST'])
 @login_required
 def complete_assessment():
@@ -231,32 +278,40 @@ def complete_assessment():
         return jsonify({'status': 'error', 'message': 'Missing assessment_id'}), 400
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('SELECT domain FROM assessments WHERE id = ? AND user_id = ?', (assessment_id, session['user_id']))
+        cursor.execute('''
+            SELECT domain, status, total_score, answered_count
+            FROM assessments
+            WHERE id = ? AND user_id = ?
+        ''', (assessment_id, session['user_id']))
         assessment = cursor.fetchone()
         if not assessment:
             return jsonify({'status': 'error', 'message': 'Assessment not found'}), 404
-        domain = assessment[0]
-        cursor.execute('''
-            SELECT capability_id, lens_id, score
-            FROM responses 
-            WHERE assessment_id = ?
-        ''', (assessment_id,))
-        responses = cursor.fetchall()
-        if not responses:
+        domain, status, total_score, answered_count = assessment
+        if status == 'completed':
+            # Already counted in the benchmarks; nothing to redo
+            return jsonify({
+                'status': 'success',
+                'redirect': url_for('assessment.get_assessment_results', assessment_id=assessment_id)
+            })
+        # Running totals are kept current by the responses triggers
+        if not answered_count:
             return jsonify({'status': 'error', 'message': 'No responses found for assessment'}), 400
-        total_score = sum(response[2] for response in responses)
-        overall_percentage = (total_score / len(responses)) if responses else 0
-        try:
-            lens_scores = {f"{r[0]}_{r[1]}": r[2] for r in responses}
-            recommendations = generate_recommendations(assessment_id, 'complete', domain, overall_percentage, lens_scores)
-        except Exception as e:
-            recommendations = "Unable to generate recommendations at this time."
+        overall_percentage = total_score / answered_count
         cursor.execute('''
             UPDATE assessments 
-            SET status = 'completed', overall_percentage = ?, recommendations = ?, updated_at = ?
-            WHERE id = ?
-        ''', (overall_percentage, recommendations, datetime.now(), assessment_id))
+            SET status = 'completed', overall_percentage = ?, updated_at = ?
+            WHERE id = ? AND status = 'in_progress'
+        ''', (overall_percentage, datetime.now(), assessment_id))
+        completed = cursor.rowcount > 0
+        if completed:
+            refresh_assessment_company(conn, assessment_id)
+            record_company_activity(conn, assessment_id)
+            # Recommendations are generated by the job workers; the results page shows them when ready
+            enqueue_recommendations(conn, assessment_id)
         conn.commit()
+        if completed:
+            try_publish_snapshot()
+            try_store_results(conn, assessment_id, session['user_id'])
         return jsonify({
             'status': 'success',
             'overall_percentage': overall_percentage,
@@ -268,16 +323,9 @@ def complete_assessment():
 def get_assessment_results(assessment_id):
     if 'user_id' not in session:
         return redirect(url_for('auth.index'))
-    raw_average = 0
     with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT scope_id, domain, status, overall_percentage, recommendations, created_at, updated_at
-            FROM assessments 
-            WHERE id = ? AND user_id = ?
-        ''', (assessment_id, session['user_id']))
-        assessment = cursor.fetchone()
-        if not assessment:
+        results = get_results(conn, assessment_id, session['user_id'])
+        if not results:
             return render_template(
                 'dashboard.html',
                 error='Assessment not found',
@@ -289,333 +337,70 @@ def get_assessment_results(assessment_id):
                 assessments_in_progress=0,
                 assessments_completed=0
             )
-        scope_id, domain, status, overall_percentage, recommendations, created_at, updated_at = assessment
-        cursor.execute('''
-            SELECT capability_id, lens_id, answer, score, improvement_suggestions
-            FROM responses r1
-            WHERE assessment_id = ? 
-            AND id = (
-                SELECT MAX(id) 
-                FROM responses r2 
-                WHERE r2.assessment_id = r1.assessment_id 
-                AND r2.capability_id = r1.capability_id 
-                AND r2.lens_id = r1.lens_id
-            )
-            ORDER BY capability_id, lens_id
-        ''', (assessment_id,))
-        responses = cursor.fetchall()
-
-    # --- Ensure recommendations are generated if missing or invalid ---
-    def is_invalid_recommendations(recommendations):
-        if not recommendations:
-            return True
-        if 'Unable to generate recommendations' in recommendations:
-            return True
-        if recommendations.strip() == '':
-            return True
-        return False
+        snapshot = results['assessment']
+        domain, status = snapshot['domain'], snapshot['status']
+        recommendations = snapshot['recommendations']
 
-    ai_error = False
-    ai_error_message = None
-    ai_processing = False
-    if is_invalid_recommendations(recommendations):
-        ai_processing = True
-        # Calculate overall percentage if needed
-        total_score = sum(response[3] for response in responses) if responses else 0
-        total_questions = len(responses) if responses else 0
-        overall_pct = (total_score / total_questions) if total_questions > 0 else 0
-        lens_scores = {f"{r[0]}_{r[1]}": r[3] for r in responses}
-        from services.ai_service import generate_recommendations
-        try:
-            new_recommendations = generate_recommendations(assessment_id, scope_id, domain, overall_pct, lens_scores)
-            if new_recommendations and 'Unable to generate recommendations' not in new_recommendations:
-                recommendations = new_recommendations
-                cursor.execute('''
-                    UPDATE assessments SET recommendations = ? WHERE id = ?
-                ''', (recommendations, assessment_id))
+        # Recommendations come from a background job; if they are missing or
+        # failed, make sure one is queued and let the page stream them
+        ai_error = False
+        ai_error_message = None
+        ai_processing = False
+        if not has_recommendations(recommendations):
+            if enqueue_recommendations(conn, assessment_id):
                 conn.commit()
-                ai_processing = False
-            else:
-                ai_error = True
-                ai_error_message = "AI recommendations are temporarily unavailable. We’ll try again next time you view this report."
-                ai_processing = False
-        except Exception as e:
-            ai_error = True
-            ai_error_message = "AI recommendations are temporarily unavailable due to a system error. We’ll try again next time you view this report."
-            ai_processing = False
+            ai_processing = True
 
-    # Calculate domain-specific benchmarks
-    if domain == 'Complete Assessment':
-        # For complete assessments, calculate benchmarks by domain using actual response scores
-        domain_benchmarks = {}
-        all_domains = ["Understand Usage & Cost", "Quantify Business Value", "Optimize Usage & Cost", "Manage the FinOps Practice"]
-        twelve_months_ago = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d %H:%M:%S')
-        for domain_name in all_domains:
-            # Get all responses for this domain from domain-specific assessments (last 12 months)
-            cursor.execute('''
-                SELECT r.score, u.company_hash, r.capability_id
-                FROM assessments a
-                JOIN users u ON a.user_id = u.id
-                JOIN responses r ON a.id = r.assessment_id
-                WHERE a.domain = ? AND a.status = 'completed' AND a.created_at >= ?
-            ''', (domain_name, twelve_months_ago))
-            all_responses = cursor.fetchall()
-            
-            # Filter responses for this specific domain using Python data
-            domain_responses = []
-            for score, company_hash, capability_id in all_responses:
-                capability = next((cap for cap in CAPABILITIES if cap['id'] == capability_id), None)
-                if capability and capability['domain'] == domain_name:
-                    domain_responses.append((score, company_hash))
-            
-            # Calculate average score for this domain
-            if domain_responses:
-                total_score = sum(response[0] for response in domain_responses)
-                total_responses = len(domain_responses)
-                avg_score = total_score / total_responses
-                unique_companies = len(set(response[1] for response in domain_responses))
-            else:
-                avg_score = 0
-                unique_companies = 0
-            
-            domain_benchmarks[domain_name] = {
-                'avg_score': avg_score,
-                'unique_companies': unique_companies,
-                'has_data': unique_companies >= 1
-            }
-        
-        # Calculate overall benchmark for complete assessment (any domains with data)
-        valid_domains = [d for d in domain_benchmarks.values() if d['has_data']]
-        if valid_domains:
-            overall_avg = sum(d['avg_score'] for d in valid_domains) / len(valid_domains)
-            total_companies = sum(d['unique_companies'] for d in valid_domains)
-            has_benchmark_data = True
-        else:
-            overall_avg = 0
-            total_companies = 0
-            has_benchmark_data = False
-        
-        benchmark = (overall_avg, total_companies)
-        industry_avg = overall_avg
-    else:
-        # For domain-specific assessments, get data from both domain-specific assessments AND complete assessments
-        twelve_months_ago = (datetime.now() - timedelta(days=365)).strftime('%Y-%m-%d %H:%M:%S')
-        # First, get domain-specific assessment data using actual response scores (last 12 months)
-        cursor.execute('''
-            SELECT r.score, u.company_hash
-            FROM assessments a
-            JOIN users u ON a.user_id = u.id
-            JOIN responses r ON a.id = r.assessment_id
-            WHERE a.domain = ? AND a.status = 'completed' AND a.created_at >= ?
-        ''', (domain, twelve_months_ago))
-        domain_specific_responses = cursor.fetchall()
-        
-        # Calculate average score for domain-specific assessments
-        domain_specific_avg = 0
-        domain_specific_companies = 0
-        if domain_specific_responses:
-            total_score = sum(response[0] for response in domain_specific_responses)
-            total_responses = len(domain_specific_responses)
-            domain_specific_avg = total_score / total_responses
-            domain_specific_companies = len(set(response[1] for response in domain_specific_responses))
-        
-        domain_specific_benchmark = (domain_specific_avg, domain_specific_companies)
-        
-        # Then, get domain data from complete assessments by analyzing responses (last 12 months)
-        cursor.execute('''
-            SELECT 
-                a.id,
-                a.overall_percentage,
-                u.company_hash,
-                r.capability_id,
-                r.score
-            FROM assessments a
-            JOIN users u ON a.user_id = u.id
-            JOIN responses r ON a.id = r.assessment_id
-            WHERE a.domain = 'Complete Assessment' 
-            AND a.status = 'completed' AND a.created_at >= ?
-        ''', (twelve_months_ago,))
-        complete_assessment_responses = cursor.fetchall()
-        
-        # Calculate domain-specific scores from complete assessments
-        complete_assessment_domain_scores = {}
-        for assessment_id, overall_percentage, company_hash, capability_id, score in complete_assessment_responses:
-            # Find the capability's domain from the Python data
-            capability = next((cap for cap in CAPABILITIES if cap['id'] == capability_id), None)
-            if capability and capability['domain'] == domain:
-                if company_hash not in complete_assessment_domain_scores:
-                    complete_assessment_domain_scores[company_hash] = {'total_score': 0, 'count': 0}
-                complete_assessment_domain_scores[company_hash]['total_score'] += score
-                complete_assessment_domain_scores[company_hash]['count'] += 1
-        
-        # Calculate average domain score from complete assessments
-        complete_assessment_avg = 0
-        complete_assessment_companies = 0
-        if complete_assessment_domain_scores:
-            domain_scores = []
-            for company_hash, data in complete_assessment_domain_scores.items():
-                if data['count'] > 0:
-                    avg_score = data['total_score'] / data['count']
-                    domain_scores.append(avg_score)
-                    complete_assessment_companies += 1
-            
-            if domain_scores:
-                complete_assessment_avg = sum(domain_scores) / len(domain_scores)
-        
-        complete_assessment_benchmark = (complete_assessment_avg, complete_assessment_companies)
-        
-        # Combine the data
-        total_companies = 0
-        total_score = 0
-        company_count = 0
-        
-        if domain_specific_benchmark and domain_specific_benchmark[1] > 0:
-            total_score += domain_specific_benchmark[0] * domain_specific_benchmark[1]
-            total_companies += domain_specific_benchmark[1]
-            company_count += 1
-        
-        if complete_assessment_benchmark and complete_assessment_benchmark[1] > 0:
-            total_score += complete_assessment_benchmark[0] * complete_assessment_benchmark[1]
-            total_companies += complete_assessment_benchmark[1]
-            company_count += 1
-        
-        if total_companies > 0:
-            industry_avg = total_score / total_companies
-            has_benchmark_data = True
-        else:
-            industry_avg = 0
-            has_benchmark_data = False
-        
-        benchmark = (industry_avg, total_companies)
-        domain_benchmarks = None
+    # Industry benchmarks from each company's latest assessment (rolling 12 months)
+    industry = results['industry']
+    industry_avg = industry['industry_avg']
+    has_benchmark_data = industry['has_benchmark_data']
+    domain_benchmarks = industry['domain_benchmarks']
+    benchmark = (industry_avg, industry['unique_companies'])
     
-    # Parse recommendations
-    def parse_recommendations(recommendations):
-        if not recommendations:
-            return []
-        
-        try:
-            # Try to parse as JSON first
-            parsed = json.loads(recommendations)
-            if isinstance(parsed, list):
-                return parsed
-        except:
-            pass
-        
-        # Fallback: parse as text
-        recommendations_list = []
-        current_rec = {}
-        lines = recommendations.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Title:'):
-                if current_rec:
-                    recommendations_list.append(current_rec)
-                current_rec = {'title': line[6:].strip()}
-            elif line.startswith('Description:'):
-                current_rec['description'] = line[12:].strip()
-            elif line.startswith('Why it matters:'):
-                current_rec['why_matters'] = line[15:].strip()
-            elif line.startswith('Why it is important:'):
-                current_rec['why_matters'] = line[20:].strip()
-            elif line.startswith('Recommendation:'):
-                current_rec['recommendation'] = line[15:].strip()
-        
-        if current_rec:
-            recommendations_list.append(current_rec)
-        
-        return recommendations_list
+    # Where the organization's domain totals fall among companies
+    domain_percentiles = industry['domain_percentiles']
     
-    parsed_recommendations = parse_recommendations(recommendations)
+    # Recommendations were parsed and rendered when they were stored
+    parsed_recommendations = snapshot['parsed_recommendations']
     
-    # Calculate total possible questions and points based on actual assessment scope
-    # For complete assessment: 21 capabilities × 5 lenses = 105 questions
-    # For domain-specific: varies by domain
-    if domain == 'Complete Assessment':
-        total_questions = 105  # 21 capabilities × 5 lenses
-        total_possible_points = 105 * 4  # 105 questions × 4 points max each = 420 points
-    else:
-        # Count capabilities for this domain
-        domain_capabilities = [cap for cap in CAPABILITIES if cap['domain'] == domain]
-        total_questions = len(domain_capabilities) * 5  # 5 lenses per capability
-        total_possible_points = total_questions * 4  # questions × 4 points max each
-    
-    # Calculate total score from responses
-    total_score = sum(response[3] for response in responses) if responses else 0
+    # Totals were materialized with the results; questions and points follow the assessment scope
+    # (complete assessment: 21 capabilities × 5 lenses = 105 questions, 4 points each)
+    responses = snapshot['responses']
+    total_questions = snapshot['total_questions']
+    total_possible_points = snapshot['total_possible_points']
+    total_score = snapshot['total_score']
+    answered_count = snapshot['answered_count']
     
     # Calculate correct overall percentage
     correct_overall_percentage = (total_score / total_possible_points) * 100 if total_possible_points > 0 else 0
     
     # Calculate domain-specific scores for complete assessments
     domain_scores = {}
-    if domain == 'Complete Assessment' and responses:
-        total_score = sum(response[3] for response in responses)
-        total_questions = len(responses)
-        user_score = (total_score / total_questions) if total_questions > 0 else 0
-        # Cálculo dos scores por domínio:
-        domain_scores = {}
-        for response in responses:
-            capability_id = response[0]
-            score = response[3]
-            capability = next((cap for cap in CAPABILITIES if cap['id'] == capability_id), None)
-            if capability:
-                cap_domain = capability['domain']
-                if cap_domain not in domain_scores:
-                    domain_scores[cap_domain] = {'total_score': 0, 'count': 0}
-                domain_scores[cap_domain]['total_score'] += score
-                domain_scores[cap_domain]['count'] += 1
-        for domain_name in domain_scores:
-            if domain_scores[domain_name]['count'] > 0:
-                domain_scores[domain_name]['average'] = domain_scores[domain_name]['total_score'] / domain_scores[domain_name]['count']
-            else:
-                domain_scores[domain_name]['average'] = 0
-        # domain_benchmarks já deve estar sendo calculado como antes, usando média 0-4
+    raw_average = 0
+    if domain == 'Complete Assessment' and answered_count:
+        total_questions = answered_count
+        user_score = total_score / total_questions
+        domain_scores = snapshot['domain_scores']
     else:
         # For domain-specific assessments, use average score per question
         user_score = (total_score / total_questions) if total_questions > 0 else 0
-        # Calculate raw average for domain-specific assessments
-        if responses:
-            all_scores = [response[3] for response in responses]
-            raw_average = sum(all_scores) / len(all_scores)
-        else:
-            raw_average = 0
-    
-    # Create results matrix for JavaScript visualization
-    results_matrix = {}
-    
-    # Organize responses by capability_id and lens_id
-    for response in responses:
-        capability_id = response[0]
-        lens_id = response[1]
-        answer = response[2]
-        score = response[3]
-        improvement_suggestions = response[4]
-        
-        if capability_id not in results_matrix:
-            results_matrix[capability_id] = {}
-        
-        results_matrix[capability_id][lens_id] = {
-            'answer': answer,
-            'score': score,
-            'improvement_suggestions': improvement_suggestions
-        }
+        raw_average = (total_score / answered_count) if answered_count else 0
     
-    # Calculate unique questions answered (each response represents one question)
-    unique_questions_answered = len(responses) if responses else 0
-    
-    # Add additional metadata
+    # Results matrix for JavaScript visualization, with metadata
+    results_matrix = dict(snapshot['results_matrix'])
     results_matrix['metadata'] = {
         'domain': domain,
-        'overall_percentage': overall_percentage,
+        'overall_percentage': snapshot['overall_percentage'],
         'industry_avg': industry_avg,
         'total_score': total_score,
         'total_possible_points': total_possible_points,
         'total_questions': total_questions,
-        'responses_count': unique_questions_answered,
+        'responses_count': answered_count,
         'has_benchmark_data': has_benchmark_data,
         'unique_companies_for_benchmark': benchmark[1] if benchmark else 0
     }
+    unique_questions_answered = answered_count
     
     # Get capabilities and lenses for the domain
     if domain == 'Complete Assessment':
@@ -625,13 +410,7 @@ def get_assessment_results(assessment_id):
         # For domain-specific assessments, get capabilities for the specific domain
         domain_capabilities = [cap for cap in CAPABILITIES if cap['domain'] == domain]
     lenses = LENSES
-
-    print("responses:", responses)
-    print("user_score:", user_score)
-    print("raw_average:", raw_average)
-    print("total_score:", total_score)
-    print("total_questions:", total_questions)
-    print("assessment_id:", assessment_id)
+    created_at, updated_at = snapshot['created_at'], snapshot['updated_at']
     
     user_maturity_label = get_maturity_label(user_score)
     industry_maturity_label = get_maturity_label(industry_avg)
@@ -658,6 +437,7 @@ def get_assessment_results(assessment_id):
                          assessment=[assessment_id, domain, status, correct_overall_percentage, created_at, updated_at],
                          domain_benchmarks=domain_benchmarks,
                          domain_scores=domain_scores,
+                         domain_percentiles=domain_percentiles,
                          unique_questions_answered=unique_questions_answered,
                          raw_average=raw_average,
                          ai_error=ai_error,
@@ -666,6 +446,25 @@ def get_assessment_results(assessment_id):
                          user_maturity_label=user_maturity_label,
                          industry_maturity_label=industry_maturity_label)
 
+@assessment_bp.route('/recommendations_status/<int:assessment_id>')
+@login_required
+def recommendations_status_view(assessment_id):
+    """Whether an assessment's AI recommendations are ready, for the results page to poll"""
+    with get_db_connection() as conn:
+        row = conn.execute('''
+            SELECT recommendations FROM assessments WHERE id = ? AND user_id = ?
+        ''', (assessment_id, session['user_id'])).fetchone()
+        if not row:
+            return jsonify({'error': 'Assessment not found'}), 404
+        job = recommendations_status(conn, assessment_id)
+    ready = has_recommendations(row[0])
+    return jsonify({
+        'assessment_id': assessment_id,
+        'ready': ready,
+        'status': 'done' if ready else (job['status'] if job else 'none'),
+        'attempts': job['attempts'] if job else 0
+    })
+
 @assessment_bp.route('/set_current_assessment/<int:assessment_id>')
 @login_required
 def set_current_assessment(assessment_id):
@@ -678,4 +477,30 @@ def set_current_assessment(assessment_id):
         if not assessment:
             return jsonify({'error': 'Assessment not found'}), 404
         session['current_assessment_id'] = assessment_id
-        return jsonify({'success': True}) 
\ No newline at end of file
+        return jsonify({'success': True}) 
+
+@assessment_bp.route('/recommendations_stream/<int:assessment_id>')
+@login_required
+def recommendations_stream(assessment_id):
+    """Stream an assessment's AI recommendations as Server-Sent Events, one card per recommendation"""
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT id FROM assessments WHERE id = ? AND user_id = ?
+    ''', (assessment_id, session['user_id'])).fetchone()
+    if not row:
+        return jsonify({'error': 'Assessment not found'}), 404
+
+    def events():
+        for event, recommendation in stream_assessment_recommendations(conn, assessment_id):
+            if event == 'waiting':
+                yield ': waiting\n\n'  # keeps the connection open while a worker generates them
+                continue
+            data = {}
+            if recommendation:
+                data['html'] = render_template('recommendation_card.html', rec=recommendation)
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    response = Response(stream_with_context(events()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # do not let a proxy buffer the stream
+    return response
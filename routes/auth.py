@@ -65,7 +65,6 @@ def register():
     existing_user = cursor.fetchone()
     
     if existing_user:
-        conn.close()
         return jsonify({'error': 'Email already registered'}), 400
     
     # Generate confirmation token
@@ -79,7 +78,6 @@ def register():
     
     user_id = cursor.lastrowid
     conn.commit()
-    conn.close()
     
     # Send confirmation email
     try:
@@ -91,7 +89,6 @@ def register():
         cursor = conn.cursor()
         cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
         conn.commit()
-        conn.close()
         return jsonify({'error': 'Failed to send confirmation email. Please try again.'}), 500
 
 @auth_bp.route('/login', methods=['POST'])
@@ -121,11 +118,9 @@ def login():
     user = cursor.fetchone()
     
     if not user:
-        conn.close()
         return jsonify({'error': 'Email not registered. Please register first.'}), 400
     
     if not user[1]:  # is_confirmed
-        conn.close()
         return jsonify({'error': 'Please confirm your email before logging in.'}), 400
     
     # Generate magic link token
@@ -134,7 +129,6 @@ def login():
     # Update user with new token
     cursor.execute('UPDATE users SET confirmation_token = ? WHERE id = ?', (token, user[0]))
     conn.commit()
-    conn.close()
     
     # Send magic link
     try:
@@ -154,13 +148,11 @@ def magic_login(token):
     user = cursor.fetchone()
     
     if not user:
-        conn.close()
         return render_template('login.html', error='Invalid or expired magic link')
     
     # Clear token and set session
     cursor.execute('UPDATE users SET confirmation_token = NULL WHERE id = ?', (user[0],))
     conn.commit()
-    conn.close()
     
     session['user_id'] = user[0]
     return redirect(url_for('assessment.dashboard'))
@@ -176,13 +168,11 @@ def confirm_email(token):
     user = cursor.fetchone()
     
     if not user:
-        conn.close()
         return render_template('login.html', error='Invalid or expired confirmation link')
     
     # Confirm user
     cursor.execute('UPDATE users SET is_confirmed = 1, confirmation_token = NULL WHERE id = ?', (user[0],))
     conn.commit()
-    conn.close()
     
     return render_template('email_confirmed.html')
 
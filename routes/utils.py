@@ -1,12 +1,15 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, send_file
 import sqlite3
-import json
-import markdown
 import html
 from datetime import datetime
 from models.database import get_db_connection
-from services.ai_service import evaluate_finops_maturity
-from config import DATABASE
+from models.projections import refresh_assessment_company, refresh_company_latest
+from models.sketches import user_activity_months, rebuild_company_activity
+from services.ai_service import evaluate_finops_maturity, suggestions_text
+from services.recommendations_format import render_markdown
+from services.benchmark_snapshot import try_publish_snapshot
+from services.results_snapshot import get_results
+from config import DATABASE, OPERATOR_EMAILS
 from functools import wraps
 
 utils_bp = Blueprint('utils', __name__)
@@ -20,6 +23,27 @@ def login_required(f):
     return decorated_function
 
 
+def is_operator(user_id):
+    """Whether a user's email is one of OPERATOR_EMAILS"""
+    if not OPERATOR_EMAILS:
+        return False
+    from services.encryption_service import encryption_service
+    row = get_db_connection().execute('SELECT email_hash FROM users WHERE id = ?', (user_id,)).fetchone()
+    return bool(row) and row[0] in {encryption_service.hash_email(email) for email in OPERATOR_EMAILS}
+
+
+def operator_required(f):
+    """Restrict a JSON endpoint to operators (see OPERATOR_EMAILS)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'error': 'Not authenticated'}), 401
+        if not is_operator(session['user_id']):
+            return jsonify({'error': 'Operators only'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 def get_user_by_email(email):
     """Fetch a user row by email (normalized and hashed)"""
     from services.encryption_service import encryption_service
@@ -69,7 +93,6 @@ def reprocess_response(assessment_id, capability_id, lens_id):
     assessment = cursor.fetchone()
     
     if not assessment or assessment[0] != session['user_id']:
-        conn.close()
         return jsonify({'error': 'Assessment not found'}), 404
     
     # Get the response
@@ -80,7 +103,6 @@ def reprocess_response(assessment_id, capability_id, lens_id):
     response = cursor.fetchone()
     
     if not response:
-        conn.close()
         return jsonify({'error': 'Response not found'}), 404
     
     answer = response[0]
@@ -92,14 +114,13 @@ def reprocess_response(assessment_id, capability_id, lens_id):
     lens = next((l for l in LENSES if l['id'] == lens_id), None)
     
     if not capability or not lens:
-        conn.close()
         return jsonify({'error': 'Invalid capability or lens'}), 400
     
     try:
         # Reprocess with AI
         evaluation = evaluate_finops_maturity(capability['name'], lens['name'], answer, '', 'complete')
         score = evaluation['score']
-        improvement_suggestions = evaluation['improvement_suggestions']
+        improvement_suggestions = suggestions_text(evaluation['improvement_suggestions'])
         
         # Update the response
         cursor.execute('''
@@ -107,9 +128,10 @@ def reprocess_response(assessment_id, capability_id, lens_id):
             SET score = ?, improvement_suggestions = ?
             WHERE assessment_id = ? AND capability_id = ? AND lens_id = ?
         ''', (score, improvement_suggestions, assessment_id, capability_id, lens_id))
+        refresh_assessment_company(conn, assessment_id)
         
         conn.commit()
-        conn.close()
+        try_publish_snapshot()
         
         return jsonify({
             'success': True, 
@@ -118,7 +140,7 @@ def reprocess_response(assessment_id, capability_id, lens_id):
         })
         
     except Exception as e:
-        conn.close()
+        conn.rollback()
         return jsonify({'error': f'Failed to reprocess: {str(e)}'}), 500
 
 @utils_bp.route('/my_responses')
@@ -148,7 +170,6 @@ def my_responses():
     ''', (session['user_id'],))
     responses = cursor.fetchall()
     
-    conn.close()
     
     return render_template('dashboard.html', responses=responses)
 
@@ -162,7 +183,6 @@ def settings():
     cursor = conn.cursor()
     cursor.execute('SELECT created_at, company_role FROM users WHERE id = ?', (session['user_id'],))
     user = cursor.fetchone()
-    conn.close()
     
     user_created_at = user[0][:10] if user and user[0] else 'N/A'
     company_role = user[1] if user and user[1] else 'N/A'
@@ -178,20 +198,29 @@ def delete_account():
     conn = get_db_connection()
     cursor = conn.cursor()
     
+    cursor.execute('SELECT company_hash FROM users WHERE id = ?', (session['user_id'],))
+    user = cursor.fetchone()
+    company_hash = user[0] if user else None
+    
     try:
+        activity_months = user_activity_months(conn, session['user_id'])
         # Delete all user data
         cursor.execute('DELETE FROM responses WHERE assessment_id IN (SELECT id FROM assessments WHERE user_id = ?)', (session['user_id'],))
         cursor.execute('DELETE FROM assessments WHERE user_id = ?', (session['user_id'],))
         cursor.execute('DELETE FROM users WHERE id = ?', (session['user_id'],))
+        # Other users of the same company may still have assessments
+        refresh_company_latest(conn, company_hash)
+        # Sketches cannot forget a company; rebuild the months it was counted in
+        rebuild_company_activity(conn, activity_months)
         
         conn.commit()
-        conn.close()
+        try_publish_snapshot()
         
         session.clear()
         return jsonify({'success': True, 'message': 'Account deleted successfully'})
         
     except Exception as e:
-        conn.close()
+        conn.rollback()
         return jsonify({'error': f'Failed to delete account: {str(e)}'}), 500
 
 @utils_bp.route('/export_pdf/<int:assessment_id>')
@@ -201,52 +230,26 @@ def export_pdf(assessment_id):
         return redirect(url_for('auth.index'))
     
     conn = get_db_connection()
-    cursor = conn.cursor()
     
-    # Get assessment details
-    cursor.execute('''
-        SELECT scope_id, domain, status, overall_percentage, recommendations, created_at, updated_at
-        FROM assessments 
-        WHERE id = ? AND user_id = ?
-    ''', (assessment_id, session['user_id']))
-    assessment = cursor.fetchone()
-    
-    if not assessment:
-        conn.close()
+    # Materialized results (see services/results_snapshot.py)
+    results = get_results(conn, assessment_id, session['user_id'])
+    if not results:
         return render_template('dashboard.html', error='Assessment not found')
-    
-    scope_id, domain, status, overall_percentage, recommendations, created_at, updated_at = assessment
-    
-    # Get responses (only the latest response per capability_id + lens_id combination)
-    cursor.execute('''
-        SELECT capability_id, lens_id, answer, score, improvement_suggestions
-        FROM responses r1
-        WHERE assessment_id = ? 
-        AND id = (
-            SELECT MAX(id) 
-            FROM responses r2 
-            WHERE r2.assessment_id = r1.assessment_id 
-            AND r2.capability_id = r1.capability_id 
-            AND r2.lens_id = r1.lens_id
-        )
-        ORDER BY capability_id, lens_id
-    ''', (assessment_id,))
-    responses = cursor.fetchall()
+    snapshot = results['assessment']
+    domain, status = snapshot['domain'], snapshot['status']
+    created_at, updated_at = snapshot['created_at'], snapshot['updated_at']
+    responses = snapshot['responses']
     
     # Calculate total score and possible points
+    from data.capabilities import CAPABILITIES, LENSES
     if domain == 'Complete Assessment':
-        from data.capabilities import CAPABILITIES, LENSES
         domain_capabilities = CAPABILITIES
-        lenses = LENSES
-        total_questions = 105
-        total_possible_points = 105 * 4
     else:
-        from data.capabilities import CAPABILITIES, LENSES
         domain_capabilities = [cap for cap in CAPABILITIES if cap['domain'] == domain]
-        lenses = LENSES
-        total_questions = len(domain_capabilities) * 5
-        total_possible_points = total_questions * 4
-    total_score = sum(response[3] for response in responses) if responses else 0
+    lenses = LENSES
+    total_questions = snapshot['total_questions']
+    total_possible_points = snapshot['total_possible_points']
+    total_score = snapshot['total_score']
     raw_average = (total_score / total_questions) if total_questions > 0 else 0
     
     user_maturity_label = get_maturity_label(raw_average)
@@ -254,62 +257,26 @@ def export_pdf(assessment_id):
     correct_overall_percentage = (total_score / total_possible_points) * 100 if total_possible_points > 0 else 0
     
     # Calculate unique questions answered
-    unique_questions_answered = len(responses) if responses else 0
-    
-    # Calculate domain-specific benchmarks and scores (mimic results page logic)
-    # ... (copy logic from get_assessment_results)
-    # For brevity, only include basic industry_avg and user_score for now
-    industry_avg = 0
-    user_score = 0
-    has_benchmark_data = False
+    unique_questions_answered = snapshot['answered_count']
+    
+    # Industry benchmarks and per-domain scores, as on the results page
+    industry = results['industry']
+    industry_avg = industry['industry_avg']
+    has_benchmark_data = industry['has_benchmark_data']
+    industry_maturity_label = get_maturity_label(industry_avg)
+    user_score = raw_average
+    domain_scores = snapshot['domain_scores']
     domain_benchmarks = None
-    domain_scores = None
-    
-    # Parse recommendations
-    def parse_recommendations(recommendations):
-        if not recommendations:
-            return []
-        try:
-            parsed = json.loads(recommendations)
-            if isinstance(parsed, list):
-                return parsed
-        except:
-            pass
-        recommendations_list = []
-        current_rec = {}
-        lines = recommendations.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line.startswith('Title:'):
-                if current_rec:
-                    recommendations_list.append(current_rec)
-                current_rec = {'title': line[6:].strip()}
-            elif line.startswith('Description:'):
-                current_rec['description'] = line[12:].strip()
-            elif line.startswith('Why it matters:'):
-                current_rec['why_matters'] = line[15:].strip()
-            elif line.startswith('Recommendation:'):
-                current_rec['recommendation'] = line[15:].strip()
-        if current_rec:
-            recommendations_list.append(current_rec)
-        return recommendations_list
-    parsed_recommendations = parse_recommendations(recommendations)
-    # Build results_matrix for the matrix table
-    results_matrix = {}
-    for response in responses:
-        capability_id = response[0]
-        lens_id = response[1]
-        answer = response[2]
-        score = response[3]
-        improvement_suggestions = response[4]
-        if capability_id not in results_matrix:
-            results_matrix[capability_id] = {}
-        results_matrix[capability_id][lens_id] = {
-            'answer': answer,
-            'score': score,
-            'improvement_suggestions': improvement_suggestions
+    if industry['domain_benchmarks']:
+        # The PDF compares domains as percentages of the maximum score
+        domain_benchmarks = {
+            domain_name: dict(benchmark, avg_score=benchmark['avg_score'] / 4 * 100)
+            for domain_name, benchmark in industry['domain_benchmarks'].items()
         }
-    conn.close()
+    
+    # Recommendations were parsed and rendered when they were stored
+    parsed_recommendations = snapshot['parsed_recommendations']
+    results_matrix = snapshot['results_matrix']
     html_content = render_template('pdf_report.html',
                                  domain=domain,
                                  status=status,
@@ -331,7 +298,8 @@ def export_pdf(assessment_id):
                                  domain_scores=domain_scores,
                                  unique_questions_answered=unique_questions_answered,
                                  raw_average=raw_average,
-                                 user_maturity_label=user_maturity_label
+                                 user_maturity_label=user_maturity_label,
+                                 industry_maturity_label=industry_maturity_label
                                  )
     try:
         from weasyprint import HTML
@@ -355,65 +323,22 @@ def export_xlsx(assessment_id):
         return redirect(url_for('auth.index'))
     
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get assessment details
-    cursor.execute('''
-        SELECT scope_id, domain, status, overall_percentage, recommendations, created_at, updated_at
-        FROM assessments 
-        WHERE id = ? AND user_id = ?
-    ''', (assessment_id, session['user_id']))
-    assessment = cursor.fetchone()
     
-    if not assessment:
-        conn.close()
+    # Materialized results (see services/results_snapshot.py)
+    results = get_results(conn, assessment_id, session['user_id'])
+    if not results:
         return render_template('dashboard.html', error='Assessment not found')
-    
-    scope_id, domain, status, overall_percentage, recommendations, created_at, updated_at = assessment
-    
-    # Get responses (only the latest response per capability_id + lens_id combination)
-    cursor.execute('''
-        SELECT capability_id, lens_id, answer, score, improvement_suggestions
-        FROM responses r1
-        WHERE assessment_id = ? 
-        AND id = (
-            SELECT MAX(id) 
-            FROM responses r2 
-            WHERE r2.assessment_id = r1.assessment_id 
-            AND r2.capability_id = r1.capability_id 
-            AND r2.lens_id = r1.lens_id
-        )
-        ORDER BY capability_id, lens_id
-    ''', (assessment_id,))
-    responses = cursor.fetchall()
+    snapshot = results['assessment']
+    domain, status, updated_at = snapshot['domain'], snapshot['status'], snapshot['updated_at']
     
     # Get capabilities and lenses
+    from data.capabilities import CAPABILITIES, LENSES
     if domain == 'Complete Assessment':
-        from data.capabilities import CAPABILITIES, LENSES
         domain_capabilities = CAPABILITIES
-        lenses = LENSES
     else:
-        from data.capabilities import CAPABILITIES, LENSES
         domain_capabilities = [cap for cap in CAPABILITIES if cap['domain'] == domain]
-        lenses = LENSES
-    
-    # Build results matrix
-    results_matrix = {}
-    for response in responses:
-        capability_id = response[0]
-        lens_id = response[1]
-        answer = response[2]
-        score = response[3]
-        improvement_suggestions = response[4]
-        if capability_id not in results_matrix:
-            results_matrix[capability_id] = {}
-        results_matrix[capability_id][lens_id] = {
-            'answer': answer,
-            'score': score,
-            'improvement_suggestions': improvement_suggestions
-        }
-    
-    conn.close()
+    lenses = LENSES
+    results_matrix = snapshot['results_matrix']
     
     try:
         from openpyxl import Workbook
@@ -518,8 +443,8 @@ def export_xlsx(assessment_id):
         summary_ws = wb.create_sheet("Summary")
         
         # Calculate totals
-        total_score = sum(response[3] for response in responses) if responses else 0
-        total_questions = len(responses) if responses else 0
+        total_score = snapshot['total_score']
+        total_questions = snapshot['answered_count']
         total_possible_points = total_questions * 4 if total_questions > 0 else 0
         overall_percentage = (total_score / total_possible_points) * 100 if total_possible_points > 0 else 0
         raw_average = (total_score / total_questions) if total_questions > 0 else 0
@@ -580,24 +505,4 @@ def export_xlsx(assessment_id):
 # Utility functions
 def markdown_filter(text):
     """Convert markdown to HTML"""
-    if not text:
-        return ""
-    
-    # Fix URL links
-    def fix_url_links(md):
-        # Replace [https://...](https://...) with just the URL as a clickable link
-        import re
-        pattern = r'\[(https?://[^\]]+)\]\(https?://[^)]+\)'
-        return re.sub(pattern, r'\1', md)
-    
-    # Convert markdown to HTML
-    html_text = markdown.markdown(fix_url_links(text), extensions=['fenced_code', 'tables'])
-    
-    # Fix real example links
-    def fix_real_example_links(html_text):
-        # Replace links that point to finops.org
-        import re
-        pattern = r'<a href="https://www\.finops\.org[^"]*">([^<]+)</a>'
-        return re.sub(pattern, r'\1', html_text)
-    
-    return fix_real_example_links(html_text) 
\ No newline at end of file
+    return render_markdown(text)
@@ -0,0 +1,125 @@
+"""
+AI Ledger Service for FinOps Assessment Platform
+Records every recommendation request in the ai_calls table (model,
+tokens, latency, outcome, cache hit), enforces the token budgets and
+reports usage and estimated cost.
+
+Budgets:
+    AI_MAX_PROMPT_TOKENS    per call; prompts are trimmed to fit
+    AI_DAILY_TOKEN_BUDGET   per day for AI_MODEL; once spent, calls use
+                            AI_FALLBACK_MODEL, or fail with
+                            BudgetExceededError if there is none
+
+Token counts come from the API's usage report when it sends one and are
+estimated at four characters per token otherwise.
+"""
+
+from datetime import datetime, date, timedelta
+from config import AI_MODEL, AI_FALLBACK_MODEL, AI_MAX_COMPLETION_TOKENS, AI_DAILY_TOKEN_BUDGET
+
+# USD per 1K (prompt, completion) tokens, for cost estimates in reports
+MODEL_PRICES = {
+    'gpt-4': (0.03, 0.06),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gpt-4o': (0.005, 0.015),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+}
+
+
+class BudgetExceededError(Exception):
+    """The daily token budget is spent and there is no fallback model"""
+
+
+def estimate_tokens(text):
+    """Rough token count of a text (about four characters per token)"""
+    return (len(text or '') + 3) // 4
+
+
+def estimate_message_tokens(messages):
+    # A few tokens of overhead per message for its role and separators
+    return sum(estimate_tokens(message['content']) + 4 for message in messages)
+
+
+def tokens_used_today(conn):
+    row = conn.execute('''
+        SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0)
+        FROM ai_calls
+        WHERE created_at >= ? AND model = ?
+    ''', (datetime.combine(date.today(), datetime.min.time()), AI_MODEL)).fetchone()
+    return row[0]
+
+
+def choose_model(conn, prompt_tokens):
+    """AI_MODEL while the daily budget lasts for this call, then the fallback model"""
+    if not AI_DAILY_TOKEN_BUDGET:
+        return AI_MODEL
+    if tokens_used_today(conn) + prompt_tokens + AI_MAX_COMPLETION_TOKENS <= AI_DAILY_TOKEN_BUDGET:
+        return AI_MODEL
+    if AI_FALLBACK_MODEL:
+        return AI_FALLBACK_MODEL
+    raise BudgetExceededError(f'Daily AI budget of {AI_DAILY_TOKEN_BUDGET} tokens spent')
+
+
+def record_ai_call(conn, assessment_id, model, prompt_tokens, completion_tokens, latency_ms, outcome, cache_hit=False):
+    """
+    Add a call to the ledger in the caller's transaction (caller commits);
+    a ledger failure never fails the call itself
+    """
+    try:
+        conn.execute('''
+            INSERT INTO ai_calls
+            (assessment_id, model, prompt_tokens, completion_tokens, latency_ms, outcome, cache_hit, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (assessment_id, model, prompt_tokens, completion_tokens, int(latency_ms), outcome, cache_hit, datetime.now()))
+    except Exception as e:
+        print(f"AI call not recorded for assessment {assessment_id}: {e}")
+
+
+def estimated_cost(model, prompt_tokens, completion_tokens):
+    """Estimated USD cost, or None for models without a known price"""
+    prices = MODEL_PRICES.get(model)
+    if not prices:
+        return None
+    return round(prompt_tokens / 1000 * prices[0] + completion_tokens / 1000 * prices[1], 4)
+
+
+def usage_report(conn, start_day, end_day=None):
+    """
+    Calls, tokens, latency, errors, cache hits and estimated cost per day
+    and model between two days (YYYY-MM-DD, inclusive), with totals.
+    """
+    end = date.fromisoformat(end_day) + timedelta(days=1) if end_day else date.today() + timedelta(days=1)
+    rows = conn.execute('''
+        SELECT substr(created_at, 1, 10) AS day, model,
+               COUNT(*), SUM(cache_hit), SUM(outcome != 'ok'),
+               SUM(prompt_tokens), SUM(completion_tokens),
+               AVG(CASE WHEN cache_hit = 0 THEN latency_ms END), MAX(latency_ms)
+        FROM ai_calls
+        WHERE created_at >= ? AND created_at < ?
+        GROUP BY day, model
+        ORDER BY day, model
+    ''', (start_day, end.isoformat())).fetchall()
+
+    days = []
+    totals = {'calls': 0, 'cache_hits': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'cost_usd': 0.0}
+    for day, model, calls, cache_hits, errors, prompt_tokens, completion_tokens, avg_latency, max_latency in rows:
+        cost = estimated_cost(model, prompt_tokens, completion_tokens)
+        days.append({
+            'day': day,
+            'model': model,
+            'calls': calls,
+            'cache_hits': cache_hits,
+            'errors': errors,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'avg_latency_ms': round(avg_latency) if avg_latency is not None else None,
+            'max_latency_ms': max_latency,
+            'cost_usd': cost
+        })
+        for key, value in (('calls', calls), ('cache_hits', cache_hits), ('errors', errors),
+                           ('prompt_tokens', prompt_tokens), ('completion_tokens', completion_tokens)):
+            totals[key] += value
+        totals['cost_usd'] = round(totals['cost_usd'] + (cost or 0), 4)
+    totals['cache_hit_rate'] = round(totals['cache_hits'] / totals['calls'], 3) if totals['calls'] else 0
+    return {'start': start_day, 'end': (end - timedelta(days=1)).isoformat(), 'days': days, 'totals': totals}
@@ -5,9 +5,13 @@ Handles OpenAI integration, maturity evaluation, and recommendation generation.
 
 import os
 import re
-import sqlite3
+import time
 from functools import lru_cache
-import openai
+from services.openai_client import ResilientOpenAI
+from services.ai_ledger import estimate_tokens, estimate_message_tokens, choose_model, record_ai_call
+from config import AI_MODEL, AI_MAX_PROMPT_TOKENS, AI_MAX_COMPLETION_TOKENS
+from services import recommendation_cache
+from services.recommendations_format import dump_recommendations
 
 # Import data structures (will be moved to data/ later)
 from data.capabilities import CAPABILITIES, LENSES, SCOPES
@@ -15,116 +19,197 @@ from data.capabilities import CAPABILITIES, LENSES, SCOPES
 
 @lru_cache(maxsize=1)
 def get_openai_client():
-    """Get OpenAI client with caching"""
+    """Get the process-wide OpenAI client (pooled, with retries and a circuit breaker)"""
     api_key = os.getenv('OPENAI_API_KEY')
     base_url = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
-    return openai.OpenAI(api_key=api_key, base_url=base_url)
+    return ResilientOpenAI(api_key=api_key, base_url=base_url)
 
 
-def evaluate_finops_maturity(capability_name, lens_name, answer_level, answer_details, scope_name):
+# Map answer levels to maturity scores; unknown levels score as the middle one
+LEVEL_SCORES = {
+    '0-20%': 0,
+    '21-40%': 1,
+    '41-60%': 2,
+    '61-80%': 3,
+    '81-100%': 4
+}
+DEFAULT_LEVEL_SCORE = 2
+
+# FinOps Foundation maturity characteristics
+MATURITY_LEVELS = {
+    0: {
+        'name': 'Crawl',
+        'description': 'No capability or awareness',
+        'characteristics': [
+            'No processes, tools, or understanding',
+            'Ad-hoc activities with no formal structure',
+            'No dedicated resources or ownership',
+            'Reactive approach to cost management'
+        ]
+    },
+    1: {
+        'name': 'Walk',
+        'description': 'Basic awareness and ad-hoc activities',
+        'characteristics': [
+            'Limited understanding and inconsistent execution',
+            'Some basic tools but no formal processes',
+            'Occasional activities without systematic approach',
+            'Basic cost visibility with manual processes'
+        ]
+    },
+    2: {
+        'name': 'Run',
+        'description': 'Some processes in place',
+        'characteristics': [
+            'Inconsistent execution with basic tools',
+            'Partial understanding and occasional success',
+            'Some formal processes but not consistently applied',
+            'Regular cost reviews with some automation'
+        ]
+    },
+    3: {
+        'name': 'Fly',
+        'description': 'Well-defined processes',
+        'characteristics': [
+            'Consistent execution with good tools',
+            'Strong understanding and regular success',
+            'Formal processes with clear ownership',
+            'Proactive cost optimization with good visibility'
+        ]
+    },
+    4: {
+        'name': 'Optimize',
+        'description': 'Optimized and automated',
+        'characteristics': [
+            'Continuous improvement with advanced tools',
+            'Expert level understanding and consistent excellence',
+            'Automated processes with predictive capabilities',
+            'Strategic cost management with predictive analytics'
+        ]
+    }
+}
+
+# Words in a detailed answer that move its score up or down
+POSITIVE_INDICATORS = [
+    'automated', 'automation', 'consistent', 'processes', 'formal', 'structured',
+    'tools', 'platform', 'dashboard', 'monitoring', 'tracking', 'optimization',
+    'governance', 'policies', 'standards', 'training', 'education', 'team',
+    'ownership', 'responsibility', 'metrics', 'kpis', 'reporting', 'analysis'
+]
+NEGATIVE_INDICATORS = [
+    'manual', 'ad-hoc', 'inconsistent', 'no process', 'no tools', 'no understanding',
+    'limited', 'basic', 'occasional', 'reactive', 'no ownership', 'no responsibility',
+    'no monitoring', 'no tracking', 'no optimization', 'no governance'
+]
+
+# Suggestions for every answer at a maturity level
+LEVEL_SUGGESTIONS = {
+    0: [
+        "Establish basic awareness and understanding of FinOps principles",
+        "Begin with simple cost visibility and basic reporting",
+        "Identify key stakeholders and establish initial ownership",
+        "Start with manual processes and basic tools"
+    ],
+    1: [
+        "Develop formal processes and procedures",
+        "Implement basic automation and tooling",
+        "Establish regular review cycles and governance",
+        "Begin training and education programs"
+    ],
+    2: [
+        "Standardize processes across the organization",
+        "Enhance automation and tool integration",
+        "Implement comprehensive monitoring and alerting",
+        "Develop advanced analytics and reporting capabilities"
+    ],
+    3: [
+        "Optimize existing processes for efficiency",
+        "Implement predictive analytics and forecasting",
+        "Enhance cross-team collaboration and communication",
+        "Develop advanced automation and AI capabilities"
+    ],
+    4: [
+        "Focus on continuous improvement and innovation",
+        "Implement advanced predictive and prescriptive analytics",
+        "Develop strategic cost optimization strategies",
+        "Establish industry leadership and best practices"
+    ]
+}
+
+# Extra suggestions per capability and lens
+CAPABILITY_SUGGESTIONS = {
+    'data_ingestion': {
+        'knowledge': [
+            "Implement data governance and quality standards",
+            "Establish data lineage and documentation processes",
+            "Develop data validation and monitoring capabilities"
+        ],
+        'process': [
+            "Standardize data ingestion workflows",
+            "Implement automated data quality checks",
+            "Establish data ownership and responsibility"
+        ]
+    },
+    'allocation': {
+        'knowledge': [
+            "Develop comprehensive tagging strategies",
+            "Establish cost allocation methodologies",
+            "Implement chargeback and showback processes"
+        ],
+        'process': [
+            "Standardize allocation rules and policies",
+            "Implement automated allocation processes",
+            "Establish allocation review and approval workflows"
+        ]
+    }
+    # Add more capabilities as needed
+}
+
+
+def _indicator_matcher(indicators):
     """
-    Evaluate FinOps maturity based on the FinOps Foundation Assessment Guide
+    One compiled pattern finding all indicators in a text in a single pass.
+
+    The pattern is a lookahead, so it is tried at every position, with longer
+    indicators first; an indicator found at a position also implies the
+    indicators that are prefixes of it, which are listed in the returned map.
     """
-    # Map answer levels to maturity scores
-    level_mapping = {
-        '0-20%': 0,
-        '21-40%': 1,
-        '41-60%': 2,
-        '61-80%': 3,
-        '81-100%': 4
-    }
-    
+    indicators = sorted(set(indicators), key=len, reverse=True)
+    pattern = re.compile('(?=(' + '|'.join(re.escape(indicator) for indicator in indicators) + '))')
+    prefixes = {indicator: [p for p in indicators if indicator.startswith(p)] for indicator in indicators}
+    return pattern, prefixes
+
+
+INDICATOR_PATTERN, INDICATOR_PREFIXES = _indicator_matcher(POSITIVE_INDICATORS + NEGATIVE_INDICATORS)
+_POSITIVE = frozenset(POSITIVE_INDICATORS)
+_NEGATIVE = frozenset(NEGATIVE_INDICATORS)
+
+
+def count_indicators(details):
+    """Number of distinct positive and negative indicators in a detailed answer"""
+    found = set()
+    for indicator in INDICATOR_PATTERN.findall(details.lower()):
+        found.update(INDICATOR_PREFIXES[indicator])
+    return len(found & _POSITIVE), len(found & _NEGATIVE)
+
+
+def _evaluate(capability_name, lens_name, answer_level, answer_details):
     # Get base score from level selection
-    base_score = level_mapping.get(answer_level, 2)
-    
-    # FinOps Foundation maturity characteristics
-    maturity_characteristics = {
-        0: {
-            'name': 'Crawl',
-            'description': 'No capability or awareness',
-            'characteristics': [
-                'No processes, tools, or understanding',
-                'Ad-hoc activities with no formal structure',
-                'No dedicated resources or ownership',
-                'Reactive approach to cost management'
-            ]
-        },
-        1: {
-            'name': 'Walk',
-            'description': 'Basic awareness and ad-hoc activities',
-            'characteristics': [
-                'Limited understanding and inconsistent execution',
-                'Some basic tools but no formal processes',
-                'Occasional activities without systematic approach',
-                'Basic cost visibility with manual processes'
-            ]
-        },
-        2: {
-            'name': 'Run',
-            'description': 'Some processes in place',
-            'characteristics': [
-                'Inconsistent execution with basic tools',
-                'Partial understanding and occasional success',
-                'Some formal processes but not consistently applied',
-                'Regular cost reviews with some automation'
-            ]
-        },
-        3: {
-            'name': 'Fly',
-            'description': 'Well-defined processes',
-            'characteristics': [
-                'Consistent execution with good tools',
-                'Strong understanding and regular success',
-                'Formal processes with clear ownership',
-                'Proactive cost optimization with good visibility'
-            ]
-        },
-        4: {
-            'name': 'Optimize',
-            'description': 'Optimized and automated',
-            'characteristics': [
-                'Continuous improvement with advanced tools',
-                'Expert level understanding and consistent excellence',
-                'Automated processes with predictive capabilities',
-                'Strategic cost management with predictive analytics'
-            ]
-        }
-    }
-    
-    # Analyze the detailed response for additional insights
-    details_lower = answer_details.lower()
+    base_score = LEVEL_SCORES.get(answer_level, DEFAULT_LEVEL_SCORE)
     
     # Adjust score based on detailed response analysis
     score_adjustment = 0
-    
-    # Positive indicators
-    positive_indicators = [
-        'automated', 'automation', 'consistent', 'processes', 'formal', 'structured',
-        'tools', 'platform', 'dashboard', 'monitoring', 'tracking', 'optimization',
-        'governance', 'policies', 'standards', 'training', 'education', 'team',
-        'ownership', 'responsibility', 'metrics', 'kpis', 'reporting', 'analysis'
-    ]
-    
-    # Negative indicators
-    negative_indicators = [
-        'manual', 'ad-hoc', 'inconsistent', 'no process', 'no tools', 'no understanding',
-        'limited', 'basic', 'occasional', 'reactive', 'no ownership', 'no responsibility',
-        'no monitoring', 'no tracking', 'no optimization', 'no governance'
-    ]
-    
-    positive_count = sum(1 for indicator in positive_indicators if indicator in details_lower)
-    negative_count = sum(1 for indicator in negative_indicators if indicator in details_lower)
-    
-    # Adjust score based on indicators
-    if positive_count > negative_count:
-        score_adjustment = min(1, (positive_count - negative_count) / 3)
-    elif negative_count > positive_count:
-        score_adjustment = max(-1, -(negative_count - positive_count) / 3)
+    if answer_details:
+        positive_count, negative_count = count_indicators(answer_details)
+        if positive_count > negative_count:
+            score_adjustment = min(1, (positive_count - negative_count) / 3)
+        elif negative_count > positive_count:
+            score_adjustment = max(-1, -(negative_count - positive_count) / 3)
     
     final_score = max(0, min(4, base_score + score_adjustment))
     
     # Get maturity level info
-    maturity_info = maturity_characteristics[int(final_score)]
+    maturity_info = MATURITY_LEVELS[int(final_score)]
     
     # Generate improvement suggestions based on current level
     improvement_suggestions = generate_improvement_suggestions(capability_name, lens_name, final_score, maturity_info)
@@ -141,43 +226,46 @@ def evaluate_finops_maturity(capability_name, lens_name, answer_level, answer_de
     }
 
 
+def evaluate_finops_maturity(capability_name, lens_name, answer_level, answer_details, scope_name):
+    """
+    Evaluate FinOps maturity based on the FinOps Foundation Assessment Guide
+
+    Answers without details come from SCORING_TABLE; the returned dict may be
+    shared and must not be modified.
+    """
+    if not answer_details:
+        evaluation = SCORING_TABLE.get((capability_name, lens_name, answer_level))
+        if evaluation is not None:
+            return evaluation
+    return _evaluate(capability_name, lens_name, answer_level, answer_details)
+
+
+def evaluate_many(answers):
+    """
+    Evaluate many answers at once: an iterable of (capability_name,
+    lens_name, answer_level, answer_details) gives a list of evaluations in
+    the same order, as evaluate_finops_maturity would return them.
+    """
+    table = SCORING_TABLE
+    evaluations = []
+    for capability_name, lens_name, answer_level, answer_details in answers:
+        evaluation = None if answer_details else table.get((capability_name, lens_name, answer_level))
+        if evaluation is None:
+            evaluation = _evaluate(capability_name, lens_name, answer_level, answer_details)
+        evaluations.append(evaluation)
+    return evaluations
+
+
+def suggestions_text(improvement_suggestions):
+    """Improvement suggestions as stored in responses (one per line)"""
+    if isinstance(improvement_suggestions, list):
+        return "\n".join(improvement_suggestions)
+    return improvement_suggestions
+
+
 def generate_improvement_suggestions(capability_name, lens_name, current_score, maturity_info):
     """Generate specific improvement suggestions based on current maturity level"""
-    
-    suggestions = {
-        0: [
-            "Establish basic awareness and understanding of FinOps principles",
-            "Begin with simple cost visibility and basic reporting",
-            "Identify key stakeholders and establish initial ownership",
-            "Start with manual processes and basic tools"
-        ],
-        1: [
-            "Develop formal processes and procedures",
-            "Implement basic automation and tooling",
-            "Establish regular review cycles and governance",
-            "Begin training and education programs"
-        ],
-        2: [
-            "Standardize processes across the organization",
-            "Enhance automation and tool integration",
-            "Implement comprehensive monitoring and alerting",
-            "Develop advanced analytics and reporting capabilities"
-        ],
-        3: [
-            "Optimize existing processes for efficiency",
-            "Implement predictive analytics and forecasting",
-            "Enhance cross-team collaboration and communication",
-            "Develop advanced automation and AI capabilities"
-        ],
-        4: [
-            "Focus on continuous improvement and innovation",
-            "Implement advanced predictive and prescriptive analytics",
-            "Develop strategic cost optimization strategies",
-            "Establish industry leadership and best practices"
-        ]
-    }
-    
-    base_suggestions = suggestions.get(int(current_score), suggestions[2])
+    base_suggestions = LEVEL_SUGGESTIONS.get(int(current_score), LEVEL_SUGGESTIONS[2])
     
     # Add capability-specific suggestions
     capability_suggestions = get_capability_specific_suggestions(capability_name, lens_name, current_score)
@@ -187,36 +275,7 @@ def generate_improvement_suggestions(capability_name, lens_name, current_score,
 
 def get_capability_specific_suggestions(capability_name, lens_name, current_score):
     """Get specific suggestions based on capability and lens"""
-    
-    suggestions = {
-        'data_ingestion': {
-            'knowledge': [
-                "Implement data governance and quality standards",
-                "Establish data lineage and documentation processes",
-                "Develop data validation and monitoring capabilities"
-            ],
-            'process': [
-                "Standardize data ingestion workflows",
-                "Implement automated data quality checks",
-                "Establish data ownership and responsibility"
-            ]
-        },
-        'allocation': {
-            'knowledge': [
-                "Develop comprehensive tagging strategies",
-                "Establish cost allocation methodologies",
-                "Implement chargeback and showback processes"
-            ],
-            'process': [
-                "Standardize allocation rules and policies",
-                "Implement automated allocation processes",
-                "Establish allocation review and approval workflows"
-            ]
-        }
-        # Add more capabilities as needed
-    }
-    
-    capability_suggestions = suggestions.get(capability_name, {}).get(lens_name, [])
+    capability_suggestions = CAPABILITY_SUGGESTIONS.get(capability_name, {}).get(lens_name, [])
     
     # Filter suggestions based on current score
     if current_score < 2:
@@ -253,158 +312,283 @@ def get_risks(score, capability_name, lens_name):
         return f"Minimal risk in {capability_name} {lens_name}. Advanced capabilities provide excellent control and optimization."
 
 
-def generate_recommendations(assessment_id, scope_id, domain, overall_percentage, lens_scores, database_path='finops_assessment.db'):
-    """Generate concise, actionable recommendations using OpenAI API, based on lowest scores from Results Matrix."""
-    try:
-        # Get all responses for this assessment
-        conn = sqlite3.connect(database_path)
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT capability_id, lens_id, answer, score, improvement_suggestions, evidence_files
-            FROM responses 
-            WHERE assessment_id = ?
-            ORDER BY capability_id, lens_id
-        ''', (assessment_id,))
-        responses = cursor.fetchall()
-        conn.close()
-        
-        # Build results matrix to find lowest scores
-        results_matrix = {}
-        lowest_scores = []
+# Every answer without details, by (capability name, lens name, answer level):
+# scoring is a pure function of those, so it is done once at import
+SCORING_TABLE = {
+    (capability['name'], lens['name'], level): _evaluate(capability['name'], lens['name'], level, '')
+    for capability in CAPABILITIES
+    for lens in LENSES
+    for level in LEVEL_SCORES
+}
+
+
+# Answer excerpt lengths tried in turn to fit a prompt into its budget
+SNIPPET_LENGTHS = [150, 100, 50, 0]
+
+
+def build_recommendation_messages(conn, assessment_id, scope_id, domain, overall_percentage,
+                                  max_prompt_tokens=AI_MAX_PROMPT_TOKENS):
+    """Chat messages asking for recommendations on an assessment's lowest scoring areas"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT capability_id, lens_id, answer, score, improvement_suggestions, evidence_files
+        FROM responses 
+        WHERE assessment_id = ?
+        ORDER BY capability_id, lens_id
+    ''', (assessment_id,))
+    responses = cursor.fetchall()
+    
+    # Build results matrix to find lowest scores
+    results_matrix = {}
+    lowest_scores = []
+    
+    for capability_id, lens_id, answer, score, improvement, evidence_files in responses:
+        if not capability_id or not lens_id:
+            continue
+        if capability_id not in results_matrix:
+            results_matrix[capability_id] = {}
         
-        for capability_id, lens_id, answer, score, improvement, evidence_files in responses:
-            if not capability_id or not lens_id:
-                continue
-            if capability_id not in results_matrix:
-                results_matrix[capability_id] = {}
-            
-            score_value = score or 0
-            results_matrix[capability_id][lens_id] = {
-                'score': score_value,
-                'answer': answer,
-                'improvement': improvement or 'No suggestions available'
-            }
-            
-            # Get capability and lens names
-            capability_name = next((c['name'] for c in CAPABILITIES if c['id'] == capability_id), capability_id)
-            lens_name = next((l['name'] for l in LENSES if l['id'] == lens_id), lens_id)
-            
-            # Add to lowest scores list for sorting
-            lowest_scores.append({
-                'capability_id': capability_id,
-                'capability_name': capability_name,
-                'lens_id': lens_id,
-                'lens_name': lens_name,
-                'score': score_value,
-                'answer': answer,
-                'improvement': improvement or 'No suggestions available'
-            })
+        score_value = score or 0
+        results_matrix[capability_id][lens_id] = {
+            'score': score_value,
+            'answer': answer,
+            'improvement': improvement or 'No suggestions available'
+        }
         
-        # Sort by score (ascending) to get lowest scores first
-        lowest_scores.sort(key=lambda x: x['score'])
+        # Get capability and lens names
+        capability_name = next((c['name'] for c in CAPABILITIES if c['id'] == capability_id), capability_id)
+        lens_name = next((l['name'] for l in LENSES if l['id'] == lens_id), lens_id)
         
-        # Take up to 5 lowest scores for recommendations
-        target_recommendations = lowest_scores[:5]
+        # Add to lowest scores list for sorting
+        lowest_scores.append({
+            'capability_id': capability_id,
+            'capability_name': capability_name,
+            'lens_id': lens_id,
+            'lens_name': lens_name,
+            'score': score_value,
+            'answer': answer,
+            'improvement': improvement or 'No suggestions available'
+        })
+    
+    # Sort by score (ascending) to get lowest scores first
+    lowest_scores.sort(key=lambda x: x['score'])
+    
+    # Take up to 5 lowest scores for recommendations, trimming the answer
+    # excerpts and then the number of areas until the prompt fits the budget
+    areas = 5
+    for snippet_chars in SNIPPET_LENGTHS:
+        messages = _recommendation_messages(scope_id, domain, overall_percentage, lowest_scores[:areas], snippet_chars)
+        if estimate_message_tokens(messages) <= max_prompt_tokens:
+            return messages
+    while areas > 1 and estimate_message_tokens(messages) > max_prompt_tokens:
+        areas -= 1
+        messages = _recommendation_messages(scope_id, domain, overall_percentage, lowest_scores[:areas], 0)
+    return messages
+
+
+def _truncate(text, chars):
+    """Shorten text to at most `chars` characters at a word boundary"""
+    if len(text) <= chars:
+        return text
+    words = text[:chars].rsplit(None, 1)
+    cut = words[0] if len(words) > 1 else text[:chars]
+    return cut.rstrip(' ,;:.') + '...'
+
+
+def _recommendation_messages(scope_id, domain, overall_percentage, target_recommendations, snippet_chars):
+    # Prepare summary for OpenAI
+    assessment_summary = f"""
+    Assessment Summary:
+    - Scope: {next((s['name'] for s in SCOPES if s['id'] == scope_id), scope_id)}
+    - Overall Score: {round(overall_percentage, 1)}%
+    - Domain: {domain}
+    """
+    
+    # Prepare lowest scores context for OpenAI
+    lowest_scores_context = "\nLowest Scoring Areas (Focus for Recommendations):\n"
+    for item in target_recommendations:
+        lowest_scores_context += f"- {item['capability_name']} ({item['lens_name']}): Score {item['score']}/4\n"
+        if snippet_chars:
+            lowest_scores_context += f"  Answer: {_truncate(item['answer'], snippet_chars)}\n"
+            lowest_scores_context += f"  Current Improvement: {_truncate(item['improvement'], snippet_chars)}\n"
+        lowest_scores_context += "\n"
+    
+    # Updated prompt to focus on lowest scores with new structure
+    prompt = f"""
+    You are a FinOps expert. Based on the user's lowest scoring areas below, provide exactly {len(target_recommendations)} concise, actionable recommendations for FinOps maturity improvement. Focus on the areas with the lowest scores.
+
+    CRITICAL: You must output ONLY the recommendations in this EXACT format, with NO extra text, headers, or explanations:
+
+    Title: [Title of Recommendation]
+    Description: [Brief description of the recommendation]
+    Why it is important: [Explanation of why this matters for FinOps maturity]
+    Recommendation: [Specific actionable steps to implement]
+
+    Title: [Title of Recommendation]
+    Description: [Brief description of the recommendation]
+    Why it is important: [Explanation of why this matters for FinOps maturity]
+    Recommendation: [Specific actionable steps to implement]
+
+    Continue this format for all {len(target_recommendations)} recommendations. Do NOT include any introduction, summary, section headers, or extra text. Do NOT number the recommendations. Do NOT use any other labels or formatting.
+
+    {assessment_summary}
+    {lowest_scores_context}
+    """
+    
+    return [
+        {"role": "system", "content": f"You are a FinOps expert. You must output EXACTLY {len(target_recommendations)} recommendations in the specified format. Each recommendation must have: Title:, Description:, Why it is important:, and Recommendation:. Do NOT include any extra text, headers, explanations, or numbering. Only output the required fields in the exact order. Focus on the lowest scoring areas."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def recommendation_request(messages, model=AI_MODEL):
+    """Chat completion parameters for recommendations (also the cache key)"""
+    return {
+        'model': model,
+        'messages': messages,
+        'max_tokens': AI_MAX_COMPLETION_TOKENS,
+        'temperature': 0.5
+    }
+
+
+def _prepare_request(conn, assessment_id, scope_id, domain, overall_percentage):
+    """The recommendations request for an assessment, within the prompt and daily budgets"""
+    messages = build_recommendation_messages(conn, assessment_id, scope_id, domain, overall_percentage)
+    prompt_tokens = estimate_message_tokens(messages)
+    return recommendation_request(messages, choose_model(conn, prompt_tokens)), prompt_tokens
+
+
+def clean_recommendations(recommendations):
+    """Strip extra text around the model's output and enforce the expected structure"""
+    if recommendations is None:
+        recommendations = ''
+    
+    # Remove any extra text at the beginning or end
+    recommendations = re.sub(r'^(Executive Summary|Introduction|Conclusion|Summary|Here are|Based on|I\'ll provide).*?\n', '', recommendations, flags=re.DOTALL | re.IGNORECASE)
+    recommendations = re.sub(r'\n\n+', '\n\n', recommendations)
+    recommendations = recommendations.strip()
+    
+    # Ensure we have the proper structure
+    if not re.search(r'Description:', recommendations):
+        # If the AI didn't follow the format, create a fallback structure
+        lines = recommendations.split('\n')
+        formatted_recommendations = []
+        current_recommendation = []
         
-        # Prepare summary for OpenAI
-        assessment_summary = f"""
-        Assessment Summary:
-        - Scope: {next((s['name'] for s in SCOPES if s['id'] == scope_id), scope_id)}
-        - Overall Score: {overall_percentage}%
-        - Domain: {domain}
-        """
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith('Description:') and not line.startswith('Why it is important:') and not line.startswith('Recommendation:'):
+                if current_recommendation:
+                    formatted_recommendations.append('\n'.join(current_recommendation))
+                    current_recommendation = []
+                current_recommendation.append(line)
+                current_recommendation.append('Description: Brief description of this recommendation')
+                current_recommendation.append('Why it is important: This will help improve your FinOps maturity')
+                current_recommendation.append('Recommendation: Implement specific steps to address this area')
         
-        # Prepare lowest scores context for OpenAI
-        lowest_scores_context = "\nLowest Scoring Areas (Focus for Recommendations):\n"
-        for item in target_recommendations:
-            lowest_scores_context += f"- {item['capability_name']} ({item['lens_name']}): Score {item['score']}/4\n"
-            lowest_scores_context += f"  Answer: {item['answer'][:150]}{'...' if len(item['answer']) > 150 else ''}\n"
-            lowest_scores_context += f"  Current Improvement: {item['improvement'][:150]}{'...' if len(item['improvement']) > 150 else ''}\n\n"
+        if current_recommendation:
+            formatted_recommendations.append('\n'.join(current_recommendation))
         
-        # Updated prompt to focus on lowest scores with new structure
-        prompt = f"""
-        You are a FinOps expert. Based on the user's lowest scoring areas below, provide exactly {len(target_recommendations)} concise, actionable recommendations for FinOps maturity improvement. Focus on the areas with the lowest scores.
+        recommendations = '\n\n'.join(formatted_recommendations)
+    return recommendations
 
-        CRITICAL: You must output ONLY the recommendations in this EXACT format, with NO extra text, headers, or explanations:
 
-        Title: [Title of Recommendation]
-        Description: [Brief description of the recommendation]
-        Why it is important: [Explanation of why this matters for FinOps maturity]
-        Recommendation: [Specific actionable steps to implement]
+def store_recommendations(conn, assessment_id, recommendations):
+    """Store recommendations on the assessment ONLY if they were generated successfully"""
+    if recommendations and "Unable to generate recommendations" not in recommendations:
+        # Parsed and rendered once here; views read recommendations_json
+        conn.execute('''
+            UPDATE assessments 
+            SET recommendations = ?, recommendations_json = ?
+            WHERE id = ?
+        ''', (recommendations, dump_recommendations(recommendations), assessment_id))
+        conn.commit()
 
-        Title: [Title of Recommendation]
-        Description: [Brief description of the recommendation]
-        Why it is important: [Explanation of why this matters for FinOps maturity]
-        Recommendation: [Specific actionable steps to implement]
 
-        Continue this format for all {len(target_recommendations)} recommendations. Do NOT include any introduction, summary, section headers, or extra text. Do NOT number the recommendations. Do NOT use any other labels or formatting.
+def generate_recommendations(conn, assessment_id, scope_id, domain, overall_percentage):
+    """
+    Generate concise, actionable recommendations using OpenAI API, based on
+    lowest scores from Results Matrix, and store them. Raises if none could
+    be generated; nothing is stored then.
+    """
+    request, prompt_tokens = _prepare_request(conn, assessment_id, scope_id, domain, overall_percentage)
 
-        {assessment_summary}
-        {lowest_scores_context}
-        """
-        
+    # Identical prompts share one generation: reuse a cached result or
+    # wait for the worker already generating it
+    started = time.monotonic()
+    fingerprint = recommendation_cache.request_fingerprint(request)
+    recommendations = recommendation_cache.acquire_or_wait(conn, fingerprint)
+    if recommendations is not None:
+        record_ai_call(conn, assessment_id, request['model'], 0, 0,
+                       (time.monotonic() - started) * 1000, 'ok', cache_hit=True)
+    else:
         # Call OpenAI API
+        started = time.monotonic()
         try:
-            client = get_openai_client()
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": f"You are a FinOps expert. You must output EXACTLY {len(target_recommendations)} recommendations in the specified format. Each recommendation must have: Title:, Description:, Why it is important:, and Recommendation:. Do NOT include any extra text, headers, explanations, or numbering. Only output the required fields in the exact order. Focus on the lowest scoring areas."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.5
-            )
-            recommendations = response.choices[0].message.content
-            if recommendations is None:
-                recommendations = ''
-            
-            # Clean up the recommendations to ensure proper formatting
-            # Remove any extra text at the beginning or end
-            recommendations = re.sub(r'^(Executive Summary|Introduction|Conclusion|Summary|Here are|Based on|I\'ll provide).*?\n', '', recommendations, flags=re.DOTALL | re.IGNORECASE)
-            recommendations = re.sub(r'\n\n+', '\n\n', recommendations)
-            recommendations = recommendations.strip()
-            
-            # Ensure we have the proper structure
-            if not re.search(r'Description:', recommendations):
-                # If the AI didn't follow the format, create a fallback structure
-                lines = recommendations.split('\n')
-                formatted_recommendations = []
-                current_recommendation = []
-                
-                for line in lines:
-                    line = line.strip()
-                    if line and not line.startswith('Description:') and not line.startswith('Why it is important:') and not line.startswith('Recommendation:'):
-                        if current_recommendation:
-                            formatted_recommendations.append('\n'.join(current_recommendation))
-                            current_recommendation = []
-                        current_recommendation.append(line)
-                        current_recommendation.append('Description: Brief description of this recommendation')
-                        current_recommendation.append('Why it is important: This will help improve your FinOps maturity')
-                        current_recommendation.append('Recommendation: Implement specific steps to address this area')
-                
-                if current_recommendation:
-                    formatted_recommendations.append('\n'.join(current_recommendation))
-                
-                recommendations = '\n\n'.join(formatted_recommendations)
-                
+            response = get_openai_client().create_chat_completion(request)
+            content = response.choices[0].message.content
+            usage = response.usage
+            record_ai_call(conn, assessment_id, request['model'],
+                           usage.prompt_tokens if usage else prompt_tokens,
+                           usage.completion_tokens if usage else estimate_tokens(content),
+                           (time.monotonic() - started) * 1000, 'ok')
+            recommendations = clean_recommendations(content)
         except Exception as e:
             print(f"OpenAI API error: {e}")
-            recommendations = "Unable to generate recommendations at this time. Please try again later."
-        
-        # Store recommendations in database ONLY if successful
-        if recommendations and "Unable to generate recommendations" not in recommendations:
-            conn = sqlite3.connect(database_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE assessments 
-                SET recommendations = ?
-                WHERE id = ?
-            ''', (recommendations, assessment_id))
-            conn.commit()
-            conn.close()
-        
-        return recommendations
-    except Exception as e:
-        print(f"Error generating recommendations: {e}")
-        return "Unable to generate recommendations at this time. Please try again later." 
\ No newline at end of file
+            record_ai_call(conn, assessment_id, request['model'], 0, 0,
+                           (time.monotonic() - started) * 1000, type(e).__name__)
+            recommendation_cache.release(conn, fingerprint)
+            raise
+        if not recommendations or "Unable to generate recommendations" in recommendations:
+            recommendation_cache.release(conn, fingerprint)
+            raise RuntimeError('No recommendations returned')
+        recommendation_cache.store(conn, fingerprint, recommendations)
+
+    store_recommendations(conn, assessment_id, recommendations)
+    return recommendations
+
+
+def stream_recommendations(conn, assessment_id, scope_id, domain, overall_percentage):
+    """
+    Generate recommendations like generate_recommendations, yielding the
+    model's text as it arrives (a cached result comes as a single piece).
+    The full text is cleaned and stored once the stream ends; errors are
+    raised to the caller.
+    """
+    request, prompt_tokens = _prepare_request(conn, assessment_id, scope_id, domain, overall_percentage)
+    started = time.monotonic()
+    fingerprint = recommendation_cache.request_fingerprint(request)
+    recommendations = recommendation_cache.acquire_or_wait(conn, fingerprint)
+    if recommendations is not None:
+        record_ai_call(conn, assessment_id, request['model'], 0, 0,
+                       (time.monotonic() - started) * 1000, 'ok', cache_hit=True)
+        store_recommendations(conn, assessment_id, recommendations)
+        yield recommendations
+        return
+    
+    started = time.monotonic()
+    chunks = []
+    usage = {}
+    try:
+        for text in get_openai_client().stream_chat_completion(request, usage):
+            chunks.append(text)
+            yield text
+        recommendations = clean_recommendations(''.join(chunks))
+        if not recommendations:
+            raise RuntimeError('No recommendations returned')
+    except BaseException as e:
+        # Failed, or the reader went away: let the next request generate them
+        conn.rollback()
+        outcome = 'cancelled' if isinstance(e, GeneratorExit) else type(e).__name__
+        record_ai_call(conn, assessment_id, request['model'],
+                       usage.get('prompt_tokens', prompt_tokens if chunks else 0),
+                       usage.get('completion_tokens', estimate_tokens(''.join(chunks))),
+                       (time.monotonic() - started) * 1000, outcome)
+        recommendation_cache.release(conn, fingerprint)
+        raise
+    record_ai_call(conn, assessment_id, request['model'],
+                   usage.get('prompt_tokens', prompt_tokens),
+                   usage.get('completion_tokens', estimate_tokens(''.join(chunks))),
+                   (time.monotonic() - started) * 1000, 'ok')
+    recommendation_cache.store(conn, fingerprint, recommendations)
+    store_recommendations(conn, assessment_id, recommendations)
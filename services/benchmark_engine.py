@@ -0,0 +1,252 @@
+"""
+Benchmark Engine for FinOps Assessment Platform
+Vectorized industry benchmark calculations shared by the results page,
+dashboard, company benchmarks and PDF export.
+
+Industry benchmarks are built from each company's most recent completed
+assessment covering a domain (see models/projections.py). Rolling windows
+are read from the monthly benchmark buckets, which already hold the score
+sums and company counts, and every mean is computed with NumPy reductions.
+
+The engine no longer bulk-loads a companies x capabilities x lenses score
+array. Every figure it served was a sum or count over the company axis,
+and the monthly buckets keep exactly those reductions on write. Loading
+per-company scores only to reduce them again would cost a read
+proportional to the number of companies.
+"""
+
+import numpy as np
+from datetime import date
+from data.capabilities import CAPABILITIES, LENSES, DOMAINS
+from models.projections import COMPLETE_ASSESSMENT, CAPABILITY_DOMAINS, DOMAIN_TOTAL_POINTS, ALL_DOMAINS
+from config import BENCHMARK_WINDOW_MONTHS
+
+CAPABILITY_IDS = [c['id'] for c in CAPABILITIES]
+LENS_IDS = [l['id'] for l in LENSES]
+CAPABILITY_INDEX = {capability_id: i for i, capability_id in enumerate(CAPABILITY_IDS)}
+LENS_INDEX = {lens_id: i for i, lens_id in enumerate(LENS_IDS)}
+DOMAIN_INDEX = {domain: i for i, domain in enumerate(DOMAINS)}
+
+# Domain of each capability, and a domains x capabilities membership matrix
+CAPABILITY_DOMAIN = np.array([DOMAIN_INDEX[CAPABILITY_DOMAINS[c]] for c in CAPABILITY_IDS])
+DOMAIN_MEMBERSHIP = (CAPABILITY_DOMAIN[np.newaxis, :] == np.arange(len(DOMAINS))[:, np.newaxis]).astype(np.int64)
+
+MAX_SCORE = 4
+
+
+def _mean(sums, counts):
+    """Element-wise sums / counts, NaN where there is no data"""
+    sums = np.asarray(sums, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.float64)
+    return np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+
+
+def _none_if_nan(value):
+    return None if np.isnan(value) else float(value)
+
+
+class Benchmarks:
+    """Industry score sums and counts per capability x lens cell, plus company counts"""
+
+    def __init__(self, cell_sums, cell_counts, domain_companies, total_companies):
+        self.cell_sums = np.asarray(cell_sums, dtype=np.int64)
+        self.cell_counts = np.asarray(cell_counts, dtype=np.int64)
+        self.domain_companies = np.asarray(domain_companies, dtype=np.int64)
+        self.total_companies = int(total_companies)
+
+    def domain_means(self):
+        """Mean score per domain"""
+        means = _mean(DOMAIN_MEMBERSHIP @ self.cell_sums.sum(axis=1), DOMAIN_MEMBERSHIP @ self.cell_counts.sum(axis=1))
+        return {domain: _none_if_nan(means[i]) for i, domain in enumerate(DOMAINS)}
+
+    def domain_company_counts(self):
+        """Number of companies contributing to each domain"""
+        return {domain: int(self.domain_companies[i]) for i, domain in enumerate(DOMAINS)}
+
+    def industry_summary(self, domain):
+        """
+        Industry figures for an assessment of `domain` on the 0-4 scale.
+
+        Complete assessments get one benchmark per domain and an overall
+        average across the domains that have data.
+        """
+        means = self.domain_means()
+        companies = self.domain_company_counts()
+
+        if domain == COMPLETE_ASSESSMENT:
+            domain_benchmarks = {
+                domain_name: {
+                    'avg_score': means[domain_name] or 0,
+                    'unique_companies': companies[domain_name],
+                    'has_data': companies[domain_name] >= 1
+                }
+                for domain_name in DOMAINS
+            }
+            valid_domains = [b for b in domain_benchmarks.values() if b['has_data']]
+            industry_avg = sum(b['avg_score'] for b in valid_domains) / len(valid_domains) if valid_domains else 0
+            unique_companies = self.total_companies if valid_domains else 0
+        else:
+            domain_benchmarks = None
+            industry_avg = means.get(domain) or 0
+            unique_companies = companies.get(domain, 0)
+
+        return {
+            'industry_avg': industry_avg,
+            'unique_companies': unique_companies,
+            'has_benchmark_data': unique_companies > 0,
+            'domain_benchmarks': domain_benchmarks
+        }
+
+
+class CompanyScores:
+    """Maturity percentage per company and domain from company_latest_assessment"""
+
+    def __init__(self, companies, percentages):
+        self.companies = companies
+        self.company_index = {company_hash: i for i, company_hash in enumerate(companies)}
+        self.percentages = percentages  # companies x domains, NaN where not assessed
+
+    def company(self, company_hash):
+        """The company's maturity percentage per domain (None where not assessed)"""
+        i = self.company_index.get(company_hash)
+        if i is None:
+            return [None] * len(DOMAINS)
+        return [_none_if_nan(value) for value in self.percentages[i]]
+
+    def industry(self, exclude_company=None):
+        """Average maturity percentage per domain across companies, optionally excluding one"""
+        rows = self.percentages
+        i = self.company_index.get(exclude_company)
+        if i is not None:
+            rows = np.delete(rows, i, axis=0)
+        assessed = ~np.isnan(rows)
+        means = _mean(np.where(assessed, rows, 0).sum(axis=0), assessed.sum(axis=0))
+        return [_none_if_nan(value) for value in means]
+
+
+class Distribution:
+    """Exact distribution of an integer company-level score, from histogram counts"""
+
+    def __init__(self, counts):
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.cumulative = np.cumsum(self.counts)
+        self.total = int(self.cumulative[-1]) if len(self.cumulative) else 0
+
+    def quantile(self, q):
+        """Lowest score reached by at least a fraction `q` of companies"""
+        if not self.total:
+            return None
+        return int(np.searchsorted(self.cumulative, q * self.total))
+
+    def quartiles(self):
+        return {'p25': self.quantile(0.25), 'p50': self.quantile(0.5), 'p75': self.quantile(0.75)}
+
+    def percentile_rank(self, value):
+        """Percentage of companies below `value`, counting ties as half"""
+        if not self.total or value is None:
+            return None
+        value = min(max(int(round(value)), 0), len(self.counts) - 1)
+        below = self.cumulative[value - 1] if value > 0 else 0
+        return float((below + self.counts[value] / 2) / self.total * 100)
+
+
+class ScoreDistributions:
+    """Company-level score histograms per capability x lens and per domain"""
+
+    def __init__(self, cell_counts, domain_counts):
+        self.cell_counts = cell_counts  # capabilities x lenses x (MAX_SCORE + 1)
+        self.domain_counts = domain_counts  # domain -> counts per total domain points
+
+    def cell(self, capability_id, lens_id):
+        """Distribution of 0-4 scores for one question"""
+        if capability_id not in CAPABILITY_INDEX or lens_id not in LENS_INDEX:
+            return Distribution([])
+        return Distribution(self.cell_counts[CAPABILITY_INDEX[capability_id], LENS_INDEX[lens_id]])
+
+    def domain(self, domain):
+        """Distribution of total domain points"""
+        return Distribution(self.domain_counts.get(domain, []))
+
+    def domain_summary(self, domain, points=None):
+        """Domain quartiles as maturity percentages, plus the percentile rank of `points`"""
+        distribution = self.domain(domain)
+        total_points = DOMAIN_TOTAL_POINTS[domain]
+        quartiles = {
+            name: value * 100 / total_points if value is not None else None
+            for name, value in distribution.quartiles().items()
+        }
+        return dict(quartiles, companies=distribution.total, percentile_rank=distribution.percentile_rank(points))
+
+
+def load_distributions(conn):
+    """Load the exact company-level score histograms"""
+    cell_counts = np.zeros((len(CAPABILITY_IDS), len(LENS_IDS), MAX_SCORE + 1), dtype=np.int64)
+    for capability_id, lens_id, score, companies in conn.execute('''
+        SELECT capability_id, lens_id, score, companies
+        FROM score_histogram
+    '''):
+        if capability_id in CAPABILITY_INDEX and lens_id in LENS_INDEX and 0 <= score <= MAX_SCORE:
+            cell_counts[CAPABILITY_INDEX[capability_id], LENS_INDEX[lens_id], score] = companies
+
+    domain_counts = {domain: np.zeros(DOMAIN_TOTAL_POINTS[domain] + 1, dtype=np.int64) for domain in DOMAINS}
+    for domain, points, companies in conn.execute('''
+        SELECT domain, points, companies
+        FROM domain_score_histogram
+    '''):
+        if domain in domain_counts and 0 <= points <= DOMAIN_TOTAL_POINTS[domain]:
+            domain_counts[domain][points] = companies
+    return ScoreDistributions(cell_counts, domain_counts)
+
+
+def load_company_scores(conn):
+    """Load every company's latest maturity percentage per domain"""
+    rows = conn.execute('''
+        SELECT company_hash, domain, domain_score
+        FROM company_latest_assessment
+    ''').fetchall()
+
+    companies = sorted({company_hash for company_hash, _, _ in rows})
+    company_index = {company_hash: i for i, company_hash in enumerate(companies)}
+    percentages = np.full((len(companies), len(DOMAINS)), np.nan)
+    for company_hash, domain, domain_score in rows:
+        if domain in DOMAIN_INDEX and domain_score is not None:
+            percentages[company_index[company_hash], DOMAIN_INDEX[domain]] = domain_score
+    return CompanyScores(companies, percentages)
+
+
+def window_start(months=None, today=None):
+    """First month ('YYYY-MM') of a rolling window of `months` month buckets"""
+    months = months or BENCHMARK_WINDOW_MONTHS
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - (months - 1)
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def load_benchmarks(conn, months=None, all_time=False):
+    """
+    Industry benchmarks over the last `months` month buckets (default
+    BENCHMARK_WINDOW_MONTHS), or over all time.
+    """
+    window = '' if all_time else 'WHERE month >= ?'
+    params = () if all_time else (window_start(months),)
+
+    cell_sums = np.zeros((len(CAPABILITY_IDS), len(LENS_IDS)), dtype=np.int64)
+    cell_counts = np.zeros_like(cell_sums)
+    for capability_id, lens_id, sum_score, n in conn.execute(f'''
+        SELECT capability_id, lens_id, SUM(sum_score), SUM(n)
+        FROM benchmark_monthly
+        {window}
+        GROUP BY capability_id, lens_id
+    ''', params):
+        if capability_id in CAPABILITY_INDEX and lens_id in LENS_INDEX:
+            cell_sums[CAPABILITY_INDEX[capability_id], LENS_INDEX[lens_id]] = sum_score
+            cell_counts[CAPABILITY_INDEX[capability_id], LENS_INDEX[lens_id]] = n
+
+    companies = dict(conn.execute(f'''
+        SELECT domain, SUM(companies)
+        FROM benchmark_monthly_companies
+        {window}
+        GROUP BY domain
+    ''', params).fetchall())
+    domain_companies = [companies.get(domain, 0) for domain in DOMAINS]
+    return Benchmarks(cell_sums, cell_counts, domain_companies, companies.get(ALL_DOMAINS, 0))
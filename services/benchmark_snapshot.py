@@ -0,0 +1,266 @@
+"""
+Benchmark Snapshot Service for FinOps Assessment Platform
+Publishes the benchmark projections as a versioned binary snapshot that
+every worker memory-maps, so industry numbers are served without SQL.
+
+benchmark_state.source_version is bumped in the same transaction as any
+change to the benchmark projections. Publishing reads the projections in
+one read transaction, writes benchmark_snapshot.<version>.bin atomically
+(temp file + rename) and records it as snapshot_version. Workers check
+that single row per request and remap only when the version changes;
+the mapped pages are shared between processes by the OS page cache.
+
+File layout: 8-byte magic, 4-byte header length, JSON header (version,
+months, companies and the dtype/shape/offset of each array), then the
+raw arrays, each aligned to ALIGNMENT bytes.
+"""
+
+import os
+import json
+import mmap
+import struct
+import threading
+import numpy as np
+from datetime import datetime
+from data.capabilities import DOMAINS
+from models.database import connect
+from models.projections import DOMAIN_TOTAL_POINTS, ALL_DOMAINS
+from services.benchmark_engine import (
+    Benchmarks, CompanyScores, ScoreDistributions, CAPABILITY_IDS, LENS_IDS,
+    CAPABILITY_INDEX, LENS_INDEX, DOMAIN_INDEX, MAX_SCORE, window_start
+)
+from config import BENCHMARK_SNAPSHOT_DIR
+
+MAGIC = b'FOBSNAP1'
+ALIGNMENT = 64
+KEEP_SNAPSHOTS = 2
+
+_lock = threading.Lock()
+_current = None
+
+
+class BenchmarkSnapshot:
+    """Read-only view over a mapped snapshot file"""
+
+    def __init__(self, header, arrays, mapping=None):
+        self.version = header['version']
+        self.built_at = header['built_at']
+        self.months = np.array(header['months'], dtype='U7')
+        self.companies = header['companies']
+        self.arrays = arrays
+        self._mapping = mapping  # keeps the mmap alive while arrays reference it
+
+    def benchmarks(self, months=None, all_time=False):
+        """Industry benchmarks over a rolling window of month buckets, or all time"""
+        if all_time:
+            selected = np.ones(len(self.months), dtype=bool)
+        else:
+            selected = self.months >= window_start(months)
+        companies = self.arrays['month_companies'][selected].sum(axis=0)
+        return Benchmarks(
+            self.arrays['month_sums'][selected].sum(axis=0),
+            self.arrays['month_counts'][selected].sum(axis=0),
+            companies[:len(DOMAINS)],
+            companies[len(DOMAINS)]
+        )
+
+    def company_scores(self):
+        return CompanyScores(self.companies, self.arrays['company_percentages'])
+
+    def distributions(self):
+        domain_histogram = self.arrays['domain_histogram']
+        return ScoreDistributions(self.arrays['cell_histogram'], {
+            domain: domain_histogram[i, :DOMAIN_TOTAL_POINTS[domain] + 1] for i, domain in enumerate(DOMAINS)
+        })
+
+
+def snapshot_path(version):
+    return os.path.join(BENCHMARK_SNAPSHOT_DIR, f'benchmark_snapshot.{version}.bin')
+
+
+def _read_projections(conn):
+    """Read every benchmark projection into arrays, within one read transaction"""
+    conn.execute('BEGIN')
+    try:
+        version = conn.execute('SELECT source_version FROM benchmark_state WHERE id = 1').fetchone()[0]
+        bucket_rows = conn.execute('''
+            SELECT month, capability_id, lens_id, sum_score, n FROM benchmark_monthly
+        ''').fetchall()
+        company_rows = conn.execute('''
+            SELECT month, domain, companies FROM benchmark_monthly_companies
+        ''').fetchall()
+        latest_rows = conn.execute('''
+            SELECT company_hash, domain, domain_score FROM company_latest_assessment
+        ''').fetchall()
+        cell_rows = conn.execute('''
+            SELECT capability_id, lens_id, score, companies FROM score_histogram
+        ''').fetchall()
+        points_rows = conn.execute('''
+            SELECT domain, points, companies FROM domain_score_histogram
+        ''').fetchall()
+    finally:
+        conn.commit()
+
+    months = sorted({row[0] for row in bucket_rows} | {row[0] for row in company_rows})
+    month_index = {month: i for i, month in enumerate(months)}
+    shape = (len(months), len(CAPABILITY_IDS), len(LENS_IDS))
+    month_sums = np.zeros(shape, dtype=np.int64)
+    month_counts = np.zeros(shape, dtype=np.int64)
+    for month, capability_id, lens_id, sum_score, n in bucket_rows:
+        if capability_id in CAPABILITY_INDEX and lens_id in LENS_INDEX:
+            cell = (month_index[month], CAPABILITY_INDEX[capability_id], LENS_INDEX[lens_id])
+            month_sums[cell] = sum_score
+            month_counts[cell] = n
+
+    month_companies = np.zeros((len(months), len(DOMAINS) + 1), dtype=np.int64)
+    for month, domain, companies in company_rows:
+        column = len(DOMAINS) if domain == ALL_DOMAINS else DOMAIN_INDEX.get(domain)
+        if column is not None:
+            month_companies[month_index[month], column] = companies
+
+    company_hashes = sorted({row[0] for row in latest_rows})
+    company_index = {company_hash: i for i, company_hash in enumerate(company_hashes)}
+    company_percentages = np.full((len(company_hashes), len(DOMAINS)), np.nan)
+    for company_hash, domain, domain_score in latest_rows:
+        if domain in DOMAIN_INDEX and domain_score is not None:
+            company_percentages[company_index[company_hash], DOMAIN_INDEX[domain]] = domain_score
+
+    cell_histogram = np.zeros((len(CAPABILITY_IDS), len(LENS_IDS), MAX_SCORE + 1), dtype=np.int64)
+    for capability_id, lens_id, score, companies in cell_rows:
+        if capability_id in CAPABILITY_INDEX and lens_id in LENS_INDEX and 0 <= score <= MAX_SCORE:
+            cell_histogram[CAPABILITY_INDEX[capability_id], LENS_INDEX[lens_id], score] = companies
+
+    domain_histogram = np.zeros((len(DOMAINS), max(DOMAIN_TOTAL_POINTS.values()) + 1), dtype=np.int64)
+    for domain, points, companies in points_rows:
+        if domain in DOMAIN_INDEX and 0 <= points <= DOMAIN_TOTAL_POINTS[domain]:
+            domain_histogram[DOMAIN_INDEX[domain], points] = companies
+
+    header = {
+        'version': version,
+        'built_at': datetime.now().isoformat(),
+        'months': months,
+        'companies': company_hashes
+    }
+    arrays = {
+        'month_sums': month_sums,
+        'month_counts': month_counts,
+        'month_companies': month_companies,
+        'company_percentages': company_percentages,
+        'cell_histogram': cell_histogram,
+        'domain_histogram': domain_histogram
+    }
+    return header, arrays
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _write_snapshot(path, header, arrays):
+    """Write a snapshot file atomically"""
+    header = dict(header, arrays={})
+    offset = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _align(len(MAGIC) + 4 + len(header_bytes))
+
+    temp_path = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + header['arrays'][name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _map_snapshot(path):
+    """Memory-map a snapshot file; arrays are zero-copy views of the mapping"""
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapping[:len(MAGIC)] != MAGIC:
+        mapping.close()
+        raise ValueError(f'Not a benchmark snapshot: {path}')
+    header_length = struct.unpack('<I', mapping[len(MAGIC):len(MAGIC) + 4])[0]
+    header_end = len(MAGIC) + 4 + header_length
+    header = json.loads(mapping[len(MAGIC) + 4:header_end])
+    data_start = _align(header_end)
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape']))
+        arrays[name] = np.frombuffer(
+            mapping, dtype=dtype, count=count, offset=data_start + spec['offset']
+        ).reshape(spec['shape'])
+    return BenchmarkSnapshot(header, arrays, mapping)
+
+
+def _remove_old_snapshots(version):
+    """Delete snapshot files older than the last KEEP_SNAPSHOTS versions"""
+    for filename in os.listdir(BENCHMARK_SNAPSHOT_DIR):
+        parts = filename.split('.')
+        if len(parts) == 3 and parts[0] == 'benchmark_snapshot' and parts[1].isdigit():
+            if int(parts[1]) <= version - KEEP_SNAPSHOTS:
+                try:
+                    os.remove(os.path.join(BENCHMARK_SNAPSHOT_DIR, filename))
+                except OSError:
+                    pass
+
+
+def publish_snapshot():
+    """Write a snapshot of the current projections and make it the current version"""
+    os.makedirs(BENCHMARK_SNAPSHOT_DIR, exist_ok=True)
+    # A dedicated connection keeps the read transaction and the version
+    # update apart from whatever the caller has in flight
+    conn = connect()
+    try:
+        header, arrays = _read_projections(conn)
+        version = header['version']
+        path = snapshot_path(version)
+        if not os.path.exists(path):
+            _write_snapshot(path, header, arrays)
+        conn.execute('''
+            UPDATE benchmark_state SET snapshot_version = ? WHERE id = 1 AND snapshot_version < ?
+        ''', (version, version))
+        conn.commit()
+    finally:
+        conn.close()
+    _remove_old_snapshots(version)
+    return version
+
+
+def try_publish_snapshot():
+    """Publish a snapshot after a write; readers rebuild it themselves if this fails"""
+    try:
+        return publish_snapshot()
+    except Exception as e:
+        print(f"Benchmark snapshot not published: {e}")
+        return None
+
+
+def get_benchmark_snapshot(conn):
+    """Return the current snapshot, remapping only when its version has changed"""
+    global _current
+    source_version, snapshot_version = conn.execute('''
+        SELECT source_version, snapshot_version FROM benchmark_state WHERE id = 1
+    ''').fetchone()
+
+    current = _current
+    if current is not None and current.version == snapshot_version == source_version:
+        return current
+
+    with _lock:
+        current = _current
+        if current is not None and current.version == snapshot_version == source_version:
+            return current
+        path = snapshot_path(snapshot_version)
+        if snapshot_version < source_version or not os.path.exists(path):
+            snapshot_version = publish_snapshot()
+            path = snapshot_path(snapshot_version)
+        _current = _map_snapshot(path)
+        return _current
@@ -0,0 +1,252 @@
+"""
+Job Queue Service for FinOps Assessment Platform
+Persistent background jobs in the SQLite jobs table, run by a pool of
+worker threads.
+
+A job is (kind, assessment_id). Handlers register per kind with
+@job_handler and run with their own database connection. At most one job
+of a kind is pending per assessment; enqueueing while one is pending is a
+no-op. Claiming a job is a single IMMEDIATE transaction, so any number of
+threads and processes can share the queue. A claimed job holds a lease;
+if its worker dies the job runs again once the lease expires, and a
+worker that outlived its lease can no longer change the job. Failures
+are retried with exponential backoff up to AI_JOB_MAX_ATTEMPTS; a job
+whose lease expires on its last attempt (its worker crashed) fails.
+"""
+
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from models.database import connect
+from config import AI_JOB_MAX_ATTEMPTS, AI_JOB_LEASE_SECONDS, AI_JOB_POLL_SECONDS
+
+RETRY_BASE_SECONDS = 30
+
+JOB_HANDLERS = {}
+
+# This process's pool (see start_process_pool) and the pid that started it
+_process_pool = None
+_process_pool_pid = None
+_process_pool_lock = threading.Lock()
+
+
+def worker_name(suffix):
+    """Identify a worker by host, process and `suffix` (recorded on the jobs it claims)"""
+    return f'{socket.gethostname()}:{os.getpid()}:{suffix}'
+
+
+def job_handler(kind):
+    """Register `func(conn, assessment_id)` as the handler for jobs of `kind`"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue_job(conn, kind, assessment_id, delay_seconds=0):
+    """Queue a job unless one is already pending (caller commits); returns True if queued"""
+    now = datetime.now()
+    cursor = conn.execute('''
+        INSERT INTO jobs (kind, assessment_id, status, run_after, created_at, updated_at)
+        VALUES (?, ?, 'queued', ?, ?, ?)
+        ON CONFLICT DO NOTHING
+    ''', (kind, assessment_id, now + timedelta(seconds=delay_seconds), now, now))
+    return cursor.rowcount > 0
+
+
+def job_status(conn, kind, assessment_id):
+    """Latest job of a kind for an assessment as a dict, or None"""
+    row = conn.execute('''
+        SELECT status, attempts, last_error, updated_at
+        FROM jobs
+        WHERE assessment_id = ? AND kind = ?
+        ORDER BY id DESC
+        LIMIT 1
+    ''', (assessment_id, kind)).fetchone()
+    if not row:
+        return None
+    return {'status': row[0], 'attempts': row[1], 'last_error': row[2], 'updated_at': row[3]}
+
+
+def _lease(conn, job_id, worker, now):
+    conn.execute('''
+        UPDATE jobs SET status = 'running', attempts = attempts + 1, run_after = ?,
+            worker = ?, updated_at = ?
+        WHERE id = ?
+    ''', (now + timedelta(seconds=AI_JOB_LEASE_SECONDS), worker, now, job_id))
+
+
+def _fail_abandoned(conn, now):
+    """Fail jobs whose worker died holding the lease on their last attempt"""
+    conn.execute('''
+        UPDATE jobs SET status = 'failed', last_error = 'Lease expired on the last attempt', updated_at = ?
+        WHERE status = 'running' AND run_after <= ? AND attempts >= ?
+    ''', (now, now, AI_JOB_MAX_ATTEMPTS))
+
+
+def claim_job(conn, worker):
+    """Take the next due job (or one whose lease expired); returns (id, kind, assessment_id) or None"""
+    now = datetime.now()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        _fail_abandoned(conn, now)
+        row = conn.execute('''
+            SELECT id, kind, assessment_id
+            FROM jobs
+            WHERE status IN ('queued', 'running') AND run_after <= ?
+            ORDER BY run_after
+            LIMIT 1
+        ''', (now,)).fetchone()
+        if row:
+            _lease(conn, row[0], worker, now)
+        conn.commit()
+        return row
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def claim_assessment_job(conn, kind, assessment_id, worker):
+    """
+    Take an assessment's pending job of a kind ahead of its schedule, so a
+    request can run it itself; returns the job id, or None if there is no
+    pending job or another worker holds it
+    """
+    now = datetime.now()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        _fail_abandoned(conn, now)
+        row = conn.execute('''
+            SELECT id
+            FROM jobs
+            WHERE assessment_id = ? AND kind = ?
+            AND (status = 'queued' OR (status = 'running' AND run_after <= ?))
+        ''', (assessment_id, kind, now)).fetchone()
+        if row:
+            _lease(conn, row[0], worker, now)
+        conn.commit()
+        return row[0] if row else None
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# finish_job, fail_job and release_job only touch a job while `worker`
+# still holds its lease; they return False once another worker reclaimed it
+
+
+def finish_job(conn, job_id, worker):
+    cursor = conn.execute('''
+        UPDATE jobs SET status = 'done', last_error = NULL, updated_at = ?
+        WHERE id = ? AND worker = ? AND status = 'running'
+    ''', (datetime.now(), job_id, worker))
+    conn.commit()
+    return cursor.rowcount > 0
+
+
+def fail_job(conn, job_id, worker, error):
+    """Record a failure; retry with backoff until the attempts run out"""
+    now = datetime.now()
+    row = conn.execute('''
+        SELECT attempts FROM jobs WHERE id = ? AND worker = ? AND status = 'running'
+    ''', (job_id, worker)).fetchone()
+    if not row:
+        return False
+    attempts = row[0]
+    if attempts >= AI_JOB_MAX_ATTEMPTS:
+        conn.execute('''
+            UPDATE jobs SET status = 'failed', last_error = ?, updated_at = ?
+            WHERE id = ? AND worker = ? AND status = 'running'
+        ''', (str(error), now, job_id, worker))
+    else:
+        conn.execute('''
+            UPDATE jobs SET status = 'queued', last_error = ?, run_after = ?, updated_at = ?
+            WHERE id = ? AND worker = ? AND status = 'running'
+        ''', (str(error), now + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (attempts - 1)), now, job_id, worker))
+    conn.commit()
+    return True
+
+
+def release_job(conn, job_id, worker):
+    """Hand a claimed job back to the workers without counting the attempt"""
+    now = datetime.now()
+    cursor = conn.execute('''
+        UPDATE jobs SET status = 'queued', attempts = attempts - 1, run_after = ?, updated_at = ?
+        WHERE id = ? AND worker = ? AND status = 'running'
+    ''', (now, now, job_id, worker))
+    conn.commit()
+    return cursor.rowcount > 0
+
+
+def run_next_job(conn, worker):
+    """Claim and run one job; returns False when none was due"""
+    job = claim_job(conn, worker)
+    if not job:
+        return False
+    job_id, kind, assessment_id = job
+    handler = JOB_HANDLERS.get(kind)
+    try:
+        if not handler:
+            raise ValueError(f'No handler for {kind} jobs')
+        handler(conn, assessment_id)
+    except Exception as e:
+        conn.rollback()
+        print(f"Job {job_id} ({kind}, assessment {assessment_id}) failed: {e}")
+        finished = fail_job(conn, job_id, worker, e)
+    else:
+        finished = finish_job(conn, job_id, worker)
+    if not finished:
+        print(f"Job {job_id} ({kind}, assessment {assessment_id}): lease lost to another worker")
+    return True
+
+
+class WorkerPool:
+    """Threads that run queued jobs until stopped"""
+
+    def __init__(self, size):
+        self.size = size
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def _run(self, worker):
+        conn = connect()
+        try:
+            while not self.stopping.is_set():
+                try:
+                    if not run_next_job(conn, worker):
+                        self.stopping.wait(AI_JOB_POLL_SECONDS)
+                except Exception as e:
+                    print(f"Job worker {worker} error: {e}")
+                    self.stopping.wait(AI_JOB_POLL_SECONDS)
+        finally:
+            conn.close()
+
+    def start(self):
+        for i in range(self.size):
+            worker = worker_name(i)
+            thread = threading.Thread(target=self._run, args=(worker,), name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+
+def start_process_pool(size):
+    """
+    Start `size` workers in this process unless it already runs them.
+    Threads do not survive a fork, so a forked server worker starts its
+    own pool on its first call.
+    """
+    global _process_pool, _process_pool_pid
+    if _process_pool_pid == os.getpid():
+        return _process_pool
+    with _process_pool_lock:
+        if _process_pool_pid != os.getpid():
+            _process_pool = WorkerPool(size).start()
+            _process_pool_pid = os.getpid()
+    return _process_pool
@@ -0,0 +1,316 @@
+"""
+OpenAI Client for FinOps Assessment Platform
+Wraps the OpenAI client so that a slow or failing provider degrades AI
+features instead of the whole site.
+
+- one keep-alive HTTP connection pool per process
+- a deadline per call covering all of its attempts
+- retries of transient errors (connection, timeout, 429, 5xx) with
+  exponentially growing, fully jittered backoff
+- a circuit breaker: after AI_BREAKER_FAILURES consecutive failed
+  attempts calls fail fast with CircuitOpenError for
+  AI_BREAKER_RESET_SECONDS, then a single trial call decides whether
+  it closes again
+- latency, error and breaker metrics (per process) via metrics_snapshot()
+"""
+
+import time
+import random
+import threading
+import httpx
+import openai
+from config import (AI_CONNECT_TIMEOUT_SECONDS, AI_REQUEST_TIMEOUT_SECONDS, AI_CALL_DEADLINE_SECONDS,
+                    AI_MAX_RETRIES, AI_RETRY_BASE_SECONDS, AI_RETRY_MAX_SECONDS,
+                    AI_POOL_CONNECTIONS, AI_POOL_KEEPALIVE_SECONDS,
+                    AI_BREAKER_FAILURES, AI_BREAKER_RESET_SECONDS)
+
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+LATENCY_BUCKETS = [0.5, 1, 2, 5, 10, 30, 60, 120]
+
+
+class CircuitOpenError(Exception):
+    """The provider is considered unhealthy; the call was not attempted"""
+
+
+class DeadlineExceededError(Exception):
+    """The call's deadline passed before it could complete"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half open -> closed)"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def allow(self):
+        """Whether a call may go ahead now"""
+        with self.lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self.trial_running = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.trial_running = False
+
+    def abandon(self):
+        """A call ended without telling whether the provider is healthy"""
+        with self.lock:
+            self.trial_running = False
+
+    def retry_in(self):
+        """Seconds until an open breaker lets a trial call through"""
+        with self.lock:
+            if self.state != self.OPEN:
+                return 0
+            return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+
+class ClientMetrics:
+    """Counters and a latency histogram of AI calls"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.retries = 0
+        self.short_circuited = 0
+        self.errors = {}
+        self.latency_count = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def record_call(self, seconds, error=None):
+        with self.lock:
+            self.calls += 1
+            if error is None:
+                self.successes += 1
+            else:
+                self.failures += 1
+            self.latency_count += 1
+            self.latency_sum += seconds
+            self.latency_max = max(self.latency_max, seconds)
+            bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+            self.latency_buckets[bucket] += 1
+
+    def record_error(self, error):
+        with self.lock:
+            name = type(error).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def record_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def record_short_circuit(self):
+        with self.lock:
+            self.short_circuited += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'successes': self.successes,
+                'failures': self.failures,
+                'retries': self.retries,
+                'short_circuited': self.short_circuited,
+                'errors': dict(self.errors),
+                'latency': {
+                    'count': self.latency_count,
+                    'avg_seconds': round(self.latency_sum / self.latency_count, 3) if self.latency_count else 0,
+                    'max_seconds': round(self.latency_max, 3),
+                    'buckets': {
+                        **{f'le_{bound}': count for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets)},
+                        'le_inf': self.latency_buckets[-1]
+                    }
+                }
+            }
+
+
+def _retry_after(error):
+    """Seconds the provider asked us to wait, if it said so"""
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('retry-after')) if response is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ResilientOpenAI:
+    """Chat completions with deadlines, retries and a circuit breaker"""
+
+    def __init__(self, api_key, base_url):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.http_client = httpx.Client(limits=httpx.Limits(
+            max_connections=AI_POOL_CONNECTIONS,
+            max_keepalive_connections=AI_POOL_CONNECTIONS,
+            keepalive_expiry=AI_POOL_KEEPALIVE_SECONDS
+        ))
+        self._client = None
+        self.breaker = CircuitBreaker(AI_BREAKER_FAILURES, AI_BREAKER_RESET_SECONDS)
+        self.metrics = ClientMetrics()
+
+    @property
+    def client(self):
+        """The SDK client, created on first use (it refuses to exist without an API key)"""
+        if self._client is None:
+            # Retries are ours: the SDK's own would ignore the deadline and the breaker
+            self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0,
+                                         http_client=self.http_client)
+        return self._client
+
+    def _attempts(self, deadline):
+        """Yield (attempt, timeout) while the deadline and the breaker allow another attempt"""
+        for attempt in range(AI_MAX_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceededError(f'AI call deadline of {AI_CALL_DEADLINE_SECONDS}s exceeded')
+            if not self.breaker.allow():
+                self.metrics.record_short_circuit()
+                raise CircuitOpenError(f'AI provider unavailable, retrying in {self.breaker.retry_in():.1f}s')
+            yield attempt, httpx.Timeout(min(AI_REQUEST_TIMEOUT_SECONDS, remaining),
+                                         connect=min(AI_CONNECT_TIMEOUT_SECONDS, remaining))
+
+    def _backoff(self, attempt, error, deadline):
+        """Sleep before the next attempt; False if there is no time or attempt left for one"""
+        if attempt >= AI_MAX_RETRIES:
+            return False
+        delay = random.uniform(0, min(AI_RETRY_MAX_SECONDS, AI_RETRY_BASE_SECONDS * 2 ** attempt))
+        delay = max(delay, _retry_after(error) or 0)
+        if time.monotonic() + delay >= deadline:
+            return False
+        self.metrics.record_retry()
+        time.sleep(delay)
+        return True
+
+    def _failed(self, error):
+        self.metrics.record_error(error)
+        if isinstance(error, RETRYABLE_ERRORS):
+            self.breaker.record_failure()
+        else:
+            # The provider answered (e.g. 400 or 401): it is up, the request is wrong
+            self.breaker.record_success()
+
+    def create_chat_completion(self, request):
+        """chat.completions.create(**request), retried within the call's deadline"""
+        started = time.monotonic()
+        deadline = started + AI_CALL_DEADLINE_SECONDS
+        error = None
+        try:
+            for attempt, timeout in self._attempts(deadline):
+                try:
+                    response = self.client.with_options(timeout=timeout).chat.completions.create(**request)
+                except RETRYABLE_ERRORS as e:
+                    self._failed(e)
+                    if not self._backoff(attempt, e, deadline):
+                        raise
+                    continue
+                except openai.OpenAIError as e:
+                    self._failed(e)
+                    raise
+                self.breaker.record_success()
+                return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.metrics.record_call(time.monotonic() - started, error)
+
+    def stream_chat_completion(self, request, usage=None):
+        """
+        Yield the text of a streamed chat completion. Opening the stream is
+        retried like create_chat_completion; once text has been yielded an
+        error ends the call. If a `usage` dict is given, the token counts the
+        API reports at the end of the stream are stored in it.
+        """
+        if usage is not None:
+            request = dict(request, stream_options={'include_usage': True})
+        started = time.monotonic()
+        deadline = started + AI_CALL_DEADLINE_SECONDS
+        error = None
+        try:
+            for attempt, timeout in self._attempts(deadline):
+                try:
+                    stream = self.client.with_options(timeout=timeout).chat.completions.create(**request, stream=True)
+                except RETRYABLE_ERRORS as e:
+                    self._failed(e)
+                    if not self._backoff(attempt, e, deadline):
+                        raise
+                    continue
+                except openai.OpenAIError as e:
+                    self._failed(e)
+                    raise
+                break
+            received = False
+            try:
+                for chunk in stream:
+                    if time.monotonic() > deadline:
+                        raise DeadlineExceededError(f'AI call deadline of {AI_CALL_DEADLINE_SECONDS}s exceeded')
+                    if usage is not None and chunk.usage:
+                        usage['prompt_tokens'] = chunk.usage.prompt_tokens
+                        usage['completion_tokens'] = chunk.usage.completion_tokens
+                    if not chunk.choices:
+                        continue
+                    text = chunk.choices[0].delta.content
+                    if text:
+                        received = True
+                        yield text
+            except (openai.OpenAIError, httpx.HTTPError, DeadlineExceededError) as e:
+                # A stream broken off midway counts against the provider
+                self.metrics.record_error(e)
+                self.breaker.record_failure()
+                raise
+            except GeneratorExit:
+                # The reader went away
+                if received:
+                    self.breaker.record_success()
+                else:
+                    self.breaker.abandon()
+                raise
+            finally:
+                stream.close()
+            self.breaker.record_success()
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.metrics.record_call(time.monotonic() - started, error)
+
+    def metrics_snapshot(self):
+        return dict(self.metrics.snapshot(), breaker={
+            'state': self.breaker.state,
+            'consecutive_failures': self.breaker.failures,
+            'retry_in_seconds': round(self.breaker.retry_in(), 1)
+        })
@@ -0,0 +1,52 @@
+"""
+Question Catalog Service for FinOps Assessment Platform
+Builds the assessment question catalog once per process and serves it as
+a content-hashed JSON document that browsers can cache forever.
+
+The version is derived from the catalog content, so any change to
+CAPABILITIES, LENSES, QUESTIONS or ANSWER_OPTIONS yields a new URL and
+clients never see a stale catalog.
+"""
+
+import json
+import hashlib
+from data.capabilities import CAPABILITIES, LENSES, QUESTIONS, ANSWER_OPTIONS
+from models.projections import COMPLETE_ASSESSMENT
+
+
+def build_catalog():
+    """Every question in assessment order, with the shared answer options listed once"""
+    questions = []
+    for capability in CAPABILITIES:
+        capability_questions = QUESTIONS.get(capability['id'], {})
+        for lens in LENSES:
+            lens_questions = capability_questions.get(lens['id'], [])
+            if lens_questions:
+                questions.append({
+                    'capability_id': capability['id'],
+                    'lens_id': lens['id'],
+                    'capability_name': capability['name'],
+                    'lens_name': lens['name'],
+                    'question': lens_questions[0],
+                    'domain': capability['domain']
+                })
+    return {
+        'answer_options': ANSWER_OPTIONS['percentage_questions'],
+        'questions': questions
+    }
+
+
+CATALOG = build_catalog()
+CATALOG_JSON = json.dumps(CATALOG, sort_keys=True, separators=(',', ':')).encode('utf-8')
+CATALOG_VERSION = hashlib.sha256(CATALOG_JSON).hexdigest()[:16]
+
+
+def question_count(domain):
+    """Number of catalog questions in an assessment of `domain`"""
+    return sum(1 for q in CATALOG['questions'] if domain == COMPLETE_ASSESSMENT or q['domain'] == domain)
+
+
+QUESTION_COUNTS = {
+    domain: question_count(domain)
+    for domain in {q['domain'] for q in CATALOG['questions']} | {COMPLETE_ASSESSMENT}
+}
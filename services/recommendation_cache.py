@@ -0,0 +1,115 @@
+"""
+Recommendation Cache Service for FinOps Assessment Platform
+Content-addressed cache of AI recommendations with single-flight
+generation across threads and processes.
+
+Recommendations depend only on the AI request (model, parameters and the
+prompt built from scope, domain, overall score and the lowest scoring
+answers), so the cache key is a hash of that request in canonical JSON.
+Entries expire after AI_CACHE_TTL_DAYS and the least recently used are
+evicted beyond AI_CACHE_MAX_ENTRIES.
+
+The first worker to miss a fingerprint takes a lease on it and generates;
+others asking for the same fingerprint meanwhile wait for its result
+instead of making the same call. A lease that runs out (its worker died)
+is taken over by the next worker.
+"""
+
+import json
+import time
+import hashlib
+from datetime import datetime, timedelta
+from config import AI_CACHE_TTL_DAYS, AI_CACHE_MAX_ENTRIES, AI_CACHE_LEASE_SECONDS
+
+CACHE_POLL_SECONDS = 0.5
+
+
+def request_fingerprint(request):
+    """Hash of an AI request in canonical JSON"""
+    canonical = json.dumps(request, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def _fresh_since():
+    return datetime.now() - timedelta(days=AI_CACHE_TTL_DAYS)
+
+
+def acquire(conn, fingerprint):
+    """
+    Look up a fingerprint. Returns ('hit', recommendations), ('owner', None)
+    when this worker must generate them, or ('wait', None) while another
+    worker holds the lease.
+    """
+    now = datetime.now()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute('''
+            SELECT recommendations, lease_until > ?, created_at >= ?
+            FROM recommendation_cache
+            WHERE fingerprint = ?
+        ''', (now, _fresh_since(), fingerprint)).fetchone()
+        if row and row[0] is not None and row[2]:
+            conn.execute('''
+                UPDATE recommendation_cache SET hits = hits + 1, last_used_at = ? WHERE fingerprint = ?
+            ''', (now, fingerprint))
+            conn.commit()
+            return 'hit', row[0]
+        if row and row[0] is None and row[1]:
+            conn.commit()
+            return 'wait', None
+        conn.execute('''
+            INSERT INTO recommendation_cache (fingerprint, recommendations, lease_until, created_at, last_used_at)
+            VALUES (?, NULL, ?, ?, ?)
+            ON CONFLICT (fingerprint) DO UPDATE SET
+                recommendations = NULL,
+                lease_until = excluded.lease_until,
+                hits = 0,
+                created_at = excluded.created_at,
+                last_used_at = excluded.last_used_at
+        ''', (fingerprint, now + timedelta(seconds=AI_CACHE_LEASE_SECONDS), now, now))
+        conn.commit()
+        return 'owner', None
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def acquire_or_wait(conn, fingerprint):
+    """Cached recommendations for a fingerprint (waiting out an in-flight generation), or None if this worker now owns it"""
+    while True:
+        state, recommendations = acquire(conn, fingerprint)
+        if state == 'hit':
+            return recommendations
+        if state == 'owner':
+            return None
+        time.sleep(CACHE_POLL_SECONDS)
+
+
+def store(conn, fingerprint, recommendations):
+    """Store generated recommendations, end the lease and evict expired and least recently used entries"""
+    now = datetime.now()
+    conn.execute('''
+        UPDATE recommendation_cache
+        SET recommendations = ?, lease_until = NULL, created_at = ?, last_used_at = ?
+        WHERE fingerprint = ?
+    ''', (recommendations, now, now, fingerprint))
+    conn.execute('''
+        DELETE FROM recommendation_cache WHERE created_at < ? AND recommendations IS NOT NULL
+    ''', (_fresh_since(),))
+    conn.execute('''
+        DELETE FROM recommendation_cache
+        WHERE fingerprint IN (
+            SELECT fingerprint FROM recommendation_cache
+            ORDER BY last_used_at DESC
+            LIMIT -1 OFFSET ?
+        ) AND recommendations IS NOT NULL
+    ''', (AI_CACHE_MAX_ENTRIES,))
+    conn.commit()
+
+
+def release(conn, fingerprint):
+    """Give up an in-flight generation so the next worker can take it over at once"""
+    conn.execute('''
+        DELETE FROM recommendation_cache WHERE fingerprint = ? AND recommendations IS NULL
+    ''', (fingerprint,))
+    conn.commit()
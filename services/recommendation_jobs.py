@@ -0,0 +1,115 @@
+"""
+Recommendation Jobs for FinOps Assessment Platform
+Generates an assessment's AI recommendations in a background job instead
+of inside the request that completes or views it.
+
+Jobs are queued AI_STREAM_GRACE_SECONDS in the future so that the results
+page can claim the job and stream the recommendations to the user as they
+are generated; the workers only pick it up if no page does.
+"""
+
+import time
+from config import AI_STREAM_GRACE_SECONDS, AI_JOB_POLL_SECONDS
+from services.ai_service import generate_recommendations, stream_recommendations
+from services.recommendations_format import RecommendationParser, structure_recommendation, load_recommendations
+from services.job_queue import (job_handler, enqueue_job, job_status, claim_assessment_job,
+                                finish_job, fail_job, release_job, worker_name)
+
+RECOMMENDATIONS = 'recommendations'
+
+
+def has_recommendations(recommendations):
+    """Whether stored recommendations are usable (not missing or a failure notice)"""
+    return bool(recommendations and recommendations.strip()
+                and 'Unable to generate recommendations' not in recommendations)
+
+
+def enqueue_recommendations(conn, assessment_id):
+    """Queue recommendation generation for an assessment (caller commits)"""
+    return enqueue_job(conn, RECOMMENDATIONS, assessment_id, delay_seconds=AI_STREAM_GRACE_SECONDS)
+
+
+def recommendations_status(conn, assessment_id):
+    """Latest recommendation job of an assessment, or None"""
+    return job_status(conn, RECOMMENDATIONS, assessment_id)
+
+
+def _load_assessment(conn, assessment_id):
+    return conn.execute('''
+        SELECT scope_id, domain, total_score, answered_count, recommendations, recommendations_json
+        FROM assessments
+        WHERE id = ?
+    ''', (assessment_id,)).fetchone()
+
+
+def _overall_percentage(row):
+    total_score, answered_count = row[2], row[3]
+    return (total_score / answered_count) if answered_count else 0
+
+
+@job_handler(RECOMMENDATIONS)
+def generate_assessment_recommendations(conn, assessment_id):
+    row = _load_assessment(conn, assessment_id)
+    if not row or has_recommendations(row[4]):
+        return  # deleted meanwhile, or already generated
+    scope_id, domain = row[0], row[1]
+    overall_percentage = _overall_percentage(row)
+    # Stores the result itself, or raises so that the job is retried
+    generate_recommendations(conn, assessment_id, scope_id, domain, overall_percentage)
+
+
+def stream_assessment_recommendations(conn, assessment_id):
+    """
+    Yield an assessment's recommendations as ('card', recommendation) events
+    (structured, see services/recommendations_format.py), each as soon as it
+    is complete, then ('done', None) or ('failed', None).
+
+    Stored recommendations are replayed. Otherwise the pending job is claimed
+    and run right here with a streaming completion; while a worker holds it,
+    ('waiting', None) is yielded every AI_JOB_POLL_SECONDS until it finishes.
+    """
+    worker = worker_name('stream')
+    while True:
+        row = _load_assessment(conn, assessment_id)
+        if not row:
+            return
+        if has_recommendations(row[4]):
+            for recommendation in load_recommendations(row[5], row[4]):
+                yield 'card', recommendation
+            yield 'done', None
+            return
+        job_id = claim_assessment_job(conn, RECOMMENDATIONS, assessment_id, worker)
+        if job_id:
+            break
+        job = recommendations_status(conn, assessment_id)
+        if job and job['status'] == 'failed':
+            yield 'failed', None
+            return
+        if not job or job['status'] == 'done':
+            # Nothing pending; queue a job and claim it on the next pass
+            if enqueue_recommendations(conn, assessment_id):
+                conn.commit()
+                continue
+        yield 'waiting', None
+        time.sleep(AI_JOB_POLL_SECONDS)
+
+    parser = RecommendationParser()
+    try:
+        for text in stream_recommendations(conn, assessment_id, row[0], row[1], _overall_percentage(row)):
+            for recommendation in parser.feed(text):
+                yield 'card', structure_recommendation(recommendation)
+        completed = [structure_recommendation(recommendation) for recommendation in parser.close()]
+    except GeneratorExit:
+        # The page went away; let the workers finish the job
+        release_job(conn, job_id, worker)
+        raise
+    except Exception as e:
+        conn.rollback()
+        print(f"Streaming recommendations for assessment {assessment_id} failed: {e}")
+        fail_job(conn, job_id, worker, e)
+        yield 'failed', None
+        return
+    finish_job(conn, job_id, worker)
+    for recommendation in completed:
+        yield 'card', recommendation
+    yield 'done', None
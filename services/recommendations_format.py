@@ -0,0 +1,172 @@
+"""
+Recommendations Format for FinOps Assessment Platform
+Parses the AI's Title:/Description:/Why it is important:/Recommendation:
+text into structured recommendations, once, when they are stored.
+
+assessments.recommendations keeps the text as generated;
+assessments.recommendations_json holds the parsed document:
+
+    {"version": RECOMMENDATIONS_FORMAT_VERSION,
+     "recommendations": [{field: text for field in RECOMMENDATION_SCHEMA}, ...]}
+
+Every recommendation has all the schema fields, as strings, including
+recommendation_html: its steps pre-rendered from markdown, so views only
+insert it. Documents of another version are re-parsed from the text when
+read.
+"""
+
+import re
+import json
+import threading
+import markdown
+
+RECOMMENDATIONS_FORMAT_VERSION = 1
+
+# Fields of a structured recommendation
+RECOMMENDATION_SCHEMA = {
+    'title': 'Title: line',
+    'description': 'Description: line',
+    'why_matters': 'Why it is important: (or Why it matters:) text',
+    'recommendation': 'Recommendation: text, markdown, may span lines',
+    'recommendation_html': 'the recommendation rendered to HTML',
+}
+
+# Labels as the model writes them, and the field each one starts
+RECOMMENDATION_FIELDS = [
+    ('Title:', 'title'),
+    ('Description:', 'description'),
+    ('Why it matters:', 'why_matters'),
+    ('Why it is important:', 'why_matters'),
+    ('Recommendation:', 'recommendation'),
+]
+
+# A markdown list item ("- step", "* step", "1. step")
+LIST_ITEM_PATTERN = re.compile(r'^([-*+]|\d+[.)])\s')
+# [https://...](https://...) links are shown as the bare URL
+URL_LINK_PATTERN = re.compile(r'\[(https?://[^\]]+)\]\(https?://[^)]+\)')
+# Links to finops.org are shown as plain text
+FINOPS_LINK_PATTERN = re.compile(r'<a href="https://www\.finops\.org[^"]*">([^<]+)</a>')
+
+# Markdown instances are reusable after reset() but not thread-safe
+_markdown = threading.local()
+
+
+class RecommendationParser:
+    """
+    Incremental parser for Title:/Description:/Why it is important:/
+    Recommendation: blocks. feed() takes text as it streams in and returns
+    the recommendations completed so far: a block is complete when the next
+    Title: starts, or when a line other than a list item follows a blank
+    line after its Recommendation: (list items continue its steps).
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.current = {}
+        self.field = None
+        self.blank = False
+
+    def _complete(self):
+        completed, self.current, self.field, self.blank = self.current, {}, None, False
+        return [completed] if completed else []
+
+    def _parse_line(self, line):
+        line = line.strip()
+        if not line:
+            self.blank = self.blank or 'recommendation' in self.current
+            return []
+        completed = []
+        if self.blank:
+            if self.field == 'recommendation' and LIST_ITEM_PATTERN.match(line):
+                # Steps set off from the recommendation by a blank line
+                self.current[self.field] += '\n\n' + line
+                self.blank = False
+                return []
+            completed = self._complete()
+        for label, field in RECOMMENDATION_FIELDS:
+            if line.startswith(label):
+                if field == 'title':
+                    completed += self._complete()
+                self.current[field] = line[len(label):].strip()
+                self.field = field
+                return completed
+        if self.field:
+            # Continuation of a multi-line field (e.g. a list of steps)
+            self.current[self.field] += '\n' + line
+        return completed
+
+    def feed(self, text):
+        self.buffer += text
+        *lines, self.buffer = self.buffer.split('\n')
+        completed = []
+        for line in lines:
+            completed += self._parse_line(line)
+        return completed
+
+    def close(self):
+        """Parse what is left once the text has ended"""
+        completed = self._parse_line(self.buffer)
+        self.buffer = ''
+        return completed + self._complete()
+
+
+def parse_recommendations(recommendations):
+    """Stored recommendations (JSON list or text blocks) as a list of dicts"""
+    if not recommendations:
+        return []
+    
+    try:
+        # Try to parse as JSON first
+        parsed = json.loads(recommendations)
+        if isinstance(parsed, list):
+            return parsed
+    except ValueError:
+        pass
+    
+    # Fallback: parse as text
+    parser = RecommendationParser()
+    return parser.feed(recommendations) + parser.close()
+
+
+def render_markdown(text):
+    """Convert markdown to HTML"""
+    if not text:
+        return ""
+    converter = getattr(_markdown, 'converter', None)
+    if converter is None:
+        converter = _markdown.converter = markdown.Markdown(extensions=['fenced_code', 'tables'])
+    html_text = converter.reset().convert(URL_LINK_PATTERN.sub(r'\1', text))
+    return FINOPS_LINK_PATTERN.sub(r'\1', html_text)
+
+
+def structure_recommendation(recommendation):
+    """A parsed recommendation with every schema field, its steps rendered to HTML"""
+    structured = {field: str(recommendation.get(field) or '') for field in RECOMMENDATION_SCHEMA}
+    structured['recommendation_html'] = render_markdown(structured['recommendation'])
+    return structured
+
+
+def structure_recommendations(recommendations):
+    """Stored recommendations text as a list of structured recommendations"""
+    return [structure_recommendation(recommendation) for recommendation in parse_recommendations(recommendations)
+            if isinstance(recommendation, dict)]
+
+
+def dump_recommendations(recommendations):
+    """The recommendations_json document for recommendations text, or None if it has none"""
+    structured = structure_recommendations(recommendations)
+    if not structured:
+        return None
+    return json.dumps({'version': RECOMMENDATIONS_FORMAT_VERSION, 'recommendations': structured})
+
+
+def load_recommendations(recommendations_json, recommendations):
+    """Structured recommendations from the stored document, or parsed from the text if it is missing or outdated"""
+    if recommendations_json:
+        try:
+            document = json.loads(recommendations_json)
+            if document.get('version') == RECOMMENDATIONS_FORMAT_VERSION:
+                return document['recommendations']
+        except (ValueError, AttributeError, KeyError):
+            pass
+    return structure_recommendations(recommendations)
@@ -0,0 +1,122 @@
+"""
+Rescoring Service for FinOps Assessment Platform
+Re-evaluates stored responses with the current scoring rules, for rolling
+out a scoring change across existing assessments.
+
+Responses are read in keyset-paginated batches by id and scored with
+evaluate_many; only rows whose score or suggestions change are written,
+with one executemany per batch, and every batch is its own transaction so
+the app keeps writing in between. Within that transaction the triggers on
+responses move the assessments' running totals and drop their results
+snapshots, and for completed assessments whose scores moved the batch
+refreshes what depends on them: overall_percentage, the company
+projections and (unless kept) the AI recommendations, which are cleared
+and queued for regeneration.
+
+A run can be stopped at any point and resumed with `start_after`, or
+simply run again: rows that already score the same are skipped.
+"""
+
+from config import MIGRATION_BATCH_SIZE
+from data.capabilities import CAPABILITIES, LENSES
+from models.projections import refresh_company_latest
+from services.ai_service import evaluate_many, suggestions_text
+from services.benchmark_snapshot import try_publish_snapshot
+from services.recommendation_jobs import enqueue_recommendations
+
+CAPABILITY_NAMES = {c['id']: c['name'] for c in CAPABILITIES}
+LENS_NAMES = {l['id']: l['name'] for l in LENSES}
+
+
+def _rescored_rows(rows):
+    """(assessment_id, score changed, score, suggestions, id, answer) for the rows whose scoring changed"""
+    scorable = [row for row in rows if row[2] in CAPABILITY_NAMES and row[3] in LENS_NAMES]
+    evaluations = evaluate_many((CAPABILITY_NAMES[row[2]], LENS_NAMES[row[3]], row[4], '') for row in scorable)
+    updates = []
+    for (response_id, assessment_id, capability_id, lens_id, answer, score, suggestions), evaluation in zip(scorable, evaluations):
+        new_suggestions = suggestions_text(evaluation['improvement_suggestions'])
+        if evaluation['score'] != score or new_suggestions != suggestions:
+            updates.append((assessment_id, evaluation['score'] != score, evaluation['score'], new_suggestions,
+                            response_id, answer))
+    return updates
+
+
+def _refresh_assessments(conn, assessment_ids, regenerate_recommendations):
+    """Bring completed assessments whose scores changed up to date"""
+    placeholders = ', '.join('?' * len(assessment_ids))
+    completed = conn.execute(f'''
+        SELECT a.id, u.company_hash
+        FROM assessments a
+        LEFT JOIN users u ON a.user_id = u.id
+        WHERE a.id IN ({placeholders}) AND a.status = 'completed'
+    ''', list(assessment_ids)).fetchall()
+    if not completed:
+        return
+    ids = [row[0] for row in completed]
+    placeholders = ', '.join('?' * len(ids))
+    conn.execute(f'''
+        UPDATE assessments
+        SET overall_percentage = CASE WHEN answered_count > 0 THEN CAST(total_score AS REAL) / answered_count END
+        WHERE id IN ({placeholders})
+    ''', ids)
+    if regenerate_recommendations:
+        # The prompt is built from the lowest scores, so the old text no longer fits
+        conn.execute(f'''
+            UPDATE assessments SET recommendations = NULL, recommendations_json = NULL
+            WHERE id IN ({placeholders}) AND recommendations IS NOT NULL
+        ''', ids)
+        for assessment_id in ids:
+            enqueue_recommendations(conn, assessment_id)
+    for company_hash in {row[1] for row in completed if row[1]}:
+        refresh_company_latest(conn, company_hash)
+
+
+def rescore_responses(conn, batch_size=None, start_after=0, regenerate_recommendations=True,
+                      dry_run=False, progress=None):
+    """
+    Rescore every response with an id above `start_after`, committing per
+    batch. `progress(stats)` is called after each batch with the running
+    counts and the last id done; the final counts are returned:
+    {'scanned', 'changed', 'assessments', 'last_id'}. With `dry_run`
+    nothing is written and the counts are what a run would change.
+    """
+    batch_size = batch_size or MIGRATION_BATCH_SIZE
+    stats = {'scanned': 0, 'changed': 0, 'assessments': 0, 'last_id': start_after}
+    assessments = set()
+
+    while True:
+        rows = conn.execute('''
+            SELECT id, assessment_id, capability_id, lens_id, answer, score, improvement_suggestions
+            FROM responses
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+        ''', (stats['last_id'], batch_size)).fetchall()
+        if not rows:
+            break
+
+        updates = _rescored_rows(rows)
+        if updates and not dry_run:
+            # An answer changed since it was read keeps the score it was saved with
+            cursor = conn.executemany('''
+                UPDATE responses SET score = ?, improvement_suggestions = ?
+                WHERE id = ? AND answer = ?
+            ''', [update[2:] for update in updates])
+            stats['changed'] += max(cursor.rowcount, 0)
+            rescored = {update[0] for update in updates if update[1]}
+            if rescored:
+                _refresh_assessments(conn, rescored, regenerate_recommendations)
+            conn.commit()
+        elif updates:
+            stats['changed'] += len(updates)
+        assessments.update(update[0] for update in updates)
+        stats['assessments'] = len(assessments)
+
+        stats['scanned'] += len(rows)
+        stats['last_id'] = rows[-1][0]
+        if progress:
+            progress(dict(stats))
+
+    if stats['changed'] and not dry_run:
+        try_publish_snapshot()
+    return stats
@@ -0,0 +1,164 @@
+"""
+Results Snapshot Service for FinOps Assessment Platform
+Materializes everything the results page and the exports show for a
+completed assessment into one JSON document (assessment_results table).
+
+A snapshot has two sections:
+    assessment  responses, results matrix, totals and recommendations
+                (text and structured); fixed once the assessment is
+                completed
+    industry    benchmarks and percentile ranks; tied to the benchmark
+                version it was computed from
+
+The assessment section is rebuilt when RESULTS_FORMAT_VERSION changes or
+when triggers drop the snapshot because the assessment's row or responses
+changed (rescoring, regenerated recommendations, deletion). The industry
+section is recomputed from the mapped benchmark snapshot whenever the
+benchmark version moves on, without touching responses.
+"""
+
+import json
+from datetime import datetime
+from models.projections import get_assessment_totals
+from services.benchmark_snapshot import get_benchmark_snapshot
+from services.question_catalog import QUESTION_COUNTS
+from services.recommendations_format import load_recommendations
+
+RESULTS_FORMAT_VERSION = 2
+
+
+def _assessment_section(conn, assessment):
+    """Per-assessment results, from the assessments row and its responses"""
+    (assessment_id, scope_id, domain, status, overall_percentage, recommendations, recommendations_json,
+     created_at, updated_at) = assessment
+    responses = [list(row) for row in conn.execute('''
+        SELECT capability_id, lens_id, answer, score, improvement_suggestions
+        FROM responses
+        WHERE assessment_id = ?
+        ORDER BY capability_id, lens_id
+    ''', (assessment_id,))]
+    totals = get_assessment_totals(conn, assessment_id)
+
+    results_matrix = {}
+    for capability_id, lens_id, answer, score, improvement_suggestions in responses:
+        results_matrix.setdefault(capability_id, {})[lens_id] = {
+            'answer': answer,
+            'score': score,
+            'improvement_suggestions': improvement_suggestions
+        }
+
+    # 21 capabilities x 5 lenses for a complete assessment, the domain's
+    # capabilities x 5 lenses otherwise; 4 points per question
+    total_questions = QUESTION_COUNTS.get(domain, 0)
+    return {
+        'assessment_id': assessment_id,
+        'scope_id': scope_id,
+        'domain': domain,
+        'status': status,
+        'overall_percentage': overall_percentage,
+        'recommendations': recommendations,
+        'parsed_recommendations': load_recommendations(recommendations_json, recommendations),
+        'created_at': created_at,
+        'updated_at': updated_at,
+        'responses': responses,
+        'results_matrix': results_matrix,
+        'total_score': totals['total_score'],
+        'answered_count': totals['answered_count'],
+        'domain_scores': totals['domains'],
+        'total_questions': total_questions,
+        'total_possible_points': total_questions * 4
+    }
+
+
+def _industry_section(snapshot, assessment):
+    """Industry comparison for an assessment section, from a benchmark snapshot"""
+    industry = snapshot.benchmarks().industry_summary(assessment['domain'])
+    distributions = snapshot.distributions()
+    return {
+        'industry_avg': industry['industry_avg'],
+        'unique_companies': industry['unique_companies'],
+        'has_benchmark_data': industry['has_benchmark_data'],
+        'domain_benchmarks': industry['domain_benchmarks'],
+        'domain_percentiles': {
+            domain_name: distributions.domain(domain_name).percentile_rank(domain_totals['total_score'])
+            for domain_name, domain_totals in assessment['domain_scores'].items()
+        }
+    }
+
+
+def _load_assessment(conn, assessment_id, user_id):
+    return conn.execute('''
+        SELECT id, scope_id, domain, status, overall_percentage, recommendations, recommendations_json,
+               created_at, updated_at
+        FROM assessments
+        WHERE id = ? AND user_id = ?
+    ''', (assessment_id, user_id)).fetchone()
+
+
+def get_results(conn, assessment_id, user_id):
+    """
+    Results of one of the user's assessments as {'assessment': ..., 'industry': ...},
+    or None if it does not exist. Completed assessments are served from
+    their stored snapshot and refreshed only where it is out of date.
+    """
+    assessment = _load_assessment(conn, assessment_id, user_id)
+    if not assessment:
+        return None
+    snapshot = get_benchmark_snapshot(conn)
+    status = assessment[3]
+    if status != 'completed':
+        section = _assessment_section(conn, assessment)
+        return {'assessment': section, 'industry': _industry_section(snapshot, section)}
+
+    row = conn.execute('''
+        SELECT format_version, benchmark_version, results
+        FROM assessment_results
+        WHERE assessment_id = ?
+    ''', (assessment_id,)).fetchone()
+    if row and row[0] == RESULTS_FORMAT_VERSION:
+        results = json.loads(row[2])
+        if row[1] == snapshot.version:
+            return results
+        # Only the industry section is out of date. A snapshot dropped or
+        # rebuilt meanwhile no longer matches and is left alone.
+        results['industry'] = _industry_section(snapshot, results['assessment'])
+        conn.execute('''
+            UPDATE assessment_results SET benchmark_version = ?, results = ?, updated_at = ?
+            WHERE assessment_id = ? AND format_version = ? AND benchmark_version = ?
+        ''', (snapshot.version, json.dumps(results), datetime.now(), assessment_id, row[0], row[1]))
+        conn.commit()
+        return results
+
+    # Read and store under the write lock so that a concurrent rescore
+    # cannot slip in between and leave a stale snapshot behind
+    if not conn.in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    try:
+        assessment = _load_assessment(conn, assessment_id, user_id)
+        if not assessment:
+            conn.rollback()
+            return None
+        section = _assessment_section(conn, assessment)
+        results = {'assessment': section, 'industry': _industry_section(snapshot, section)}
+        conn.execute('''
+            INSERT INTO assessment_results (assessment_id, format_version, benchmark_version, results, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (assessment_id) DO UPDATE SET
+                format_version = excluded.format_version,
+                benchmark_version = excluded.benchmark_version,
+                results = excluded.results,
+                updated_at = excluded.updated_at
+        ''', (assessment_id, RESULTS_FORMAT_VERSION, snapshot.version, json.dumps(results), datetime.now()))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return results
+
+
+def try_store_results(conn, assessment_id, user_id):
+    """Materialize a just-completed assessment's results; the first view builds them if this fails"""
+    try:
+        get_results(conn, assessment_id, user_id)
+    except Exception as e:
+        print(f"Results snapshot not stored for assessment {assessment_id}: {e}")
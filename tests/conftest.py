@@ -0,0 +1,119 @@
+"""
+Shared fixtures: every test gets its own migrated database and benchmark
+snapshot directory; the app is imported once, without job workers.
+"""
+
+import os
+import random
+import tempfile
+
+# Settings are read when config is imported, so they go before any app import
+_session_dir = tempfile.mkdtemp(prefix='finops-tests-')
+os.environ.update(
+    DATABASE=os.path.join(_session_dir, 'app.db'),
+    BENCHMARK_SNAPSHOT_DIR=os.path.join(_session_dir, 'benchmark_snapshots'),
+    UPLOAD_FOLDER=os.path.join(_session_dir, 'uploads'),
+    AI_WORKERS='0',
+    OPENAI_API_KEY='test-key',
+    OPERATOR_EMAILS='ops@example.com',
+)
+
+import pytest
+
+# The encryption service creates its key file in the working directory on import
+_cwd = os.getcwd()
+os.chdir(_session_dir)
+import services.encryption_service
+os.chdir(_cwd)
+
+import models.database
+import services.benchmark_snapshot
+from data.capabilities import CAPABILITIES, LENSES, DOMAINS
+from models.database import init_db, connect
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A freshly migrated database for this test"""
+    path = str(tmp_path / 'test.db')
+    monkeypatch.setattr(models.database, 'DATABASE', path)
+    monkeypatch.setattr(services.benchmark_snapshot, 'BENCHMARK_SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    monkeypatch.setattr(services.benchmark_snapshot, '_current', None)
+    init_db()
+    return path
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = connect()
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def app(db_path):
+    import app as app_module
+    app_module.app.config['TESTING'] = True
+    return app_module.app
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    # Talisman redirects plain HTTP requests to HTTPS
+    client.environ_base['HTTP_X_FORWARDED_PROTO'] = 'https'
+    return client
+
+
+def add_user(conn, email_hash, company_hash=None, confirmed=1):
+    return conn.execute('''
+        INSERT INTO users (email_hash, company_hash, is_confirmed) VALUES (?, ?, ?)
+    ''', (email_hash, company_hash, confirmed)).lastrowid
+
+
+def add_assessment(conn, user_id, domain='Complete Assessment', status='in_progress', created_at='2026-05-03 10:00:00'):
+    return conn.execute('''
+        INSERT INTO assessments (user_id, scope_id, domain, status, created_at) VALUES (?, 'complete', ?, ?, ?)
+    ''', (user_id, domain, status, created_at)).lastrowid
+
+
+def add_response(conn, assessment_id, capability_id, lens_id, score, answer='41-60%'):
+    return conn.execute('''
+        INSERT INTO responses (assessment_id, capability_id, lens_id, answer, score) VALUES (?, ?, ?, ?, ?)
+    ''', (assessment_id, capability_id, lens_id, answer, score)).lastrowid
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """A running fake_openai_server, with the app's client pointed at it"""
+    import threading
+    import fake_openai_server
+    from services.ai_service import get_openai_client
+    server = fake_openai_server.make_server(port=0, latency_p50_ms=20, latency_p99_ms=40, token_delay_ms=0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv('OPENAI_API_BASE', f'http://127.0.0.1:{server.server_port}/v1')
+    get_openai_client.cache_clear()
+    yield server
+    get_openai_client.cache_clear()
+    server.shutdown()
+    server.server_close()
+
+
+def populate(conn, users=120, seed=7):
+    """Random users, assessments and responses across companies, domains and months"""
+    rng = random.Random(seed)
+    domains = DOMAINS + ['Complete Assessment']
+    for u in range(users):
+        company_hash = None if u % 17 == 0 else f'{rng.randrange(30):03x}co'
+        user_id = add_user(conn, f'user{u}', company_hash, confirmed=rng.choice([0, 1, 1]))
+        for _ in range(rng.randrange(4)):
+            domain = rng.choice(domains)
+            created_at = f'2026-{rng.randrange(1, 13):02d}-{rng.randrange(1, 28):02d} 10:00:00'
+            status = rng.choice(['completed', 'completed', 'in_progress'])
+            assessment_id = add_assessment(conn, user_id, domain, status, created_at)
+            capabilities = [c for c in CAPABILITIES if domain == 'Complete Assessment' or c['domain'] == domain]
+            for capability in rng.sample(capabilities, min(len(capabilities), rng.randrange(1, 8))):
+                for lens in rng.sample(LENSES, rng.randrange(1, 6)):
+                    score = None if rng.random() < 0.05 else rng.randrange(5)
+                    add_response(conn, assessment_id, capability['id'], lens['id'], score)
+    conn.commit()
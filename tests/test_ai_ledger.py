@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+import pytest
+import services.ai_ledger as ai_ledger
+from services.ai_ledger import BudgetExceededError, choose_model, record_ai_call, tokens_used_today, usage_report
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(ai_ledger, 'AI_MODEL', 'gpt-4')
+    monkeypatch.setattr(ai_ledger, 'AI_FALLBACK_MODEL', 'gpt-3.5-turbo')
+    monkeypatch.setattr(ai_ledger, 'AI_MAX_COMPLETION_TOKENS', 1000)
+    monkeypatch.setattr(ai_ledger, 'AI_DAILY_TOKEN_BUDGET', 5000)
+
+
+def test_unlimited_budget_keeps_the_model(conn, monkeypatch):
+    monkeypatch.setattr(ai_ledger, 'AI_DAILY_TOKEN_BUDGET', 0)
+    record_ai_call(conn, 1, ai_ledger.AI_MODEL, 10 ** 9, 0, 100, 'ok')
+    assert choose_model(conn, 1000) == ai_ledger.AI_MODEL
+
+
+def test_budget_falls_back_once_spent(conn, budget):
+    assert choose_model(conn, 4000) == 'gpt-4'
+    record_ai_call(conn, 1, 'gpt-4', 2500, 500, 100, 'ok')
+    assert tokens_used_today(conn) == 3000
+    assert choose_model(conn, 1000) == 'gpt-4'
+    assert choose_model(conn, 1001) == 'gpt-3.5-turbo'
+
+    # Fallback calls and yesterday's calls do not count against today's budget
+    record_ai_call(conn, 1, 'gpt-3.5-turbo', 10000, 0, 100, 'ok')
+    conn.execute('INSERT INTO ai_calls (model, prompt_tokens, outcome, created_at) VALUES (?, ?, ?, ?)',
+                 ('gpt-4', 10000, 'ok', datetime.now() - timedelta(days=1)))
+    assert tokens_used_today(conn) == 3000
+
+
+def test_spent_budget_without_fallback_raises(conn, budget, monkeypatch):
+    monkeypatch.setattr(ai_ledger, 'AI_FALLBACK_MODEL', '')
+    record_ai_call(conn, 1, 'gpt-4', 4500, 0, 100, 'ok')
+    with pytest.raises(BudgetExceededError):
+        choose_model(conn, 100)
+
+
+def test_usage_report(conn):
+    record_ai_call(conn, 1, 'gpt-4', 1000, 500, 200, 'ok')
+    record_ai_call(conn, 2, 'gpt-4', 0, 0, 5, 'ok', cache_hit=True)
+    record_ai_call(conn, 3, 'gpt-4', 0, 0, 900, 'APITimeoutError')
+    report = usage_report(conn, datetime.now().date().isoformat())
+    assert report['totals']['calls'] == 3
+    assert report['totals']['cache_hits'] == 1
+    assert report['totals']['errors'] == 1
+    assert report['totals']['cost_usd'] == pytest.approx(0.06)
+    assert report['days'][0]['avg_latency_ms'] == 550
+
+
+def test_record_leaves_the_commit_to_the_caller(conn):
+    conn.execute("INSERT INTO users (email_hash) VALUES ('pending')")
+    record_ai_call(conn, 1, 'gpt-4', 100, 10, 50, 'ok')
+    assert conn.in_transaction
+    conn.rollback()
+    assert conn.execute('SELECT COUNT(*) FROM ai_calls').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0
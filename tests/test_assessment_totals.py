@@ -0,0 +1,52 @@
+from data.capabilities import CAPABILITIES
+from models.projections import get_assessment_totals, rebuild_assessment_totals
+from tests.conftest import populate
+
+CAPABILITY_DOMAINS = {c['id']: c['domain'] for c in CAPABILITIES}
+
+
+def recounted_totals(conn, assessment_id):
+    rows = conn.execute('SELECT capability_id, score FROM responses WHERE assessment_id = ?',
+                        (assessment_id,)).fetchall()
+    domains = {}
+    for capability_id, score in rows:
+        total = domains.setdefault(CAPABILITY_DOMAINS[capability_id], [0, 0])
+        total[0] += score or 0
+        total[1] += 1
+    return {
+        'total_score': sum(score or 0 for _, score in rows),
+        'answered_count': len(rows),
+        'domains': {domain: {'total_score': total, 'count': count, 'average': total / count}
+                    for domain, (total, count) in domains.items()}
+    }
+
+
+def all_totals(conn):
+    return {row[0]: get_assessment_totals(conn, row[0]) for row in conn.execute('SELECT id FROM assessments')}
+
+
+def test_running_totals_follow_inserts_updates_and_deletes(conn):
+    populate(conn)
+    conn.execute('UPDATE responses SET score = 4 - COALESCE(score, 0) WHERE id % 3 = 0')
+    conn.execute('UPDATE OR IGNORE responses SET capability_id = ? WHERE id % 11 = 0 AND capability_id != ?',
+                 (CAPABILITIES[-1]['id'], CAPABILITIES[-1]['id']))
+    conn.execute('DELETE FROM responses WHERE id % 5 = 0')
+    conn.execute('DELETE FROM assessments WHERE id % 7 = 0')
+    conn.commit()
+
+    for assessment_id, totals in all_totals(conn).items():
+        recounted = recounted_totals(conn, assessment_id)
+        assert totals['total_score'] == recounted['total_score']
+        assert totals['answered_count'] == recounted['answered_count']
+        assert totals['domains'] == recounted['domains']
+    assert conn.execute('''
+        SELECT COUNT(*) FROM assessment_domain_totals
+        WHERE assessment_id NOT IN (SELECT id FROM assessments)
+    ''').fetchone()[0] == 0
+
+
+def test_rebuild_assessment_totals_is_a_no_op_when_in_sync(conn):
+    populate(conn)
+    before = all_totals(conn)
+    rebuild_assessment_totals(conn, batch_size=7)
+    assert all_totals(conn) == before
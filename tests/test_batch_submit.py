@@ -0,0 +1,83 @@
+import pytest
+from data.capabilities import CAPABILITIES, LENSES
+from routes.assessment import MAX_BATCH_SIZE
+from services.ai_service import LEVEL_SCORES
+from tests.conftest import add_user, add_assessment
+
+
+@pytest.fixture
+def assessment(conn, client):
+    user_id = add_user(conn, 'batch-user', 'company')
+    assessment_id = add_assessment(conn, user_id)
+    conn.commit()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return assessment_id
+
+
+def submit(client, assessment_id, responses):
+    return client.post('/submit_assessment_batch', json={'assessment_id': assessment_id, 'responses': responses})
+
+
+def test_batch_saves_every_answer(conn, client, assessment):
+    responses = [{'capability_id': c['id'], 'lens_id': l['id'], 'answer': '61-80%'}
+                 for c in CAPABILITIES[:3] for l in LENSES]
+    response = submit(client, assessment, responses)
+    assert response.status_code == 200
+    assert response.json['saved'] == len(responses)
+    assert set(response.json['scores'].values()) == {LEVEL_SCORES['61-80%']}
+    assert conn.execute('SELECT total_score, answered_count FROM assessments WHERE id = ?',
+                        (assessment,)).fetchone() == (3 * len(responses), len(responses))
+
+
+def test_last_answer_wins(conn, client, assessment):
+    question = {'capability_id': 'data_ingestion', 'lens_id': 'knowledge'}
+    response = submit(client, assessment, [dict(question, answer='0-20%'), dict(question, answer='81-100%')])
+    assert response.json['saved'] == 1
+    assert conn.execute('SELECT answer, score FROM responses WHERE assessment_id = ?',
+                        (assessment,)).fetchall() == [('81-100%', 4)]
+
+    # Resubmitting replaces the stored answer instead of adding one
+    submit(client, assessment, [dict(question, answer='21-40%')])
+    assert conn.execute('SELECT answer, score FROM responses WHERE assessment_id = ?',
+                        (assessment,)).fetchall() == [('21-40%', 1)]
+
+
+VALID = {'capability_id': 'data_ingestion', 'lens_id': 'process', 'answer': '41-60%'}
+
+
+@pytest.mark.parametrize('responses', [
+    [],
+    [VALID, {'capability_id': 'data_ingestion', 'lens_id': 'knowledge'}],
+    [VALID, 'not an answer'],
+    [VALID, {'capability_id': 'unknown', 'lens_id': 'knowledge', 'answer': '41-60%'}],
+    [VALID, {'capability_id': 'data_ingestion', 'lens_id': 'unknown', 'answer': '41-60%'}],
+    [VALID] * (MAX_BATCH_SIZE + 1),
+])
+def test_invalid_batches_write_nothing(conn, client, assessment, responses):
+    assert submit(client, assessment, responses).status_code == 400
+    assert conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] == 0
+
+
+def test_completed_assessment_is_rejected(conn, client, assessment):
+    conn.execute("UPDATE assessments SET status = 'completed' WHERE id = ?", (assessment,))
+    conn.commit()
+    response = submit(client, assessment, [{'capability_id': 'data_ingestion', 'lens_id': 'knowledge',
+                                            'answer': '41-60%'}])
+    assert response.status_code == 400
+
+
+def test_other_users_assessment_is_not_found(conn, client, assessment):
+    other = add_assessment(conn, add_user(conn, 'someone-else'))
+    conn.commit()
+    response = submit(client, other, [{'capability_id': 'data_ingestion', 'lens_id': 'knowledge',
+                                       'answer': '41-60%'}])
+    assert response.status_code == 404
+
+
+def test_login_required(client, assessment):
+    with client.session_transaction() as session:
+        session.clear()
+    response = submit(client, assessment, [{'capability_id': 'data_ingestion', 'lens_id': 'knowledge',
+                                            'answer': '41-60%'}])
+    assert response.status_code in (302, 401)
@@ -0,0 +1,55 @@
+import pytest
+from models.projections import refresh_assessment_company
+from services.encryption_service import encryption_service
+from tests.conftest import add_user, add_assessment, add_response
+
+
+@pytest.fixture
+def assessments(conn):
+    """Completed assessments of two companies; the second scores higher everywhere"""
+    ids = []
+    for i, score in enumerate((1, 3)):
+        user_id = add_user(conn, f'user{i}', f'company{i}')
+        assessment_id = add_assessment(conn, user_id, status='completed')
+        add_response(conn, assessment_id, 'data_ingestion', 'knowledge', score)
+        add_response(conn, assessment_id, 'data_ingestion', 'process', score)
+        refresh_assessment_company(conn, assessment_id)
+        ids.append((user_id, assessment_id))
+    conn.commit()
+    return ids
+
+
+def log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+
+def test_users_see_their_own_percentile_ranks(client, assessments):
+    (low_user, low), (high_user, high) = assessments
+    log_in(client, low_user)
+    response = client.get(f'/benchmark_distribution/{low}')
+    assert response.status_code == 200
+    question = response.json['questions']['data_ingestion']['knowledge']
+    assert (question['score'], question['companies']) == (1, 2)
+
+    log_in(client, high_user)
+    higher = client.get(f'/benchmark_distribution/{high}').json['questions']['data_ingestion']['knowledge']
+    assert higher['percentile_rank'] > question['percentile_rank']
+
+
+def test_other_users_assessments_are_not_found(client, assessments):
+    (low_user, _), (_, high) = assessments
+    log_in(client, low_user)
+    assert client.get(f'/benchmark_distribution/{high}').status_code == 404
+    assert client.get('/benchmark_distribution/999').status_code == 404
+
+
+def test_operators_see_any_assessment(conn, client, assessments):
+    operator = add_user(conn, encryption_service.hash_email('ops@example.com'))
+    conn.commit()
+    log_in(client, operator)
+    assert client.get(f'/benchmark_distribution/{assessments[1][1]}').status_code == 200
+
+
+def test_login_required(client, assessments):
+    assert client.get(f'/benchmark_distribution/{assessments[0][1]}').status_code == 401
@@ -0,0 +1,75 @@
+import pytest
+from models.migrations import run_migrations
+from models.projections import get_completed_domain_averages, rebuild_completed_domain_averages
+from tests.conftest import add_user, populate
+
+
+def recounted(conn):
+    return {domain: avg for domain, avg in conn.execute('''
+        SELECT domain, AVG(overall_percentage) FROM assessments
+        WHERE status = 'completed' AND overall_percentage IS NOT NULL
+        GROUP BY domain
+    ''')}
+
+
+def assert_matches_recount(conn):
+    averages = get_completed_domain_averages(conn)
+    expected = recounted(conn)
+    assert averages.keys() == expected.keys()
+    for domain, avg in expected.items():
+        assert averages[domain] == pytest.approx(avg)
+
+
+def test_averages_follow_completion_rescoring_and_deletion(conn):
+    populate(conn)
+    conn.execute('''
+        UPDATE assessments SET overall_percentage = (id % 9) / 2.0
+        WHERE status = 'completed' AND id % 5 != 0
+    ''')
+    assert_matches_recount(conn)
+
+    conn.execute("UPDATE assessments SET status = 'completed', overall_percentage = 3.5 WHERE status = 'in_progress'")
+    conn.execute('UPDATE assessments SET overall_percentage = overall_percentage + 0.25 WHERE id % 3 = 0')
+    conn.execute("UPDATE assessments SET domain = 'Optimize Usage & Cost' WHERE id % 7 = 0")
+    conn.execute("UPDATE assessments SET status = 'in_progress' WHERE id % 11 = 0")
+    conn.execute('DELETE FROM assessments WHERE id % 4 = 0')
+    conn.commit()
+    assert_matches_recount(conn)
+
+    before = get_completed_domain_averages(conn)
+    rebuild_completed_domain_averages(conn)
+    assert get_completed_domain_averages(conn) == pytest.approx(before)
+
+
+def test_migration_seeds_existing_assessments(conn):
+    populate(conn)
+    conn.execute("UPDATE assessments SET overall_percentage = (id % 9) / 2.0 WHERE status = 'completed'")
+    for trigger in ('insert', 'update', 'delete'):
+        conn.execute(f'DROP TRIGGER completed_domain_averages_{trigger}')
+    conn.execute('DROP TABLE completed_domain_averages')
+    conn.execute('DELETE FROM schema_version WHERE version = 19')
+    conn.commit()
+
+    run_migrations(conn)
+    assert_matches_recount(conn)
+
+
+def test_dashboard_stats_chart(conn, client):
+    user_id = add_user(conn, 'chart-user', 'company')
+    other = add_user(conn, 'other-user', 'other')
+    rows = [(user_id, 'Understand Usage & Cost', 2.0), (other, 'Understand Usage & Cost', 3.0),
+            (other, 'Optimize Usage & Cost', 1.5)]
+    for owner, domain, overall_percentage in rows:
+        conn.execute('''
+            INSERT INTO assessments (user_id, scope_id, domain, status, overall_percentage)
+            VALUES (?, 'complete', ?, 'completed', ?)
+        ''', (owner, domain, overall_percentage))
+    conn.commit()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+
+    chart = client.get('/dashboard/stats').json
+    assert chart['labels'] == ['Understand Usage & Cost', 'Quantify Business Value', 'Optimize Usage & Cost',
+                               'Manage the FinOps Practice']
+    assert chart['user_scores'] == [2.0, 0, 0, 0]
+    assert chart['industry_scores'] == [2.5, 0, 1.5, 0]
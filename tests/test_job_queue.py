@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+import pytest
+import services.job_queue as job_queue
+from services.job_queue import (RETRY_BASE_SECONDS, claim_assessment_job, claim_job, enqueue_job, fail_job,
+                                finish_job, job_handler, job_status, release_job, run_next_job)
+
+
+def job_row(conn, job_id):
+    status, attempts, run_after, worker = conn.execute(
+        'SELECT status, attempts, run_after, worker FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    return status, attempts, datetime.fromisoformat(str(run_after)), worker
+
+
+def make_due(conn, job_id):
+    conn.execute('UPDATE jobs SET run_after = ? WHERE id = ?', (datetime.now() - timedelta(seconds=1), job_id))
+    conn.commit()
+
+
+def test_enqueue_keeps_one_pending_job(conn):
+    assert enqueue_job(conn, 'test', 1)
+    assert not enqueue_job(conn, 'test', 1)
+    assert enqueue_job(conn, 'other', 1)
+    assert enqueue_job(conn, 'test', 2)
+    conn.commit()
+    assert conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0] == 3
+
+    job_id = claim_assessment_job(conn, 'test', 1, 'w1')
+    assert finish_job(conn, job_id, 'w1')
+    assert job_status(conn, 'test', 1)['status'] == 'done'
+    assert enqueue_job(conn, 'test', 1)
+
+
+def test_delayed_jobs_wait(conn):
+    enqueue_job(conn, 'test', 1, delay_seconds=60)
+    conn.commit()
+    assert claim_job(conn, 'w1') is None
+
+
+def test_claim_takes_a_lease(conn):
+    enqueue_job(conn, 'test', 1)
+    conn.commit()
+    job_id, kind, assessment_id = claim_job(conn, 'w1')
+    assert (kind, assessment_id) == ('test', 1)
+    status, attempts, lease_until, worker = job_row(conn, job_id)
+    assert (status, attempts, worker) == ('running', 1, 'w1')
+    assert lease_until > datetime.now()
+
+    # Leased jobs are not handed out again
+    assert claim_job(conn, 'w2') is None
+    assert claim_assessment_job(conn, 'test', 1, 'w2') is None
+
+
+def test_expired_lease_is_reclaimed(conn):
+    enqueue_job(conn, 'test', 1)
+    conn.commit()
+    job_id = claim_job(conn, 'w1')[0]
+    make_due(conn, job_id)
+    assert claim_job(conn, 'w2')[0] == job_id
+    status, attempts, _, worker = job_row(conn, job_id)
+    assert (status, attempts, worker) == ('running', 2, 'w2')
+
+
+def test_worker_that_lost_its_lease_cannot_change_the_job(conn):
+    enqueue_job(conn, 'test', 1)
+    conn.commit()
+    job_id = claim_job(conn, 'w1')[0]
+    make_due(conn, job_id)
+    assert claim_job(conn, 'w2')[0] == job_id
+
+    assert not finish_job(conn, job_id, 'w1')
+    assert not fail_job(conn, job_id, 'w1', RuntimeError('late'))
+    assert not release_job(conn, job_id, 'w1')
+    status, attempts, _, worker = job_row(conn, job_id)
+    assert (status, attempts, worker) == ('running', 2, 'w2')
+    assert finish_job(conn, job_id, 'w2')
+
+
+def test_crashed_last_attempt_fails(conn, monkeypatch):
+    monkeypatch.setattr(job_queue, 'AI_JOB_MAX_ATTEMPTS', 2)
+    enqueue_job(conn, 'test', 1)
+    enqueue_job(conn, 'test', 2)
+    conn.commit()
+    for _ in range(2):
+        # The worker dies without finishing; the lease runs out
+        job_id = claim_assessment_job(conn, 'test', 1, 'w1')
+        make_due(conn, job_id)
+
+    assert claim_job(conn, 'w2')[2] == 2
+    status = job_status(conn, 'test', 1)
+    assert (status['status'], status['attempts']) == ('failed', 2)
+    assert claim_assessment_job(conn, 'test', 1, 'w2') is None
+
+
+def test_failures_back_off_then_give_up(conn, monkeypatch):
+    monkeypatch.setattr(job_queue, 'AI_JOB_MAX_ATTEMPTS', 3)
+    enqueue_job(conn, 'test', 1)
+    conn.commit()
+    for attempt in (1, 2):
+        job_id = claim_job(conn, 'w1')[0]
+        started = datetime.now()
+        assert fail_job(conn, job_id, 'w1', RuntimeError(f'failure {attempt}'))
+        status, attempts, run_after, _ = job_row(conn, job_id)
+        assert (status, attempts) == ('queued', attempt)
+        backoff = (run_after - started).total_seconds()
+        assert RETRY_BASE_SECONDS * 2 ** (attempt - 1) - 1 < backoff <= RETRY_BASE_SECONDS * 2 ** (attempt - 1) + 1
+        assert claim_job(conn, 'w1') is None
+        make_due(conn, job_id)
+
+    job_id = claim_job(conn, 'w1')[0]
+    assert fail_job(conn, job_id, 'w1', RuntimeError('failure 3'))
+    status = job_status(conn, 'test', 1)
+    assert (status['status'], status['attempts'], status['last_error']) == ('failed', 3, 'failure 3')
+    make_due(conn, job_id)
+    assert claim_job(conn, 'w1') is None
+
+
+def test_release_does_not_count_the_attempt(conn):
+    enqueue_job(conn, 'test', 1)
+    conn.commit()
+    job_id = claim_job(conn, 'w1')[0]
+    assert release_job(conn, job_id, 'w1')
+    assert job_row(conn, job_id)[:2] == ('queued', 0)
+    assert claim_job(conn, 'w2')[0] == job_id
+
+
+@pytest.fixture
+def handled(monkeypatch):
+    calls = []
+    monkeypatch.setattr(job_queue, 'JOB_HANDLERS', {})
+
+    @job_handler('test')
+    def handle(conn, assessment_id):
+        calls.append(assessment_id)
+        if assessment_id < 0:
+            raise RuntimeError('bad assessment')
+    return calls
+
+
+def test_run_next_job(conn, handled):
+    assert not run_next_job(conn, 'w1')
+    enqueue_job(conn, 'test', 7)
+    enqueue_job(conn, 'test', -1)
+    enqueue_job(conn, 'unknown', 8)
+    conn.commit()
+    while run_next_job(conn, 'w1'):
+        pass
+    assert sorted(handled) == [-1, 7]
+    assert job_status(conn, 'test', 7)['status'] == 'done'
+    failed = job_status(conn, 'test', -1)
+    assert (failed['status'], failed['last_error']) == ('queued', 'bad assessment')
+    assert job_status(conn, 'unknown', 8)['last_error'] == 'No handler for unknown jobs'
@@ -0,0 +1,74 @@
+import time
+import openai
+import pytest
+import services.openai_client as openai_client
+from services.openai_client import CircuitBreaker, CircuitOpenError, ResilientOpenAI
+
+REQUEST = {'model': 'gpt-4', 'messages': [{'role': 'user', 'content': 'Recommend something'}], 'max_tokens': 50}
+
+
+@pytest.fixture
+def client(fake_openai, monkeypatch):
+    monkeypatch.setattr(openai_client, 'AI_RETRY_BASE_SECONDS', 0.01)
+    monkeypatch.setattr(openai_client, 'AI_CALL_DEADLINE_SECONDS', 10)
+    monkeypatch.setattr(openai_client, 'AI_BREAKER_FAILURES', 3)
+    monkeypatch.setattr(openai_client, 'AI_BREAKER_RESET_SECONDS', 0.2)
+    return ResilientOpenAI(api_key='test-key', base_url=f'http://127.0.0.1:{fake_openai.server_port}/v1')
+
+
+def requests_made(server):
+    return server.RequestHandlerClass.stats['requests']
+
+
+def test_successful_call(client, fake_openai):
+    response = client.create_chat_completion(REQUEST)
+    assert response.choices[0].message.content.startswith('Title:')
+    assert client.metrics_snapshot()['calls'] == 1
+    assert requests_made(fake_openai) == 1
+
+
+def test_transient_errors_are_retried(client, fake_openai, monkeypatch):
+    monkeypatch.setattr(openai_client, 'AI_MAX_RETRIES', 2)
+    fake_openai.RequestHandlerClass.options.error_rate = 1.0
+    with pytest.raises(openai.InternalServerError):
+        client.create_chat_completion(REQUEST)
+    assert requests_made(fake_openai) == 3
+    metrics = client.metrics_snapshot()
+    assert (metrics['failures'], metrics['retries']) == (1, 2)
+    assert metrics['errors'] == {'InternalServerError': 3}
+
+
+def test_breaker_opens_and_recovers(client, fake_openai, monkeypatch):
+    monkeypatch.setattr(openai_client, 'AI_MAX_RETRIES', 0)
+    fake_openai.RequestHandlerClass.options.error_rate = 1.0
+    for _ in range(3):
+        with pytest.raises(openai.InternalServerError):
+            client.create_chat_completion(REQUEST)
+
+    # Open: calls fail without reaching the provider
+    with pytest.raises(CircuitOpenError):
+        client.create_chat_completion(REQUEST)
+    assert requests_made(fake_openai) == 3
+    assert client.metrics_snapshot()['short_circuited'] == 1
+
+    # Half open after the reset time: one trial call closes it again
+    fake_openai.RequestHandlerClass.options.error_rate = 0.0
+    time.sleep(0.25)
+    assert client.create_chat_completion(REQUEST).choices
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed trial opens it again straight away
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert 0 < breaker.retry_in() <= 0.05
@@ -0,0 +1,24 @@
+from models.projections import get_platform_stats, reconcile_platform_stats
+from tests.conftest import populate
+
+
+def test_platform_stats_match_recount(conn):
+    populate(conn)
+    conn.execute("UPDATE assessments SET status = 'completed' WHERE id % 4 = 0")
+    conn.execute('UPDATE users SET is_confirmed = 1 WHERE id % 3 = 0')
+    conn.execute("UPDATE users SET company_hash = 'moved' WHERE id % 13 = 0")
+    conn.execute('DELETE FROM assessments WHERE id % 9 = 0')
+    conn.execute('DELETE FROM users WHERE id % 23 = 0')
+    conn.commit()
+
+    stats = get_platform_stats(conn)
+    assert stats['assessments_completed'] == conn.execute(
+        "SELECT COUNT(*) FROM assessments WHERE status = 'completed'").fetchone()[0]
+    assert reconcile_platform_stats(conn) == {}
+
+
+def test_reconcile_platform_stats_corrects_drift(conn):
+    populate(conn, users=20)
+    conn.execute('UPDATE platform_stats SET confirmed_users = confirmed_users + 3 WHERE id = 1')
+    assert reconcile_platform_stats(conn) == {'confirmed_users': 3}
+    assert reconcile_platform_stats(conn) == {}
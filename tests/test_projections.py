@@ -0,0 +1,37 @@
+from models.migrations import _backfill_benchmark_projections
+from models.projections import rebuild_company_scores, refresh_assessment_company
+from tests.conftest import populate
+
+PROJECTION_TABLES = ('company_latest_assessment', 'company_latest_scores', 'benchmark_monthly',
+                     'benchmark_monthly_companies', 'score_histogram', 'domain_score_histogram')
+
+
+def projections(conn):
+    return {table: sorted(map(tuple, conn.execute(f'SELECT * FROM {table}')), key=repr)
+            for table in PROJECTION_TABLES}
+
+
+def test_completing_assessments_keeps_projections_in_sync(conn):
+    populate(conn, users=60)
+    rebuild_company_scores(conn, batch_size=5)
+    for (assessment_id,) in conn.execute("SELECT id FROM assessments WHERE status = 'in_progress'").fetchall():
+        conn.execute("UPDATE assessments SET status = 'completed' WHERE id = ?", (assessment_id,))
+        refresh_assessment_company(conn, assessment_id)
+    conn.commit()
+    incremental = projections(conn)
+
+    rebuild_company_scores(conn, batch_size=5)
+    assert projections(conn) == incremental
+
+
+def test_projection_backfill_matches_rebuild(conn, monkeypatch):
+    import models.migrations
+    populate(conn)
+    monkeypatch.setattr(models.migrations, 'MIGRATION_BATCH_SIZE', 7)
+    _backfill_benchmark_projections(conn)
+    conn.commit()
+    backfilled = projections(conn)
+
+    rebuild_company_scores(conn, batch_size=5)
+    assert projections(conn) == backfilled
+    assert backfilled['company_latest_scores']
@@ -0,0 +1,11 @@
+import pytest
+from check_query_plans import HOT_QUERIES, check_query_plans, find_scans
+
+
+@pytest.mark.parametrize('name,sql,params', HOT_QUERIES, ids=[query[0] for query in HOT_QUERIES])
+def test_hot_query_uses_an_index(conn, name, sql, params):
+    assert find_scans(conn, name, sql, params) == []
+
+
+def test_check_query_plans_passes(db_path):
+    assert check_query_plans(db_path) == 0
@@ -0,0 +1,109 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+import services.recommendation_cache as recommendation_cache
+from models.database import connect
+from config import AI_CALL_DEADLINE_SECONDS
+from services.ai_service import generate_recommendations
+from services.recommendation_cache import acquire, acquire_or_wait, release, request_fingerprint, store
+from tests.conftest import add_user, add_assessment, add_response
+
+
+def test_fingerprint_ignores_key_order():
+    assert request_fingerprint({'a': 1, 'b': [1, 2]}) == request_fingerprint({'b': [1, 2], 'a': 1})
+    assert request_fingerprint({'a': 1}) != request_fingerprint({'a': 2})
+
+
+def test_acquire_owner_wait_hit(conn):
+    assert acquire(conn, 'f') == ('owner', None)
+    assert acquire(conn, 'f') == ('wait', None)
+    store(conn, 'f', 'Title: cached')
+    assert acquire(conn, 'f') == ('hit', 'Title: cached')
+    assert acquire_or_wait(conn, 'f') == 'Title: cached'
+    assert conn.execute("SELECT hits FROM recommendation_cache WHERE fingerprint = 'f'").fetchone()[0] == 2
+
+
+def test_release_hands_the_lease_on(conn):
+    assert acquire(conn, 'f') == ('owner', None)
+    release(conn, 'f')
+    assert acquire(conn, 'f') == ('owner', None)
+
+    # A stored result is not released
+    store(conn, 'f', 'Title: cached')
+    release(conn, 'f')
+    assert acquire(conn, 'f') == ('hit', 'Title: cached')
+
+
+def test_expired_lease_is_taken_over(conn):
+    acquire(conn, 'f')
+    conn.execute("UPDATE recommendation_cache SET lease_until = '2000-01-01 00:00:00'")
+    conn.commit()
+    assert acquire(conn, 'f') == ('owner', None)
+
+
+def test_lease_outlasts_a_call_and_its_retries(conn):
+    acquire(conn, 'f')
+    lease_until = conn.execute("SELECT lease_until FROM recommendation_cache WHERE fingerprint = 'f'").fetchone()[0]
+    assert datetime.fromisoformat(lease_until) > datetime.now() + timedelta(seconds=2 * AI_CALL_DEADLINE_SECONDS)
+
+
+def test_least_recently_used_are_evicted(conn, monkeypatch):
+    monkeypatch.setattr(recommendation_cache, 'AI_CACHE_MAX_ENTRIES', 2)
+    for fingerprint in ('a', 'b', 'c'):
+        acquire(conn, fingerprint)
+        store(conn, fingerprint, f'Title: {fingerprint}')
+    assert [row[0] for row in conn.execute('SELECT fingerprint FROM recommendation_cache ORDER BY fingerprint')] \
+        == ['b', 'c']
+
+
+@pytest.fixture
+def assessments(conn):
+    """Three assessments that make the same request, and one that does not"""
+    user_id = add_user(conn, 'cache-user', 'company')
+    ids = []
+    for score in (1, 1, 1, 2):
+        assessment_id = add_assessment(conn, user_id, 'Understand Usage & Cost', 'completed')
+        add_response(conn, assessment_id, 'data_ingestion', 'knowledge', score, '21-40%')
+        ids.append(assessment_id)
+    conn.commit()
+    return ids
+
+
+def test_identical_requests_make_one_call(conn, assessments, fake_openai, monkeypatch):
+    monkeypatch.setattr(recommendation_cache, 'CACHE_POLL_SECONDS', 0.05)
+    fake_openai.RequestHandlerClass.options.latency_p50_ms = 300
+    fake_openai.RequestHandlerClass.options.latency_p99_ms = 400
+    results = {}
+
+    def generate(assessment_id):
+        thread_conn = connect()
+        try:
+            results[assessment_id] = generate_recommendations(thread_conn, assessment_id, 'complete',
+                                                              'Understand Usage & Cost', 25.0)
+        finally:
+            thread_conn.close()
+
+    threads = [threading.Thread(target=generate, args=(assessment_id,)) for assessment_id in assessments]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fake_openai.RequestHandlerClass.stats['requests'] == 2
+    assert len({results[assessment_id] for assessment_id in assessments[:3]}) == 1
+    assert all(text.startswith('Title:') for text in results.values())
+    stored = conn.execute('SELECT COUNT(*) FROM assessments WHERE recommendations IS NOT NULL').fetchone()[0]
+    assert stored == len(assessments)
+    assert conn.execute('SELECT SUM(cache_hit) FROM ai_calls').fetchone()[0] == 2
+
+
+def test_failed_generation_releases_the_lease(conn, assessments, fake_openai, monkeypatch):
+    import services.openai_client as openai_client
+    monkeypatch.setattr(openai_client, 'AI_MAX_RETRIES', 0)
+    fake_openai.RequestHandlerClass.options.error_rate = 1.0
+    with pytest.raises(Exception):
+        generate_recommendations(conn, assessments[0], 'complete', 'Understand Usage & Cost', 25.0)
+    assert conn.execute('SELECT COUNT(*) FROM recommendation_cache').fetchone()[0] == 0
+    assert conn.execute('SELECT recommendations FROM assessments WHERE id = ?',
+                        (assessments[0],)).fetchone()[0] is None
+    assert conn.execute('SELECT outcome FROM ai_calls').fetchone()[0] == 'InternalServerError'
@@ -0,0 +1,69 @@
+import json
+from services.recommendations_format import (RECOMMENDATIONS_FORMAT_VERSION, RECOMMENDATION_SCHEMA,
+                                             RecommendationParser, dump_recommendations, load_recommendations,
+                                             parse_recommendations)
+
+TEXT = '''Title: Tag everything
+Description: Enforce tagging.
+Why it is important: Allocation needs tags.
+Recommendation: Add policies:
+
+- step **one**
+- see [https://example.org](https://example.org)
+
+Title: Review commitments
+Description: Track coverage.
+Why it matters: Unused commitments are waste.
+Recommendation: Review monthly.
+Report the results.'''
+
+
+def test_parse_text_blocks():
+    first, second = parse_recommendations(TEXT)
+    assert first['title'] == 'Tag everything'
+    assert first['why_matters'] == 'Allocation needs tags.'
+    assert first['recommendation'] == 'Add policies:\n\n- step **one**\n- see [https://example.org](https://example.org)'
+    assert second['why_matters'] == 'Unused commitments are waste.'
+    assert second['recommendation'] == 'Review monthly.\nReport the results.'
+
+
+def test_text_after_a_blank_line_ends_the_recommendation():
+    text = 'Title: One\nRecommendation: Do it.\n\nSome closing remark'
+    assert parse_recommendations(text) == [{'title': 'One', 'recommendation': 'Do it.'}]
+
+
+def test_streamed_chunks_parse_like_the_whole_text():
+    parser = RecommendationParser()
+    completed = []
+    for start in range(0, len(TEXT), 7):
+        completed += parser.feed(TEXT[start:start + 7])
+    # The first block is complete once the second Title: arrives
+    assert [r['title'] for r in completed] == ['Tag everything']
+    completed += parser.close()
+    assert completed == parse_recommendations(TEXT)
+
+
+def test_json_and_empty_input():
+    assert parse_recommendations('') == []
+    assert parse_recommendations(None) == []
+    assert parse_recommendations('[{"title": "Stored"}]') == [{'title': 'Stored'}]
+
+
+def test_dump_and_load():
+    document = json.loads(dump_recommendations(TEXT))
+    assert document['version'] == RECOMMENDATIONS_FORMAT_VERSION
+    first = document['recommendations'][0]
+    assert set(first) == set(RECOMMENDATION_SCHEMA)
+    assert '<strong>one</strong>' in first['recommendation_html']
+    assert '[https://example.org]' not in first['recommendation_html']
+
+    assert load_recommendations(json.dumps(document), None) == document['recommendations']
+    # Missing or outdated documents are parsed from the text
+    assert load_recommendations(None, TEXT) == document['recommendations']
+    outdated = json.dumps({'version': RECOMMENDATIONS_FORMAT_VERSION - 1, 'recommendations': []})
+    assert load_recommendations(outdated, TEXT) == document['recommendations']
+
+
+def test_text_without_recommendations():
+    assert dump_recommendations('Unable to generate recommendations at this time.') is None
+    assert dump_recommendations(None) is None
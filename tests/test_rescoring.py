@@ -0,0 +1,67 @@
+import pytest
+from services.ai_service import LEVEL_SCORES
+from services.job_queue import job_status
+from services.recommendation_jobs import RECOMMENDATIONS
+from services.rescoring import rescore_responses
+from tests.conftest import add_user, add_assessment, add_response
+
+
+@pytest.fixture
+def stale(conn):
+    """A completed and an in-progress assessment, scored with outdated rules"""
+    user_id = add_user(conn, 'rescore-user', 'company')
+    completed = add_assessment(conn, user_id, status='completed')
+    in_progress = add_assessment(conn, user_id)
+    for assessment_id in (completed, in_progress):
+        add_response(conn, assessment_id, 'data_ingestion', 'knowledge', 0, '81-100%')
+        add_response(conn, assessment_id, 'data_ingestion', 'process', 0, '61-80%')
+    conn.execute('''
+        UPDATE assessments SET overall_percentage = 0, recommendations = 'Title: Old' WHERE id = ?
+    ''', (completed,))
+    conn.commit()
+    return completed, in_progress
+
+
+def scores(conn, assessment_id):
+    return [row[0] for row in conn.execute(
+        'SELECT score FROM responses WHERE assessment_id = ? ORDER BY id', (assessment_id,))]
+
+
+def test_dry_run_writes_nothing(conn, stale):
+    stats = rescore_responses(conn, batch_size=3, dry_run=True)
+    assert (stats['scanned'], stats['changed'], stats['assessments']) == (4, 4, 2)
+    assert scores(conn, stale[0]) == [0, 0]
+
+
+def test_rescore_updates_scores_and_what_depends_on_them(conn, stale):
+    completed, in_progress = stale
+    progress = []
+    stats = rescore_responses(conn, batch_size=3, progress=progress.append)
+    assert stats['changed'] == 4
+    assert [p['last_id'] for p in progress] == [3, 4]
+
+    expected = [LEVEL_SCORES['81-100%'], LEVEL_SCORES['61-80%']]
+    assert scores(conn, completed) == expected
+    assert scores(conn, in_progress) == expected
+    assert conn.execute('SELECT total_score, overall_percentage, recommendations FROM assessments WHERE id = ?',
+                        (completed,)).fetchone() == (7, 3.5, None)
+    assert job_status(conn, RECOMMENDATIONS, completed)['status'] == 'queued'
+    assert job_status(conn, RECOMMENDATIONS, in_progress) is None
+    assert conn.execute('SELECT SUM(score) FROM company_latest_scores').fetchone()[0] == 7
+
+    # Running it again finds nothing to change
+    assert rescore_responses(conn)['changed'] == 0
+
+
+def test_rescore_can_keep_recommendations(conn, stale):
+    completed, _ = stale
+    rescore_responses(conn, regenerate_recommendations=False)
+    assert conn.execute('SELECT recommendations FROM assessments WHERE id = ?',
+                        (completed,)).fetchone()[0] == 'Title: Old'
+    assert job_status(conn, RECOMMENDATIONS, completed) is None
+
+
+def test_rescore_resumes_after_an_id(conn, stale):
+    stats = rescore_responses(conn, start_after=2)
+    assert (stats['scanned'], stats['changed']) == (2, 2)
+    assert scores(conn, stale[0]) == [0, 0]
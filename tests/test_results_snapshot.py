@@ -0,0 +1,59 @@
+import pytest
+from services.results_snapshot import RESULTS_FORMAT_VERSION, get_results
+from tests.conftest import add_user, add_assessment, add_response
+
+
+@pytest.fixture
+def completed(conn):
+    user_id = add_user(conn, 'results-user', 'company')
+    assessment_id = add_assessment(conn, user_id, status='completed')
+    add_response(conn, assessment_id, 'data_ingestion', 'knowledge', 2)
+    add_response(conn, assessment_id, 'data_ingestion', 'process', 3)
+    conn.commit()
+    return user_id, assessment_id
+
+
+def stored(conn, assessment_id):
+    return conn.execute('SELECT format_version FROM assessment_results WHERE assessment_id = ?',
+                        (assessment_id,)).fetchone()
+
+
+def test_completed_results_are_stored(conn, completed):
+    user_id, assessment_id = completed
+    results = get_results(conn, assessment_id, user_id)
+    assert results['assessment']['total_score'] == 5
+    assert results['assessment']['answered_count'] == 2
+    assert stored(conn, assessment_id) == (RESULTS_FORMAT_VERSION,)
+    assert get_results(conn, assessment_id, user_id) == results
+
+
+def test_in_progress_results_are_not_stored(conn, completed):
+    user_id, _ = completed
+    assessment_id = add_assessment(conn, user_id)
+    conn.commit()
+    assert get_results(conn, assessment_id, user_id) is not None
+    assert stored(conn, assessment_id) is None
+
+
+def test_other_users_get_nothing(conn, completed):
+    _, assessment_id = completed
+    assert get_results(conn, assessment_id, add_user(conn, 'other')) is None
+
+
+@pytest.mark.parametrize('change', [
+    'UPDATE responses SET score = 4 WHERE assessment_id = :id AND lens_id = \'knowledge\'',
+    'DELETE FROM responses WHERE assessment_id = :id AND lens_id = \'process\'',
+    'INSERT INTO responses (assessment_id, capability_id, lens_id, answer, score) '
+    'VALUES (:id, \'data_ingestion\', \'metrics\', \'0-20%\', 0)',
+    'UPDATE assessments SET recommendations = \'Title: New\' WHERE id = :id',
+])
+def test_changes_drop_the_snapshot(conn, completed, change):
+    user_id, assessment_id = completed
+    before = get_results(conn, assessment_id, user_id)
+    conn.execute(change, {'id': assessment_id})
+    conn.commit()
+    assert stored(conn, assessment_id) is None
+
+    after = get_results(conn, assessment_id, user_id)
+    assert after != before
+    assert stored(conn, assessment_id) == (RESULTS_FORMAT_VERSION,)
@@ -0,0 +1,48 @@
+import pytest
+from data.capabilities import CAPABILITIES, LENSES
+from services.ai_service import (LEVEL_SCORES, DEFAULT_LEVEL_SCORE, evaluate_finops_maturity, evaluate_many,
+                                 suggestions_text)
+
+
+@pytest.mark.parametrize('level,score', sorted(LEVEL_SCORES.items()))
+def test_level_scores(level, score):
+    evaluation = evaluate_finops_maturity('Data Ingestion', 'Knowledge', level, '', 'complete')
+    assert evaluation['score'] == score
+
+
+def test_unknown_level_scores_as_default():
+    evaluation = evaluate_finops_maturity('Data Ingestion', 'Knowledge', 'unsure', '', 'complete')
+    assert evaluation['score'] == DEFAULT_LEVEL_SCORE
+
+
+def test_details_adjust_score_within_bounds():
+    positive = 'We have automated, documented and standardized processes that are continuously optimized'
+    negative = 'Manual, ad hoc and inconsistent; no visibility'
+    top = evaluate_finops_maturity('Data Ingestion', 'Knowledge', '81-100%', positive, 'complete')
+    bottom = evaluate_finops_maturity('Data Ingestion', 'Knowledge', '0-20%', negative, 'complete')
+    up = evaluate_finops_maturity('Data Ingestion', 'Knowledge', '41-60%', positive, 'complete')
+    down = evaluate_finops_maturity('Data Ingestion', 'Knowledge', '41-60%', negative, 'complete')
+    assert top['score'] == 4 and bottom['score'] == 0
+    assert 2 < up['score'] <= 3
+    assert 1 <= down['score'] < 2
+
+
+def test_evaluate_many_matches_single_evaluations():
+    answers = []
+    for capability in CAPABILITIES:
+        for lens in LENSES:
+            for level in list(LEVEL_SCORES) + ['unsure']:
+                answers.append((capability['name'], lens['name'], level, ''))
+    answers.append(('Data Ingestion', 'Knowledge', '41-60%', 'fully automated and documented'))
+    answers.append(('Data Ingestion', 'Knowledge', '61-80%', 'manual and ad hoc'))
+
+    evaluations = evaluate_many(answers)
+    assert len(evaluations) == len(answers)
+    for answer, evaluation in zip(answers, evaluations):
+        assert evaluation == evaluate_finops_maturity(*answer, 'complete')
+
+
+def test_suggestions_text():
+    assert suggestions_text(['one', 'two']) == 'one\ntwo'
+    assert suggestions_text('already text') == 'already text'
+    assert suggestions_text(None) is None
@@ -0,0 +1,73 @@
+import pytest
+from models.sketches import (PRECISION, CompanySketch, hash_company, company_activity, rebuild_company_activity,
+                             record_company_activity)
+from tests.conftest import add_user, add_assessment
+
+
+def sketch_of(companies, precision=PRECISION):
+    return CompanySketch(precision, hashes=[hash_company(c) for c in companies])
+
+
+def test_small_sketches_are_exact():
+    sketch = sketch_of(['a', 'b', 'c', 'a'])
+    assert sketch.exact
+    assert sketch.count() == 3
+    assert CompanySketch.from_bytes(sketch.to_bytes()).count() == 3
+
+
+@pytest.mark.parametrize('n', [5000, 50000])
+def test_dense_estimate_within_error(n):
+    sketch = sketch_of(f'company{i}' for i in range(n))
+    assert not sketch.exact
+    # Four standard errors at the default 1%
+    assert abs(sketch.count() - n) <= 0.04 * n
+    restored = CompanySketch.from_bytes(sketch.to_bytes())
+    assert restored.count() == sketch.count()
+
+
+def test_merge_matches_union():
+    left = sketch_of(f'company{i}' for i in range(0, 6000))
+    right = sketch_of(f'company{i}' for i in range(4000, 9000))
+    union = sketch_of(f'company{i}' for i in range(9000))
+    assert left.merge(right).count() == union.count()
+
+    small = sketch_of(['x', 'y'])
+    assert small.merge(sketch_of(['y', 'z'])).count() == 3
+
+
+def test_fold_matches_sketch_built_at_lower_precision():
+    companies = [f'company{i}' for i in range(5000)]
+    high = sketch_of(companies, precision=PRECISION)
+    low = sketch_of(companies, precision=PRECISION - 3)
+    folded = high.fold(PRECISION - 3)
+    assert folded.precision == PRECISION - 3
+    assert (folded.registers == low.registers).all()
+
+
+def test_merge_across_precisions_uses_the_lower_one():
+    high = sketch_of((f'company{i}' for i in range(3000)), precision=PRECISION)
+    low = sketch_of((f'company{i}' for i in range(2000, 5000)), precision=PRECISION - 2)
+    expected = sketch_of((f'company{i}' for i in range(5000)), precision=PRECISION - 2)
+    merged = high.merge(low)
+    assert merged.precision == PRECISION - 2
+    assert merged.count() == expected.count()
+
+
+def test_company_activity_counts_distinct_companies_per_window(conn):
+    months = ['2026-01', '2026-01', '2026-02', '2026-03']
+    companies = ['acme', 'globex', 'acme', 'initech']
+    for i, (month, company) in enumerate(zip(months, companies)):
+        user_id = add_user(conn, f'user{i}', company)
+        assessment_id = add_assessment(conn, user_id, 'Understand Usage & Cost', 'completed', f'{month}-10 09:00:00')
+        record_company_activity(conn, assessment_id)
+    conn.commit()
+
+    activity = company_activity(conn, '2026-01', '2026-02')
+    assert activity['monthly']['*'] == {'2026-01': 2, '2026-02': 1}
+    assert activity['window']['*'] == 2
+    assert activity['window']['Understand Usage & Cost'] == 2
+    assert company_activity(conn, '2026-01')['window']['*'] == 3
+
+    incremental = company_activity(conn, '2026-01')
+    rebuild_company_activity(conn)
+    assert company_activity(conn, '2026-01') == incremental